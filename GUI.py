@@ -3,8 +3,144 @@ from tkinter import Tk, Toplevel, Label, Entry, Button, messagebox, END
 from tkinter import ttk
 import datetime
 
-from db import Main_Db
 from habit import Habit
+from metrics_cache import MetricsCache
+from pager import HabitPager
+from worker import DbWorker
+
+
+class VirtualTable:
+    """
+    A Treeview that only holds the rows currently visible, fetching them from a pager on scroll.
+
+    The pager is only used on the worker thread; the Treeview is filled once a page arrives.
+    """
+
+    ROW_HEIGHT = 20  # Default row height of a ttk.Treeview in pixels
+    HEADING_HEIGHT = 25  # Approximate height of the Treeview headings in pixels
+
+    def __init__(self, master, pager, columns, worker, visible_rows=25):
+        """
+        Initializes the table widgets.
+
+        Parameters:
+        - master: The parent widget.
+        - pager: Serves the rows; needs __len__, rows(start, stop, check), prefetch(position, check) and
+          sort(order_by).
+        - columns (tuple): The columns after the "#0" column, which shows the first value of a row.
+        - worker (DbWorker): The worker whose database the pager reads.
+        - visible_rows (int): The number of rows shown until the window is resized.
+        """
+        self.pager = pager
+        self.worker = worker
+        self.offset = 0  # Position of the first visible row
+        self.total = 0  # Number of rows, as of the last rendered page
+        self.visible_rows = visible_rows
+        self.order_by = []  # (column, descending) pairs of the current sort
+        self._jobs = []  # Pending page and prefetch jobs, cancelled when superseded
+
+        self.frame = Frame(master)
+        self.status = Label(self.frame, anchor="w")
+        self.status.pack(side=BOTTOM, fill=X)
+        self.tree = ttk.Treeview(self.frame, columns=columns, height=visible_rows)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=VERTICAL, command=self.on_scroll)
+        self.scrollbar.pack(side=RIGHT, fill=Y)
+        self.tree.pack(side=LEFT, expand=True, fill=BOTH)
+
+        # The Treeview itself never scrolls, every scroll moves the window over the pager instead
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll_to(self.offset - event.delta // 120 * 3))
+        self.tree.bind("<Button-4>", lambda event: self.scroll_to(self.offset - 3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_to(self.offset + 3))
+        self.tree.bind("<Prior>", lambda event: self.scroll_to(self.offset - self.visible_rows))
+        self.tree.bind("<Next>", lambda event: self.scroll_to(self.offset + self.visible_rows))
+        self.tree.bind("<Configure>", self.on_resize)
+        self.frame.bind("<Destroy>", lambda event: self.cancel())
+
+    def on_scroll(self, action, amount, unit=None):
+        """
+        Handles the scrollbar commands ("moveto", fraction) and ("scroll", count, "units"/"pages").
+        """
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.total))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll_to(self.offset + int(amount) * step)
+
+    def on_resize(self, event):
+        """
+        Shows as many rows as fit into the new height of the Treeview.
+        """
+        visible_rows = max(1, (event.height - self.HEADING_HEIGHT) // self.ROW_HEIGHT)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.render()
+
+    def scroll_to(self, offset):
+        """
+        Moves the first visible row to a position and renders the table.
+        """
+        self.offset = max(0, min(offset, self.total - self.visible_rows))
+        self.render()
+
+    def sort(self, order_by):
+        """
+        Sorts the pager and renders the first page in the new order.
+        """
+        self.order_by = order_by
+        self.worker.submit(lambda db, job: self.pager.sort(order_by))
+        self.offset = 0
+        self.render()
+
+    def cancel(self):
+        """
+        Cancels the pending page and prefetch jobs.
+        """
+        for job in self._jobs:
+            job.cancel()
+        self._jobs = []
+
+    def render(self):
+        """
+        Fetches the visible rows on the worker thread; show fills the Treeview once they arrive.
+        """
+        self.cancel()  # A newer page supersedes the pages and prefetches still queued
+        offset, count = self.offset, self.visible_rows
+
+        def fetch(habit_db, job):
+            total = len(self.pager)
+            start = max(0, min(offset, total - count))
+            job.report((start, min(start + count, total), total))
+            # A scroll cancels this job, which then stops between rows instead of finishing the page
+            return total, start, self.pager.rows(start, start + count, job.check)
+
+        self._jobs.append(self.worker.submit(fetch, on_done=self.show, on_progress=self.show_progress))
+
+    def show_progress(self, progress):
+        """
+        Tells that the rows of a page are being analyzed.
+        """
+        start, stop, total = progress
+        self.status.config(text=f"Analyzing rows {start + 1}-{stop} of {total}...")
+
+    def show(self, result):
+        """
+        Replaces the Treeview items with the fetched rows and updates the scrollbar.
+        """
+        self.total, self.offset, rows = result
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            self.tree.insert("", "end", text=row[0], values=row[1:])
+
+        if self.total:
+            self.scrollbar.set(self.offset / self.total, min(1.0, (self.offset + self.visible_rows) / self.total))
+            self.status.config(text=f"Rows {self.offset + 1}-{self.offset + len(rows)} of {self.total}")
+        else:
+            self.scrollbar.set(0.0, 1.0)
+            self.status.config(text="No habits")
+
+        # Analyze the rows below the visible ones while the worker is idle
+        position = self.offset + 2 * self.visible_rows
+        self._jobs.append(self.worker.submit(lambda db, job: self.pager.prefetch(position, job.check)))
 
 
 class GUI:
@@ -12,17 +148,27 @@ class GUI:
     A graphical user interface class for managing habits using Tkinter.
     """
 
-    def __init__(self):
+    def __init__(self, profiler=None):
         """
         Initializes the main window and sets up the GUI components.
+
+        Parameters:
+        - profiler (Profiler): Records the calls of the window handlers, the worker's jobs and
+          its database, the Habit metrics and the SQL statements; None to run uninstrumented.
         """
         # Create the main window
         self.root = Tk()
         self.root.geometry('600x600')  # Set the window size
         self.root.title('Habit Tracker')  # Set the window title
 
-        # Create and initialize the database instance
-        self.habit_db = Main_Db()
+        # Run all database work on a worker thread with its own connection
+        self.worker = DbWorker(self.root, setup=profiler.instrument_db if profiler is not None else None)
+        if profiler is not None:
+            # The buttons below keep the handlers they are given, so they are instrumented first
+            profiler.instrument_gui(self)
+            profiler.instrument_habits()
+        # The metrics of unchanged habits are reused by later completions and Analyze windows
+        self.metrics_cache = MetricsCache()
 
         # Set up the headline label
         headline_label = Label(self.root, text='The Habit Tracker', font=('Arial', 60))
@@ -117,21 +263,30 @@ class GUI:
 
         def edit_habit():
             habit_name = name_entry.get().strip()
-            if self.habit_db.habit_exists(habit_name):
-                # Show an error message if the habit already exists
-                messagebox.showerror('Error', 'Habit with this name already exists!')
-                return
-
-            # update the habit in the database
-            self.habit_db.edit_habits(id_entry.get(), habit_name,  periodicity_entry.get(), category_entry.get())
-
-            # Clear the input fields
-            id_entry.delete(0, END)
-            name_entry.delete(0, END)
-            category_entry.delete(0, END)
-            periodicity_entry.delete(0, END)
-            # Show a success message
-            messagebox.showinfo('It worked!', 'Habit Edited')
+            habit = (id_entry.get(), habit_name, periodicity_entry.get(), category_entry.get())
+
+            def edit(habit_db, job):
+                if habit_db.habit_exists(habit_name):
+                    return False
+                # update the habit in the database
+                habit_db.edit_habits(*habit)
+                return True
+
+            def done(edited):
+                if not edited:
+                    # Show an error message if the habit already exists
+                    messagebox.showerror('Error', 'Habit with this name already exists!')
+                    return
+
+                # Clear the input fields
+                id_entry.delete(0, END)
+                name_entry.delete(0, END)
+                category_entry.delete(0, END)
+                periodicity_entry.delete(0, END)
+                # Show a success message
+                messagebox.showinfo('It worked!', 'Habit Edited')
+
+            self.worker.submit(edit, on_done=done, on_error=self.show_error)
 
         edit_button = Button(
             edit_habit_window, text='Edit', font=('Arial', 30), command=edit_habit
@@ -180,19 +335,29 @@ class GUI:
             Submits the new habit to the database.
             """
             habit_name = name_entry.get().strip()
-            if self.habit_db.habit_exists(habit_name):
-                # Show an error message if the habit already exists
-                messagebox.showerror('Error', 'Habit with this name already exists!')
-                return
-
-            # Add the new habit to the database
-            self.habit_db.add_habits(habit_name, category_entry.get(), periodicity_entry.get())
-            # Clear the input fields
-            name_entry.delete(0, END)
-            category_entry.delete(0, END)
-            periodicity_entry.delete(0, END)
-            # Show a success message
-            messagebox.showinfo('It worked!', 'Habit Submitted')
+            habit = (habit_name, periodicity_entry.get(), category_entry.get())
+
+            def add(habit_db, job):
+                if habit_db.habit_exists(habit_name):
+                    return False
+                # Add the new habit to the database
+                habit_db.add_habits(*habit)
+                return True
+
+            def done(added):
+                if not added:
+                    # Show an error message if the habit already exists
+                    messagebox.showerror('Error', 'Habit with this name already exists!')
+                    return
+
+                # Clear the input fields
+                name_entry.delete(0, END)
+                category_entry.delete(0, END)
+                periodicity_entry.delete(0, END)
+                # Show a success message
+                messagebox.showinfo('It worked!', 'Habit Submitted')
+
+            self.worker.submit(add, on_done=done, on_error=self.show_error)
 
         # Create and configure the submit button
         submit_button = Button(add_habit_window, text='Submit', font=('Arial', 30), command=submit_habit)
@@ -224,11 +389,16 @@ class GUI:
             """
             Deletes the habit with the specified ID from the database.
             """
-            self.habit_db.delete_habits(delete_entry.get())
-            # Clear the entry after deletion
-            delete_entry.delete(0, END)
-            # Show a success message
-            messagebox.showinfo('It worked!', 'Habit Deleted')
+            habit_id = delete_entry.get()
+
+            def done(result):
+                # Clear the entry after deletion
+                delete_entry.delete(0, END)
+                # Show a success message
+                messagebox.showinfo('It worked!', 'Habit Deleted')
+
+            self.worker.submit(lambda habit_db, job: habit_db.delete_habits(habit_id),
+                               on_done=done, on_error=self.show_error)
 
         # Create and configure the delete button
         delete_button = Button(delete_habit_window, text='Delete', font=('Arial', 30), command=delete_habit)
@@ -261,31 +431,41 @@ class GUI:
             Marks the habit with the specified ID as completed.
             """
             habit_id = complete_entry.get()
+            # Clear the entry after the completion attempt
+            complete_entry.delete(0, END)
             try:
                 habit_id = int(habit_id)  # Convert the ID to an integer
-                habits = self.habit_db.list_all_habits()
-                habit = next((h for h in habits if h[0] == habit_id), None)
-                if habit:
-                    # Log the habit completion
-                    completed_at = datetime.datetime.now().strftime('%Y-%m-%d')
-                    self.habit_db.add_habit_log(habit_id, completed_at)
-
-                    # Update streak calculations
-                    habit_instance = Habit(*habit, self.habit_db)
-                    current_streak = habit_instance.calculate_current_streak()
-                    longest_streak = habit_instance.calculate_longest_streak()
-
-                    # Show a success message
-                    messagebox.showinfo("Success", "Habit completed successfully!")
-                else:
-                    # Show an error message if the habit ID is not found
-                    messagebox.showerror("Error", "Habit ID not found.")
             except ValueError:
                 # Show an error message if the input is not a valid number
                 messagebox.showerror("Error", "Invalid Habit ID. Please enter a number.")
+                return
 
-            # Clear the entry after the completion attempt
-            complete_entry.delete(0, END)
+            def complete(habit_db, job):
+                habit = habit_db.get_habit(habit_id)
+                if habit is None:
+                    return None
+
+                # Log the habit completion; repeated clicks on the same day are not logged again
+                completed_at = datetime.datetime.now().strftime('%Y-%m-%d')
+                if not habit_db.add_habit_log(habit_id, completed_at):
+                    return False
+
+                # Update streak calculations
+                habit_instance = Habit.from_row(habit, habit_db, self.metrics_cache)
+                return habit_instance.calculate_current_streak(), habit_instance.calculate_longest_streak()
+
+            def done(streaks):
+                if streaks is None:
+                    # Show an error message if the habit ID is not found
+                    messagebox.showerror("Error", "Habit ID not found.")
+                    return
+                if streaks is False:
+                    messagebox.showinfo("Info", "Habit was already completed today.")
+                    return
+                # Show a success message
+                messagebox.showinfo("Success", "Habit completed successfully!")
+
+            self.worker.submit(complete, on_done=done, on_error=self.show_error)
 
         # Create and configure the complete button
         complete_button = Button(complete_habit_window, text='Complete', font=('Arial', 30), command=complete_habit)
@@ -299,36 +479,53 @@ class GUI:
         analyze_habit_window.title('Analyze Habits')  # Set window title
         analyze_habit_window.geometry('900x600')  # Set window size
 
-        # Create and configure the Treeview widget
-        tree = ttk.Treeview(analyze_habit_window)
-        tree["columns"] = (
+        # Create a virtual table that only analyzes and shows the rows scrolled into view. The
+        # pager belongs to the worker's connection, so it is created on the worker thread.
+        self.worker.submit(lambda habit_db, job: HabitPager(habit_db, cache=self.metrics_cache),
+                           on_done=lambda pager: self.show_analyze_table(analyze_habit_window, pager))
+
+    def show_analyze_table(self, analyze_habit_window, pager):
+        """
+        Fills the Analyze window with a virtual table over the pager.
+
+        Parameters:
+        - analyze_habit_window (Toplevel): The Analyze window.
+        - pager (HabitPager): The pager over the worker's connection.
+        """
+        if not analyze_habit_window.winfo_exists():
+            return  # The window was closed before the pager was ready
+
+        table = VirtualTable(analyze_habit_window, pager, (
             "name", "category", "periodicity", "created_at", "current_streak", "longest_streak",
-            "last_completed", "total_completed")
+            "last_completed", "total_completed"), self.worker)
+        tree = table.tree
 
         # Configure the Treeview columns
-        tree.heading("#0", text="Habit ID", anchor="w", command=lambda: self.sort_by_column(tree, "#0", False))
+        tree.heading("#0", text="Habit ID", anchor="w", command=lambda: self.sort_by_column(table, "#0", False))
         tree.column("#0", anchor="w", width=80)
 
         for col in tree["columns"]:
-            tree.heading(col, text=col, anchor="w", command=lambda c=col: self.sort_by_column(tree, c, False))
+            tree.heading(col, text=col, anchor="w", command=lambda c=col: self.sort_by_column(table, c, False))
             tree.column(col, anchor="w", width=100)
 
-        # Retrieve and display habit data in the Treeview
-        habits = self.habit_db.list_all_habits()
-        for habit in habits:
-            habit_instance = Habit(*habit, self.habit_db)
-            current_streak = habit_instance.calculate_current_streak()
-            longest_streak = habit_instance.calculate_longest_streak()
-            last_completed = habit_instance.calculate_last_completed()
-            total_completed = habit_instance.calculate_total_completed()
-            created_at_str = habit_instance.created_at.split()[0]  # Extract date part
-
-            # Insert data into the Treeview
-            tree.insert("", "end", text=habit_instance.habit_id, values=(habit_instance.name, habit_instance.category,
-                                                                         habit_instance.periodicity, created_at_str,
-                                                                         current_streak, longest_streak, last_completed,
-                                                                         total_completed))
-        tree.pack(expand=True, fill=BOTH)  # Expand Treeview to fill the window
+        def add_sort_key(event):
+            """
+            Adds the Shift-clicked column as a further sort key, or flips its direction.
+            """
+            if tree.identify_region(event.x, event.y) != "heading":
+                return None
+            col = tree.identify_column(event.x)
+            if col != "#0":
+                col = tree["columns"][int(col[1:]) - 1]
+            keys = dict(table.order_by)
+            column = "id" if col == "#0" else col
+            self.sort_by_column(table, col, not keys[column] if column in keys else False, add=True)
+            return "break"
+
+        tree.bind("<Shift-Button-1>", add_sort_key)
+
+        table.frame.pack(expand=True, fill=BOTH)  # Expand the table to fill the window
+        table.render()
 
     def open_pre_def_habit_window(self):
         """
@@ -346,106 +543,93 @@ class GUI:
             """
             Inserts predefined habit into the database.
             """
-            self.habit_db.add_habits("running", "sport", 1, created_at='2024-07-04')
-            self.habit_db.add_habits("swimming", "sport", 7, created_at='2024-07-04')
-            self.habit_db.add_habits("programming", "university", 2, created_at='2024-07-04')
-            self.habit_db.add_habits("reading", "university", 7, created_at='2024-07-04')
-            self.habit_db.add_habits("3L Water", "nutrition", 1, created_at='2024-07-04')
-
-            # Inserts habit logs in to the database and retrieves habit ID
-            habit_id = self.habit_db.get_habit_id_by_name("running")
-            self.habit_db.add_habit_log(habit_id, '2024-07-05')
-            self.habit_db.add_habit_log(habit_id, '2024-07-06')
-            self.habit_db.add_habit_log(habit_id, '2024-07-07')
-            self.habit_db.add_habit_log(habit_id, '2024-07-10')
-            self.habit_db.add_habit_log(habit_id, '2024-07-12')
-            self.habit_db.add_habit_log(habit_id, '2024-07-14')
-            self.habit_db.add_habit_log(habit_id, '2024-07-15')
-            self.habit_db.add_habit_log(habit_id, '2024-07-16')
-            self.habit_db.add_habit_log(habit_id, '2024-07-17')
-            self.habit_db.add_habit_log(habit_id, '2024-07-18')
-            self.habit_db.add_habit_log(habit_id, '2024-07-19')
-            self.habit_db.add_habit_log(habit_id, '2024-07-20')
-            self.habit_db.add_habit_log(habit_id, '2024-07-22')
-            self.habit_db.add_habit_log(habit_id, '2024-07-23')
-            self.habit_db.add_habit_log(habit_id, '2024-07-24')
-            self.habit_db.add_habit_log(habit_id, '2024-07-25')
-            self.habit_db.add_habit_log(habit_id, '2024-07-26')
-            self.habit_db.add_habit_log(habit_id, '2024-07-27')
-            self.habit_db.add_habit_log(habit_id, '2024-07-28')
-            self.habit_db.add_habit_log(habit_id, '2024-08-02')
-            self.habit_db.add_habit_log(habit_id, '2024-08-03')
-
-            habit_id = self.habit_db.get_habit_id_by_name("swimming")
-            self.habit_db.add_habit_log(habit_id, '2024-07-10')
-            self.habit_db.add_habit_log(habit_id, '2024-07-16')
-
-            habit_id = self.habit_db.get_habit_id_by_name("programming")
-            self.habit_db.add_habit_log(habit_id, '2024-07-06')
-            self.habit_db.add_habit_log(habit_id, '2024-07-08')
-            self.habit_db.add_habit_log(habit_id, '2024-07-10')
-            self.habit_db.add_habit_log(habit_id, '2024-07-16')
-            self.habit_db.add_habit_log(habit_id, '2024-07-17')
-            self.habit_db.add_habit_log(habit_id, '2024-07-19')
-            self.habit_db.add_habit_log(habit_id, '2024-07-21')
-            self.habit_db.add_habit_log(habit_id, '2024-07-23')
-            self.habit_db.add_habit_log(habit_id, '2024-07-25')
-            self.habit_db.add_habit_log(habit_id, '2024-08-01')
-            self.habit_db.add_habit_log(habit_id, '2024-08-02')
-            self.habit_db.add_habit_log(habit_id, '2024-08-03')
-
-            habit_id = self.habit_db.get_habit_id_by_name("reading")
-            self.habit_db.add_habit_log(habit_id, '2024-07-10')
-            self.habit_db.add_habit_log(habit_id, '2024-07-20')
-            self.habit_db.add_habit_log(habit_id, '2024-07-26')
-
-            habit_id = self.habit_db.get_habit_id_by_name("3L Water")
-            self.habit_db.add_habit_log(habit_id, '2024-07-05')
-            self.habit_db.add_habit_log(habit_id, '2024-07-06')
-            self.habit_db.add_habit_log(habit_id, '2024-07-07')
-            self.habit_db.add_habit_log(habit_id, '2024-07-10')
-            self.habit_db.add_habit_log(habit_id, '2024-07-12')
-            self.habit_db.add_habit_log(habit_id, '2024-07-14')
-            self.habit_db.add_habit_log(habit_id, '2024-07-15')
-            self.habit_db.add_habit_log(habit_id, '2024-07-16')
-            self.habit_db.add_habit_log(habit_id, '2024-07-17')
-            self.habit_db.add_habit_log(habit_id, '2024-07-27')
-            self.habit_db.add_habit_log(habit_id, '2024-08-01')
-            self.habit_db.add_habit_log(habit_id, '2024-08-02')
-            self.habit_db.add_habit_log(habit_id, '2024-08-03')
-
-
-            # Shows a success message
-            messagebox.showinfo('It worked!', 'Predefined Habits Added')
+            def add(habit_db, job):
+                if habit_db.habit_exists("running"):
+                    return False
+
+                # Insert the habits and their logs in one transaction
+                with habit_db.transaction():
+                    habit_db.add_habits_bulk([
+                        ("running", 1, "sport", '2024-07-04'),
+                        ("swimming", 7, "sport", '2024-07-04'),
+                        ("programming", 2, "university", '2024-07-04'),
+                        ("reading", 7, "university", '2024-07-04'),
+                        ("3L Water", 1, "nutrition", '2024-07-04'),
+                    ])
+
+                    # Completion dates of the predefined habits
+                    pre_def_logs = {
+                        "running": [
+                            '2024-07-05', '2024-07-06', '2024-07-07', '2024-07-10', '2024-07-12', '2024-07-14',
+                            '2024-07-15', '2024-07-16', '2024-07-17', '2024-07-18', '2024-07-19', '2024-07-20',
+                            '2024-07-22', '2024-07-23', '2024-07-24', '2024-07-25', '2024-07-26', '2024-07-27',
+                            '2024-07-28', '2024-08-02', '2024-08-03',
+                        ],
+                        "swimming": [
+                            '2024-07-10', '2024-07-16',
+                        ],
+                        "programming": [
+                            '2024-07-06', '2024-07-08', '2024-07-10', '2024-07-16', '2024-07-17', '2024-07-19',
+                            '2024-07-21', '2024-07-23', '2024-07-25', '2024-08-01', '2024-08-02', '2024-08-03',
+                        ],
+                        "reading": [
+                            '2024-07-10', '2024-07-20', '2024-07-26',
+                        ],
+                        "3L Water": [
+                            '2024-07-05', '2024-07-06', '2024-07-07', '2024-07-10', '2024-07-12', '2024-07-14',
+                            '2024-07-15', '2024-07-16', '2024-07-17', '2024-07-27', '2024-08-01', '2024-08-02',
+                            '2024-08-03',
+                        ],
+                    }
+
+                    # Inserts habit logs in to the database and retrieves habit ID
+                    habit_db.add_habit_logs_bulk(
+                        (habit_db.get_habit_id_by_name(name), completed_at)
+                        for name, dates in pre_def_logs.items()
+                        for completed_at in dates
+                    )
+
+                return True
+
+            def done(added):
+                if not added:
+                    # Habit names are unique, so the predefined habits can only be added once
+                    messagebox.showerror('Error', 'Predefined Habits already added!')
+                    return
+                # Shows a success message
+                messagebox.showinfo('It worked!', 'Predefined Habits Added')
+
+            self.worker.submit(add, on_done=done, on_error=self.show_error)
 
         add_button = Button(pre_def_habit_window,  text='Add', font=('Arial', 30), command=add_pre_def_habit)
         add_button.pack(pady=(50, 0))
 
 
 
-    def sort_by_column(self, tree, col, descending):
+    def sort_by_column(self, table, col, descending, add=False):
         """
-        Sorts the Treeview by the specified column.
+        Sorts the Analyze table by the specified column inside the database and shows its first page.
 
         Parameters:
-        - tree (ttk.Treeview): The Treeview widget to sort.
+        - table (VirtualTable): The table to sort.
         - col (str): The column to sort by.
         - descending (bool): Whether to sort in descending order.
+        - add (bool): Whether to keep the current sort keys and sort by col within them (Shift-click).
         """
-        # Retrieve and sort data
-        data_list = [(tree.set(child, col) if col != "#0" else tree.item(child, "text"), child) for child in
-                     tree.get_children('')]
-
-        if col in ["current_streak", "longest_streak", "total_completed", "Habit ID", "#0"]:
-            data_list.sort(key=lambda t: int(t[0]), reverse=descending)
+        tree = table.tree
+        column = "id" if col == "#0" else col
+        order_by = list(table.order_by) if add else []
+        columns = [key[0] for key in order_by]
+        if column in columns:
+            order_by[columns.index(column)] = (column, descending)
         else:
-            data_list.sort(reverse=descending, key=lambda x: x[0])
+            order_by.append((column, descending))
 
-        for index, (_, child) in enumerate(data_list):
-            tree.move(child, '', index)
+        # Only the visible page is fetched in the new order
+        table.sort(order_by)
 
         # Update column heading to reflect the current sort state
-        tree.heading(col, command=lambda: self.sort_by_column(tree, col, not descending))
+        tree.heading(col, command=lambda: self.sort_by_column(table, col, not descending))
 
         # Remove highlight from the previous sorted column
         if self.current_sort_col is not None:
@@ -457,8 +641,18 @@ class GUI:
         # Update the current sort column
         self.current_sort_col = col
 
+    def show_error(self, error):
+        """
+        Shows the exception of a failed database job.
+
+        Parameters:
+        - error (Exception): The exception raised on the worker thread.
+        """
+        messagebox.showerror('Error', str(error))
+
     def run(self):
         """
-        Starts the Tkinter main loop.
+        Starts the Tkinter main loop, then lets the worker finish its queued jobs.
         """
         self.root.mainloop()
+        self.worker.close()
@@ -0,0 +1,309 @@
+from datetime import date
+from itertools import chain, groupby, islice
+
+
+def __getattr__(name):
+    """
+    Looks up HAS_NUMPY on first use. NumPy is optional and only imported when the "numpy" engine
+    runs; searching sys.path for it would add several milliseconds to every start of the CLI.
+    """
+    if name == "HAS_NUMPY":
+        from importlib.util import find_spec
+
+        global HAS_NUMPY
+        HAS_NUMPY = find_spec("numpy") is not None
+        return HAS_NUMPY
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def to_day(completed_at):
+    """
+    Converts a 'YYYY-MM-DD' date (optionally followed by a time) to its day ordinal.
+
+    Parameters:
+    - completed_at (str): The date to convert.
+
+    Returns:
+    - int: The proleptic Gregorian ordinal of the date, where 0001-01-01 is day 1.
+    """
+    return date.fromisoformat(completed_at[:10]).toordinal()
+
+
+def to_iso(day):
+    """
+    Converts a day ordinal back to a 'YYYY-MM-DD' string for display.
+
+    Parameters:
+    - day (int): The day ordinal, or None.
+
+    Returns:
+    - str: The date in 'YYYY-MM-DD' format, or "N/A" if day is None.
+    """
+    return date.fromordinal(day).isoformat() if day is not None else "N/A"
+
+
+def calculate_metrics(days, periodicity):
+    """
+    Calculates all habit metrics in a single pass over the completion days of one habit.
+
+    Parameters:
+    - days (iterable): Day ordinals of the completed logs of one habit, in ascending order.
+    - periodicity (int): The frequency (in days) at which the habit should be completed.
+
+    Returns:
+    - tuple: (current_streak, longest_streak, last_completed, total_completed)
+    """
+    current_streak = 0
+    longest_streak = 0
+    total_completed = 0
+    previous = None
+
+    for day in days:
+        if previous is not None and day - previous <= periodicity:
+            current_streak += 1  # Extend the running streak
+        else:
+            current_streak = 1  # Start a new streak
+        longest_streak = max(longest_streak, current_streak)
+        total_completed += 1
+        previous = day
+
+    # The streak still running after the newest log is the current streak
+    return current_streak, longest_streak, to_iso(previous), total_completed
+
+
+def analyze_habit_rows(habit_db, habits, cache=None, check=None):
+    """
+    Calculates the metrics of the given habits only, e.g. of one page of the Analyze window.
+
+    Parameters:
+    - habit_db: The database instance holding the habits and their logs.
+    - habits (list): Rows of the habits table.
+    - cache (MetricsCache): Serves the metrics of habits that did not change since they were
+      last calculated, or None to calculate all of them.
+    - check (callable): Called before each habit, e.g. Job.check to stop a cancelled job, or None.
+
+    Returns:
+    - list: One tuple per habit in the column order of analyze_habits.
+    """
+    table = []
+    for habit_id, name, periodicity, category, created_at in habits:
+        if check is not None:
+            check()
+        periodicity = int(periodicity)
+        if cache is None:
+            metrics = calculate_metrics(habit_db.iter_completion_days(habit_id), periodicity)
+        else:
+            metrics = cache.get(habit_db, habit_id, periodicity, lambda: calculate_metrics(
+                habit_db.iter_completion_days(habit_id), periodicity))
+        table.append((habit_id, name, category, periodicity, created_at.split()[0]) + metrics)
+    return table
+
+
+def _analyze_python(habit_db):
+    """
+    Python engine: merges the streamed habits and completion days in a single pass.
+    """
+    # Habits and completions both arrive ordered by habit ID, so they are merged in a single
+    # pass while only the completions of one habit are held at a time.
+    day_groups = groupby(habit_db.iter_all_completion_days(), key=lambda row: row[0])
+    group = next(day_groups, None)
+
+    table = []
+    for habit_id, name, periodicity, category, created_at in habit_db.iter_habits():
+        # Skip completions of deleted habits
+        while group is not None and group[0] < habit_id:
+            group = next(day_groups, None)
+
+        if group is not None and group[0] == habit_id:
+            metrics = calculate_metrics((day for _, day in group[1]), int(periodicity))
+            group = next(day_groups, None)
+        else:
+            metrics = (0, 0, "N/A", 0)
+
+        created_at_str = created_at.split()[0]  # Extract date part
+        table.append((habit_id, name, category, int(periodicity), created_at_str) + metrics)
+    return table
+
+
+def _analyze_sql(habit_db):
+    """
+    SQL engine: computes the streaks inside SQLite with window functions.
+    """
+    return [
+        (habit_id, name, category, int(periodicity), created_at.split()[0],
+         current_streak, longest_streak, to_iso(last_day), total_completed)
+        for habit_id, name, periodicity, category, created_at,
+        current_streak, longest_streak, last_day, total_completed in habit_db.list_habit_metrics()
+    ]
+
+
+def _analyze_numpy(habit_db):
+    """
+    NumPy engine: computes the streaks of all habits with vectorised array operations.
+
+    All completion days are loaded into one array ordered by habit and day. A streak starts
+    where the habit changes or the gap to the previous day exceeds the periodicity; a
+    cumulative sum over those starts numbers the streaks, and reduceat aggregates them per habit.
+    """
+    import numpy as np
+
+    habits = list(habit_db.iter_habits())
+    habit_ids = np.array([habit[0] for habit in habits], dtype=np.int64)
+    periodicities = np.array([int(habit[2]) for habit in habits], dtype=np.int64)
+    order = np.argsort(habit_ids)
+    habit_ids, periodicities = habit_ids[order], periodicities[order]
+
+    pairs = np.fromiter(chain.from_iterable(habit_db.iter_all_completion_days()), dtype=np.int64)
+    log_habits, days = pairs[0::2], pairs[1::2]
+
+    # Skip completions of deleted habits
+    known = np.isin(log_habits, habit_ids)
+    log_habits, days = log_habits[known], days[known]
+
+    metrics = {}
+    if len(days):
+        periodicity = periodicities[np.searchsorted(habit_ids, log_habits)]
+        new_habit = np.empty(len(days), dtype=bool)
+        new_habit[0] = True
+        new_habit[1:] = log_habits[1:] != log_habits[:-1]
+        gaps = np.diff(days, prepend=days[0])
+        streak_starts = np.flatnonzero(new_habit | (gaps > periodicity))
+
+        # Length of every streak, then the first streak of every habit
+        lengths = np.diff(np.append(streak_starts, len(days)))
+        streak_habits = log_habits[streak_starts]
+        first_streaks = np.flatnonzero(np.r_[True, streak_habits[1:] != streak_habits[:-1]])
+        last_streaks = np.append(first_streaks[1:], len(lengths)) - 1
+
+        longest = np.maximum.reduceat(lengths, first_streaks)
+        total = np.add.reduceat(lengths, first_streaks)
+        current = lengths[last_streaks]
+        last_days = days[np.append(streak_starts[first_streaks[1:]], len(days)) - 1]
+
+        for habit_id, current_streak, longest_streak, last_day, total_completed in zip(
+                streak_habits[first_streaks].tolist(), current.tolist(), longest.tolist(),
+                last_days.tolist(), total.tolist()):
+            metrics[habit_id] = (current_streak, longest_streak, to_iso(last_day), total_completed)
+
+    return [
+        (habit_id, name, category, int(periodicity), created_at.split()[0]) + metrics.get(habit_id, (0, 0, "N/A", 0))
+        for habit_id, name, periodicity, category, created_at in habits
+    ]
+
+
+# The query-only database of a worker process of iter_analyze_parallel
+_shard_db = None
+
+
+def _open_shard_db(db_class, db_path):
+    """
+    Opens the read-only connection of a worker process.
+    """
+    global _shard_db
+    _shard_db = db_class(db_path, read_only=True)
+
+
+def _analyze_shard(habits):
+    """
+    Calculates the metrics of one shard of habits in a worker process.
+    """
+    return analyze_habit_rows(_shard_db, habits)
+
+
+def iter_analyze_parallel(habit_db, workers=None, shard_size=500):
+    """
+    Calculates the metrics of all habits in worker processes and streams them back.
+
+    The habits are split into shards of consecutive IDs. Every worker process opens its own
+    read-only connection to the database file and calculates the metrics of one shard at a
+    time, so the work spreads over the cores. Only committed data is visible to the workers.
+    An in-memory database cannot be opened by other processes, so its shards are calculated
+    in the calling process instead.
+
+    Parameters:
+    - habit_db: The database instance; its class and db_path are used to connect the workers.
+    - workers (int): The number of worker processes. Defaults to the number of CPUs.
+    - shard_size (int): The number of habits per shard.
+
+    Returns:
+    - generator: One tuple per habit in the column order of analyze_habits, in ID order, as
+      soon as its shard is done.
+    """
+    habits = habit_db.iter_habits()
+    shards = iter(lambda: list(islice(habits, shard_size)), [])
+    if habit_db.db_path == ":memory:":
+        for shard in shards:
+            yield from analyze_habit_rows(habit_db, shard)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_open_shard_db,
+                               initargs=(type(habit_db), habit_db.db_path))
+    try:
+        # map hands the shards out as workers become free and returns them in order
+        for rows in pool.map(_analyze_shard, shards):
+            yield from rows
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def _analyze_parallel(habit_db):
+    """
+    Parallel engine: calculates the metrics in one worker process per CPU.
+    """
+    return list(iter_analyze_parallel(habit_db))
+
+
+def format_summary_rows(rows):
+    """
+    Brings rows of habits joined with their cached summaries into the column order of analyze_habits.
+
+    Parameters:
+    - rows (list): Rows as returned by Main_Db.list_habit_stats or Main_Db.list_habits_sorted.
+
+    Returns:
+    - list: One tuple per habit in the column order of analyze_habits.
+    """
+    return [
+        (habit_id, name, category, int(periodicity), created_at.split()[0]) + tuple(metrics)
+        for habit_id, name, periodicity, category, created_at, *metrics in rows
+    ]
+
+
+def _analyze_cached(habit_db):
+    """
+    Cached engine: reads the metrics from the habit_stats summary table.
+    """
+    return format_summary_rows(habit_db.list_habit_stats())
+
+
+# The interchangeable implementations of analyze_habits, by name
+ENGINES = {
+    "python": _analyze_python,
+    "sql": _analyze_sql,
+    "cached": _analyze_cached,
+    "numpy": _analyze_numpy,
+    "parallel": _analyze_parallel,
+}
+
+
+def analyze_habits(habit_db, engine="python"):
+    """
+    Calculates the metrics of every habit in one batch.
+
+    Parameters:
+    - habit_db: The database instance holding the habits and their logs.
+    - engine (str): One of ENGINES: "python" streams the logs through calculate_metrics, "sql"
+      computes the streaks inside SQLite, "cached" reads the maintained summaries,
+      "numpy" vectorises the calculation (requires NumPy, see HAS_NUMPY) and "parallel"
+      spreads it over worker processes (see iter_analyze_parallel).
+
+    Returns:
+    - list: One tuple per habit in the column order of the Analyze window:
+      (habit_id, name, category, periodicity, created_at, current_streak,
+      longest_streak, last_completed, total_completed)
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown analytics engine: {engine}")
+    return ENGINES[engine](habit_db)
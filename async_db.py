@@ -0,0 +1,132 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from db import Main_Db
+
+
+def _reader(name):
+    """
+    Turns a read method of Main_Db into a coroutine that runs on one of the reader threads.
+    """
+    @wraps(getattr(Main_Db, name))
+    async def coroutine(self, *args, **kwargs):
+        return await self._submit(self._readers, lambda habit_db: getattr(habit_db, name)(*args, **kwargs))
+    return coroutine
+
+
+def _writer(name):
+    """
+    Turns a write method of Main_Db into a coroutine that runs on the writer thread.
+    """
+    @wraps(getattr(Main_Db, name))
+    async def coroutine(self, *args, **kwargs):
+        return await self._submit(self._writer, lambda habit_db: getattr(habit_db, name)(*args, **kwargs))
+    return coroutine
+
+
+class AsyncMainDb:
+    """
+    Mirrors the Main_Db methods as coroutines, so an event loop can query and complete many
+    habits concurrently without blocking.
+
+    The methods run on one Main_Db with read connections, so the connections are pooled by
+    Main_Db as for the server; the executors only run the calls. Writes are serialised on a
+    single writer thread, since SQLite only allows one writer at a time. Reads run on a pool of
+    reader threads, each on its read connection of the Main_Db. The database is switched to WAL
+    mode so readers do not wait for the writer; it must therefore be a file, not ":memory:".
+    """
+
+    def __init__(self, db_path="main.db", readers=4, **db_options):
+        """
+        Opens the database and initializes the writer and reader thread pools. The read
+        connections are opened by Main_Db on the first read of each reader thread.
+
+        Parameters:
+        - db_path (str): Path to the SQLite database file.
+        - readers (int): The number of reader threads and read connections.
+        - db_options: Further keyword arguments for Main_Db, e.g. synchronous="NORMAL".
+        """
+        self.db = Main_Db(db_path, readers=readers, **db_options)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="AsyncMainDb-writer")
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="AsyncMainDb-reader")
+
+    def _submit(self, executor, func):
+        """
+        Schedules func(db) on a pool and returns an awaitable for its result.
+        """
+        return asyncio.get_running_loop().run_in_executor(executor, partial(func, self.db))
+
+    async def read(self, func):
+        """
+        Runs func(db) on a reader thread, whose reads use its read connection of the Main_Db.
+
+        Parameters:
+        - func (callable): Takes the Main_Db and only reads. It must not return a generator,
+          since its reads would then run on the event loop.
+
+        Returns:
+        - The return value of func.
+        """
+        return await self._submit(self._readers, func)
+
+    async def write(self, func):
+        """
+        Runs func(db) on the writer thread; the writes of func are committed together.
+
+        Parameters:
+        - func (callable): Takes the Main_Db.
+
+        Returns:
+        - The return value of func.
+        """
+        def transaction(habit_db):
+            with habit_db.transaction():
+                return func(habit_db)
+        return await self._submit(self._writer, transaction)
+
+    def close(self):
+        """
+        Waits for the running jobs, then closes the Main_Db and its connections.
+        """
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self.db.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    # Schema
+    create_table = _writer("create_table")
+    migrate = _writer("migrate")
+
+    # Writes
+    add_habits = _writer("add_habits")
+    add_habits_bulk = _writer("add_habits_bulk")
+    edit_habits = _writer("edit_habits")
+    delete_habits = _writer("delete_habits")
+    add_habit_log = _writer("add_habit_log")
+    add_habit_logs_bulk = _writer("add_habit_logs_bulk")
+    complete_habits = _writer("complete_habits")
+    update_habit_updated_at = _writer("update_habit_updated_at")
+    rebuild_habit_stats = _writer("rebuild_habit_stats")
+
+    # Reads
+    habit_exists = _reader("habit_exists")
+    count_habits = _reader("count_habits")
+    list_all_habits = _reader("list_all_habits")
+    list_all_logs = _reader("list_all_logs")
+    list_habits_page = _reader("list_habits_page")
+    list_habits_sorted = _reader("list_habits_sorted")
+    get_habit_id_at = _reader("get_habit_id_at")
+    list_habit_metrics = _reader("list_habit_metrics")
+    get_habits_id = _reader("get_habits_id")
+    get_logs_between = _reader("get_logs_between")
+    count_completions_between = _reader("count_completions_between")
+    get_habit_stats = _reader("get_habit_stats")
+    list_habit_stats = _reader("list_habit_stats")
+    check_habit_stats = _reader("check_habit_stats")
+    get_habit_id_by_name = _reader("get_habit_id_by_name")
@@ -0,0 +1,9 @@
+"""
+Benchmark scripts for the Habit Tracker.
+
+Run a benchmark from the repository root, e.g. ``python -m benchmarks.bench_analytics``.
+``python -m benchmarks.suite`` times the everyday operations at several scales on generated
+data and saves the results as JSON; pass ``--compare`` an earlier file to find regressions.
+All benchmarks generate their data with ``benchmarks.synthetic``, loaded through
+``benchmarks.common`` by the single benchmarks.
+"""
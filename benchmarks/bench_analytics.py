@@ -0,0 +1,43 @@
+"""
+Compares the batched analytics engines with the per-habit Habit methods.
+
+Usage: python -m benchmarks.bench_analytics [habits ...]
+"""
+import sys
+
+from analytics import ENGINES, HAS_NUMPY, analyze_habits
+from benchmarks.common import best_of, make_db
+from habit import Habit
+
+DAYS = 365
+
+
+def per_habit(habit_db):
+    """
+    Mirrors the original Analyze window: one Habit and four metric queries per habit.
+    """
+    table = []
+    for habit in habit_db.list_all_habits():
+        habit_instance = Habit.from_row(habit, habit_db)
+        table.append((
+            habit_instance.calculate_current_streak(),
+            habit_instance.calculate_longest_streak(),
+            habit_instance.calculate_last_completed(),
+            habit_instance.calculate_total_completed()
+        ))
+    return table
+
+
+def main(sizes):
+    engines = [engine for engine in ENGINES if engine != "numpy" or HAS_NUMPY]
+    print(f"{'habits':>8} {'per-habit (s)':>14}" + "".join(f" {engine + ' (s)':>13}" for engine in engines))
+    for habits in sizes:
+        habit_db = make_db(habits, DAYS)
+        line = f"{habits:>8} {best_of(lambda: per_habit(habit_db)):>14.3f}"
+        for engine in engines:
+            line += f" {best_of(lambda: analyze_habits(habit_db, engine=engine)):>13.4f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100, 300, 1000])
@@ -0,0 +1,116 @@
+"""
+Measures the throughput of concurrent mixed reads and writes through AsyncMainDb, against the
+same operations run one after another on a plain Main_Db.
+
+Usage: python -m benchmarks.bench_async [operations] [concurrency]
+
+Four in five operations read the logs of a random habit, the others complete one. Besides the
+throughput, the longest stall of the event loop is reported: a plain Main_Db blocks the loop for
+the whole run, AsyncMainDb only for the hand-off of each operation.
+"""
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from async_db import AsyncMainDb
+from benchmarks.common import make_db
+from db import Main_Db
+
+HABITS = 200
+DAYS = 365
+WRITE_SHARE = 0.2
+
+
+def operations(count, seed=1):
+    """
+    Returns the mixed workload: (is_write, habit_id, completed_at) tuples.
+    """
+    rng = random.Random(seed)
+    return [(rng.random() < WRITE_SHARE, rng.randint(1, HABITS), f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+            for _ in range(count)]
+
+
+async def measure(workload_coroutine):
+    """
+    Runs a workload and returns its wall-clock time and the longest event loop stall in seconds.
+    """
+    stalls = [0.0]
+    done = asyncio.Event()
+
+    async def monitor():
+        while not done.is_set():
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append(time.perf_counter() - before - 0.001)
+
+    monitor_task = asyncio.create_task(monitor())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await workload_coroutine
+    elapsed = time.perf_counter() - start
+    done.set()
+    await monitor_task
+    return elapsed, max(stalls)
+
+
+async def run_sync(db_path, workload):
+    habit_db = Main_Db(db_path, journal_mode="WAL")
+
+    async def run():
+        for is_write, habit_id, completed_at in workload:
+            if is_write:
+                habit_db.add_habit_log(habit_id, completed_at)
+            else:
+                habit_db.get_habits_id(habit_id)
+
+    result = await measure(run())
+    habit_db.conn.close()
+    return result
+
+
+async def run_async(db_path, workload, readers, concurrency):
+    async with AsyncMainDb(db_path, readers=readers) as habit_db:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def operation(is_write, habit_id, completed_at):
+            async with semaphore:
+                if is_write:
+                    await habit_db.add_habit_log(habit_id, completed_at)
+                else:
+                    await habit_db.get_habits_id(habit_id)
+
+        await habit_db.count_habits()  # Open the first connections before timing
+        return await measure(asyncio.gather(*(operation(*op) for op in workload)))
+
+
+def main(count, concurrency):
+    workload = operations(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, "template.db")
+        make_db(HABITS, DAYS, template).conn.close()
+        print(f"{count} operations ({WRITE_SHARE:.0%} writes), {HABITS} habits, concurrency {concurrency}, "
+              f"{os.cpu_count()} CPUs")
+        print(f"{'mode':<24} {'ops/s':>10} {'max loop stall (ms)':>20}")
+
+        def fresh_copy():
+            path = os.path.join(tmp, "main.db")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            shutil.copy(template, path)
+            return path
+
+        elapsed, stall = asyncio.run(run_sync(fresh_copy(), workload))
+        print(f"{'Main_Db, sequential':<24} {count / elapsed:>10.0f} {stall * 1000:>20.1f}")
+        for readers in (1, 2, 4, 8):
+            elapsed, stall = asyncio.run(run_async(fresh_copy(), workload, readers, concurrency))
+            print(f"{f'AsyncMainDb, {readers} readers':<24} {count / elapsed:>10.0f} {stall * 1000:>20.1f}")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args or [5000, 64]))
@@ -0,0 +1,77 @@
+"""
+Compares the bitmap storage of BitmapMainDb with the habit_logs table: file size and the latency
+of the metric calculations.
+
+Usage: python -m benchmarks.bench_bitmap [habits] [years]
+
+The same generated history is stored both ways; the bitmap copy is made with pack_logs() and
+both files are vacuumed before they are measured.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+from analytics import analyze_habits, to_iso
+from benchmarks.common import best_of, make_db
+from bitmap_db import BitmapMainDb
+from db import Main_Db
+from habit import Habit
+
+
+def timings(habit_db, window_end):
+    """
+    Returns the timings of the metric calculations on a database, in seconds.
+    """
+    instances = [Habit.from_row(row, habit_db) for row in habit_db.list_all_habits()]
+
+    def habit_metrics():
+        for habit in instances:
+            habit.calculate_current_streak()
+            habit.calculate_longest_streak()
+            habit.calculate_last_completed()
+            habit.calculate_total_completed()
+
+    return {
+        "Habit metrics": best_of(habit_metrics),
+        "30-day window": best_of(lambda: [habit.completions_in_window(30, until=window_end) for habit in instances]),
+        "analyze python": best_of(lambda: analyze_habits(habit_db, engine="python")),
+        "analyze sql": best_of(lambda: analyze_habits(habit_db, engine="sql")),
+    }
+
+
+def main(habits=200, years=3):
+    directory = tempfile.mkdtemp()
+    try:
+        table_path = os.path.join(directory, "table.db")
+        bitmap_path = os.path.join(directory, "bitmap.db")
+        make_db(habits, years * 365, table_path).compact_logs()
+        shutil.copy(table_path, bitmap_path)
+
+        table_db = Main_Db(table_path)
+        bitmap_db = BitmapMainDb(bitmap_path)
+        bitmap_db.create_table()
+        bitmap_db.pack_logs()
+        bitmap_db.compact_logs()
+        assert analyze_habits(bitmap_db) == analyze_habits(table_db)
+
+        window_end = to_iso(max(table_db.iter_completion_days(1)))
+        table_times, bitmap_times = timings(table_db, window_end), timings(bitmap_db, window_end)
+        completions = table_db.conn.execute("SELECT COUNT(*) FROM habit_logs").fetchone()[0]
+        table_size, bitmap_size = os.path.getsize(table_path), os.path.getsize(bitmap_path)
+        table_db.close()
+        bitmap_db.close()
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"{habits} habits, {years} years, {completions:,} completions")
+    print(f"{'':<18}{'habit_logs':>12}{'bitmaps':>12}{'ratio':>9}")
+    print(f"{'file size (KiB)':<18}{table_size // 1024:>12,}{bitmap_size // 1024:>12,}"
+          f"{table_size / bitmap_size:>8.1f}x")
+    for name in table_times:
+        print(f"{name + ' (ms)':<18}{table_times[name] * 1000:>12.1f}{bitmap_times[name] * 1000:>12.1f}"
+              f"{table_times[name] / bitmap_times[name]:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,73 @@
+"""
+Compares the insert throughput of add_habit_log with add_habit_logs_bulk and the file importer.
+
+Usage: python -m benchmarks.bench_bulk [rows]
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from db import Main_Db
+from importer import import_logs
+
+HABITS = 100
+
+
+def fresh_db(path):
+    if os.path.exists(path):
+        os.remove(path)
+    habit_db = Main_Db(path)
+    habit_db.create_table()
+    habit_db.add_habits_bulk((f"habit {i}", 1, "sport", '2020-01-01') for i in range(HABITS))
+    return habit_db
+
+
+def logs(rows):
+    """
+    Yields rows of daily completions spread over all habits, in date order per habit.
+    """
+    start = date(2020, 1, 1)
+    for i in range(rows):
+        yield i % HABITS + 1, (start + timedelta(days=i // HABITS)).isoformat()
+
+
+def rate(rows, func):
+    start = time.perf_counter()
+    func()
+    return rows / (time.perf_counter() - start)
+
+
+def main(rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "main.db")
+
+        # The per-row path commits every row, so it is measured on a smaller sample
+        per_row_rows = min(rows, 2000)
+        habit_db = fresh_db(path)
+        per_row = rate(per_row_rows, lambda: [habit_db.add_habit_log(*log) for log in logs(per_row_rows)])
+        habit_db.conn.close()
+
+        habit_db = fresh_db(path)
+        bulk = rate(rows, lambda: habit_db.add_habit_logs_bulk(logs(rows), chunk_size=10000))
+        habit_db.conn.close()
+
+        csv_path = os.path.join(tmp, "logs.csv")
+        with open(csv_path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["habit_id", "completed_at"])
+            writer.writerows(logs(rows))
+        habit_db = fresh_db(path)
+        imported = rate(rows, lambda: import_logs(habit_db, csv_path, chunk_size=10000))
+        habit_db.conn.close()
+
+    print(f"{'path':<22} {'rows/s':>12}")
+    print(f"{'add_habit_log':<22} {per_row:>12,.0f}")
+    print(f"{'add_habit_logs_bulk':<22} {bulk:>12,.0f}")
+    print(f"{'import_logs (CSV)':<22} {imported:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,50 @@
+"""
+Compares streak calculation over 'YYYY-MM-DD' strings parsed with strptime against the
+integer completed_day column.
+
+Usage: python -m benchmarks.bench_day_ordinals [habits] [days]
+"""
+import sys
+from datetime import datetime
+
+from analytics import calculate_metrics
+from benchmarks.common import best_of, make_db
+from habit import Habit
+
+
+def longest_streak_from_text(habit_db, habit_id, periodicity):
+    """
+    The text-based approach: parse every completed_at string into a datetime.
+    """
+    dates = [datetime.strptime(log[3], '%Y-%m-%d') for log in habit_db.iter_logs(habit_id) if log[2] == 1]
+    longest_streak = current_streak = 0
+    for i, completed_at in enumerate(dates):
+        if i and (completed_at - dates[i - 1]).days <= periodicity:
+            current_streak += 1
+        else:
+            current_streak = 1
+        longest_streak = max(longest_streak, current_streak)
+    return longest_streak
+
+
+def main(habits, days):
+    habit_db = make_db(habits, days)
+    rows = list(habit_db.iter_habits())
+    instances = [Habit.from_row(row, habit_db) for row in rows]
+    logs = habit_db.conn.execute("SELECT COUNT(*) FROM habit_logs").fetchone()[0]
+
+    text = best_of(lambda: [longest_streak_from_text(habit_db, row[0], row[2]) for row in rows])
+    ints = best_of(lambda: [habit.calculate_longest_streak() for habit in instances])
+    print(f"longest streak over {logs:,} logs: text {text:.3f}s, day ordinals {ints:.3f}s, {text / ints:.1f}x")
+
+    # The pure calculation, without the query
+    dates = [log[3] for log in habit_db.iter_logs(None)]
+    day_ordinals = [log[4] for log in habit_db.iter_logs(None)]
+    parse = best_of(lambda: [datetime.strptime(date, '%Y-%m-%d') for date in dates])
+    metrics = best_of(lambda: calculate_metrics(day_ordinals, 1))
+    print(f"per row: strptime {parse / logs * 1e9:.0f}ns, integer metrics {metrics / logs * 1e9:.0f}ns")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args or [200, 1000]))
@@ -0,0 +1,103 @@
+"""
+Measures the one-time deduplication of the completion logs: the rows and bytes it reclaims and the
+speedup of the metric calculations afterwards.
+
+Usage: python -m benchmarks.bench_dedupe [habits] [days] [max_repeats]
+
+The history is generated like the other benchmarks, but every completion is logged one to
+max_repeats times, as repeated clicks on "Complete" used to do. The database is first migrated up
+to the schema before the per-day constraint, measured, then migrated, compacted and measured again.
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import db as db_module
+from analytics import analyze_habits
+from benchmarks.common import best_of, populate
+from db import Main_Db
+from habit import Habit
+
+
+def repeat_logs(habit_db, max_repeats, seed=0):
+    """
+    Logs every completion again up to max_repeats - 1 times.
+    """
+    rng = random.Random(seed)
+    cur = habit_db.conn.cursor()
+    cur.execute("SELECT habit_id, completed_at FROM habit_logs")
+    repeats = [log for log in cur.fetchall() for _ in range(rng.randint(0, max_repeats - 1))]
+    cur.executemany("INSERT INTO habit_logs (habit_id, completed_at, completed) VALUES (?, ?, 1)", repeats)
+    habit_db.conn.commit()
+
+
+def migrate_before_constraint(habit_db):
+    """
+    Applies every migration except the per-day constraint, to measure the old schema.
+    """
+    all_migrations = list(db_module.MIGRATIONS)
+    try:
+        del db_module.MIGRATIONS[len(all_migrations) - 1:]
+        habit_db.migrate()
+    finally:
+        db_module.MIGRATIONS[:] = all_migrations
+
+
+def measure(habit_db):
+    """
+    Returns the number of logs and the timings of the per-habit metrics and of analyze_habits.
+    """
+    count = habit_db.conn.execute("SELECT COUNT(*) FROM habit_logs").fetchone()[0]
+    instances = [Habit.from_row(row, habit_db) for row in habit_db.list_all_habits()]
+
+    def habit_metrics():
+        for habit in instances:
+            habit.calculate_current_streak()
+            habit.calculate_longest_streak()
+            habit.calculate_last_completed()
+            habit.calculate_total_completed()
+
+    return count, best_of(habit_metrics), best_of(lambda: analyze_habits(habit_db, engine="python"))
+
+
+def main(habits=200, days=3 * 365, max_repeats=4):
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "main.db")
+        habit_db = Main_Db(path)
+        habit_db.create_table(migrate=False)
+        populate(habit_db, habits, days)
+        repeat_logs(habit_db, max_repeats)
+        migrate_before_constraint(habit_db)
+        size_before = os.path.getsize(path)
+        logs_before, habit_before, analyze_before = measure(habit_db)
+
+        start = time.perf_counter()
+        habit_db.migrate()
+        migrate_time = time.perf_counter() - start
+        start = time.perf_counter()
+        habit_db.compact_logs()
+        compact_time = time.perf_counter() - start
+        size_after = os.path.getsize(path)
+        logs_after, habit_after, analyze_after = measure(habit_db)
+        habit_db.close()
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"{habits} habits, {days} days, every completion logged 1-{max_repeats} times")
+    print(f"migration {migrate_time * 1000:.0f} ms, compact_logs {compact_time * 1000:.0f} ms")
+    print(f"{'':<22}{'before':>12}{'after':>12}{'change':>10}")
+    print(f"{'logs':<22}{logs_before:>12,}{logs_after:>12,}{logs_after / logs_before - 1:>10.0%}")
+    print(f"{'file size (KiB)':<22}{size_before // 1024:>12,}{size_after // 1024:>12,}"
+          f"{size_after / size_before - 1:>10.0%}")
+    print(f"{'Habit metrics (ms)':<22}{habit_before * 1000:>12.1f}{habit_after * 1000:>12.1f}"
+          f"{habit_before / habit_after:>9.1f}x")
+    print(f"{'analyze python (ms)':<22}{analyze_before * 1000:>12.1f}{analyze_after * 1000:>12.1f}"
+          f"{analyze_before / analyze_after:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
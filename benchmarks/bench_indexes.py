@@ -0,0 +1,66 @@
+"""
+Measures lookup latency on a log table of about 1M rows before and after the schema migrations.
+
+Usage: python -m benchmarks.bench_indexes [habits] [days]
+"""
+import os
+import random
+import sys
+import tempfile
+
+from benchmarks.common import best_of, populate
+from db import Main_Db
+
+LOOKUPS = 200
+
+
+def measure(habit_db, habits):
+    """
+    Returns the mean latency in milliseconds of each hot lookup.
+    """
+    rng = random.Random(1)
+    habit_ids = [rng.randint(1, habits) for _ in range(LOOKUPS)]
+    names = dict(habit_db.conn.execute("SELECT id, name FROM habits").fetchall())
+
+    def get_logs():
+        for habit_id in habit_ids:
+            habit_db.get_habits_id(habit_id)
+
+    def get_id_by_name():
+        for habit_id in habit_ids:
+            habit_db.get_habit_id_by_name(names[habit_id])
+
+    def find_log():
+        for habit_id in habit_ids:
+            habit_db.conn.execute(
+                "SELECT completed FROM habit_logs WHERE completed_at = ? AND habit_id = ?",
+                ('2022-06-01', habit_id)).fetchall()
+
+    return {
+        "get_habits_id": best_of(get_logs) / LOOKUPS * 1000,
+        "get_habit_id_by_name": best_of(get_id_by_name) / LOOKUPS * 1000,
+        "log by (habit_id, completed_at)": best_of(find_log) / LOOKUPS * 1000,
+    }
+
+
+def main(habits, days):
+    with tempfile.TemporaryDirectory() as tmp:
+        habit_db = Main_Db(os.path.join(tmp, "main.db"))
+        habit_db.create_table(migrate=False)
+        populate(habit_db, habits, days)
+        rows = habit_db.conn.execute("SELECT COUNT(*) FROM habit_logs").fetchone()[0]
+        print(f"{rows} log rows, {habits} habits")
+
+        before = measure(habit_db, habits)
+        habit_db.migrate()
+        after = measure(habit_db, habits)
+        habit_db.conn.close()
+
+    print(f"{'lookup':<34} {'before (ms)':>12} {'after (ms)':>11}")
+    for name in before:
+        print(f"{name:<34} {before[name]:>12.3f} {after[name]:>11.3f}")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args or [1000, 1250]))
@@ -0,0 +1,57 @@
+"""
+Measures the overhead of the profiler on the Habit metrics and a page of the Analyze window.
+
+Usage: python -m benchmarks.bench_instrumentation [habits] [days]
+
+Each workload runs uninstrumented, instrumented, instrumented with SQL tracing, and after
+uninstrument() to show that nothing is left behind. The slowest statements of the traced run
+are printed at the end.
+"""
+import sys
+
+from analytics import analyze_habit_rows
+from benchmarks.common import best_of, make_db
+from habit import Habit
+from instrumentation import Profiler
+
+
+def main(habits=500, days=365):
+    habit_db = make_db(habits, days)
+    rows = habit_db.list_all_habits()
+
+    def habit_metrics():
+        for row in rows:
+            habit = Habit.from_row(row, habit_db)
+            habit.calculate_current_streak()
+            habit.calculate_longest_streak()
+            habit.calculate_last_completed()
+            habit.calculate_total_completed()
+
+    def analyze_page():
+        analyze_habit_rows(habit_db, habit_db.list_habits_page(0, 100))
+
+    workloads = {"Habit metrics": habit_metrics, "Analyze page": analyze_page}
+    timings = {name: [best_of(func, repeat=5)] for name, func in workloads.items()}
+    for trace_sql in (False, True):
+        profiler = Profiler(trace_sql=trace_sql)
+        profiler.instrument_db(habit_db)
+        profiler.instrument_habits()
+        for name, func in workloads.items():
+            timings[name].append(best_of(func, repeat=5))
+        profiler.uninstrument()
+    for name, func in workloads.items():
+        timings[name].append(best_of(func, repeat=5))
+
+    print(f"{habits} habits, {days} days of history")
+    print(f"{'':<16}{'off ms':>10}{'on ms':>10}{'+sql ms':>10}{'removed ms':>12}")
+    for name, (off, on, traced, removed) in timings.items():
+        print(f"{name:<16}{off * 1000:>10.1f}{on * 1000:>10.1f}{traced * 1000:>10.1f}{removed * 1000:>12.1f}")
+
+    slowest = sorted(profiler.stats()["statements"].items(), key=lambda item: -item[1]["total_seconds"])[:3]
+    print("slowest statements of the traced run:")
+    for sql, stats in slowest:
+        print(f"  {stats['total_seconds'] * 1000:8.1f} ms {stats['count']:>7} x  {sql[:70]}")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
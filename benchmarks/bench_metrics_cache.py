@@ -0,0 +1,63 @@
+"""
+Measures the metrics cache: reopening the Analyze window and reading the metrics of a habit
+after it was completed, with and without a MetricsCache.
+
+Usage: python -m benchmarks.bench_metrics_cache [habits] [days]
+
+A reopened window pages through all habits with a new HabitPager; with the cache only the
+habits completed in between are recalculated.
+"""
+import sys
+
+from benchmarks.common import best_of, make_db
+from habit import Habit
+from metrics_cache import MetricsCache
+from pager import HabitPager
+
+
+def open_window(habit_db, cache):
+    """
+    Analyzes every row, as scrolling through a new Analyze window does.
+    """
+    pager = HabitPager(habit_db, cache=cache)
+    return pager.rows(0, len(pager))
+
+
+def main(habits=2000, days=365):
+    habit_db = make_db(habits, days)
+    rows = habit_db.list_all_habits()
+    cache = MetricsCache(maxsize=habits)
+    assert open_window(habit_db, cache) == open_window(habit_db, None)
+
+    def complete_and_show(cache):
+        # The metrics the Complete window calculates, then an unchanged habit's detail view
+        habit = Habit.from_row(rows[0], habit_db, cache)
+        habit.calculate_current_streak(), habit.calculate_longest_streak()
+        other = Habit.from_row(rows[1], habit_db, cache)
+        return (other.calculate_current_streak(), other.calculate_longest_streak(),
+                other.calculate_last_completed(), other.calculate_total_completed())
+
+    timings = {
+        "reopen Analyze window": (best_of(lambda: open_window(habit_db, None)),
+                                  best_of(lambda: open_window(habit_db, cache))),
+        "Habit metrics x4": (best_of(lambda: complete_and_show(None)),
+                             best_of(lambda: complete_and_show(cache))),
+    }
+
+    # After a completion only the completed habit is recalculated
+    habit_db.add_habit_log(rows[0][0], "2100-01-01")
+    misses = cache.misses
+    timings["reopen after 1 completion"] = (timings["reopen Analyze window"][0],
+                                            best_of(lambda: open_window(habit_db, cache), repeat=1))
+    recalculated = cache.misses - misses
+
+    print(f"{habits} habits, {days} days of history")
+    print(f"{'':<28}{'uncached ms':>12}{'cached ms':>12}{'speedup':>10}")
+    for name, (uncached, cached) in timings.items():
+        print(f"{name:<28}{uncached * 1000:>12.2f}{cached * 1000:>12.2f}{uncached / cached:>9.1f}x")
+    print(f"habits recalculated after the completion: {recalculated}")
+    print("cache:", cache.stats())
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,25 @@
+"""
+Compares the NumPy analytics engine with the scalar Python engine on a large catalogue.
+
+Requires NumPy. Usage: python -m benchmarks.bench_numpy [habits] [days]
+"""
+import sys
+
+from analytics import HAS_NUMPY, analyze_habits
+from benchmarks.common import best_of, make_db
+
+
+def main(habits, days):
+    if not HAS_NUMPY:
+        sys.exit("NumPy is not installed.")
+    habit_db = make_db(habits, days)
+    logs = habit_db.conn.execute("SELECT COUNT(*) FROM habit_logs").fetchone()[0]
+    scalar = best_of(lambda: analyze_habits(habit_db, engine="python"))
+    vectorised = best_of(lambda: analyze_habits(habit_db, engine="numpy"))
+    print(f"{habits:,} habits, {logs:,} logs")
+    print(f"python {scalar:.2f}s, numpy {vectorised:.2f}s, {scalar / vectorised:.1f}x")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args or [100000, 30]))
@@ -0,0 +1,41 @@
+"""
+Measures how the parallel analytics engine scales with the number of worker processes.
+
+Usage: python -m benchmarks.bench_parallel [habits] [days] [max_workers]
+
+Every run calculates the metrics of all habits with iter_analyze_parallel, from 1 up to
+max_workers processes (default: the number of CPUs, at least 2), against the single-process
+Python engine. The speedup cannot exceed the number of CPUs of the machine.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+from analytics import analyze_habits, iter_analyze_parallel
+from benchmarks.common import best_of, make_db
+
+
+def main(habits=5000, days=365, max_workers=None):
+    max_workers = max_workers or max(os.cpu_count() or 1, 2)
+    directory = tempfile.mkdtemp()
+    try:
+        habit_db = make_db(habits, days, os.path.join(directory, "main.db"))
+        expected = analyze_habits(habit_db)
+        assert list(iter_analyze_parallel(habit_db, workers=2)) == expected
+
+        baseline = best_of(lambda: analyze_habits(habit_db), repeat=2)
+        print(f"{habits} habits, {days} days of history, {os.cpu_count()} CPUs")
+        print(f"{'engine':<22}{'seconds':>10}{'speedup':>10}{'efficiency':>12}")
+        print(f"{'python (1 process)':<22}{baseline:>10.2f}{1:>9.2f}x{'':>12}")
+        for workers in range(1, max_workers + 1):
+            elapsed = best_of(lambda: list(iter_analyze_parallel(habit_db, workers=workers)), repeat=2)
+            speedup = baseline / elapsed
+            print(f"{f'parallel, {workers} workers':<22}{elapsed:>10.2f}{speedup:>9.2f}x{speedup / workers:>12.0%}")
+        habit_db.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,73 @@
+"""
+Compares date-windowed queries that read only the window against reading a habit's whole history,
+over multi-year histories.
+
+Usage: python -m benchmarks.bench_ranges [habits] [years]
+
+For every habit it measures:
+- the logs of the last 30 days: get_habits_id filtered in Python vs get_logs_between
+- the completions of the last 30 days: counted in Python vs completions_in_window
+- the current streak: walking all completion days vs the backward walk that stops at the first gap
+"""
+import sys
+
+from analytics import to_day, to_iso
+from benchmarks.common import best_of, make_db
+from habit import Habit
+
+
+def full_history_current_streak(habit):
+    """
+    The current streak computed from the whole history, as before the backward walk.
+    """
+    days = list(habit.db.iter_completion_days(habit.habit_id))
+    streak = 0
+    for newer, older in zip(reversed(days), reversed([None] + days[:-1])):
+        streak += 1
+        if older is None or newer - older > habit.periodicity:
+            break
+    return streak
+
+
+def main(habits=50, years=5):
+    habit_db = make_db(habits, years * 365)
+    instances = [Habit.from_row(row, habit_db) for row in habit_db.list_all_habits()]
+    # The window is the last 30 days of the generated history
+    last_day = max(habit_db.iter_completion_days(1))
+    start_day = last_day - 29
+    start, end = to_iso(start_day), to_iso(last_day)
+
+    def logs_full():
+        return [[log for log in habit_db.get_habits_id(habit.habit_id) if start_day <= to_day(log[3]) <= last_day]
+                for habit in instances]
+
+    def logs_range():
+        return [habit_db.get_logs_between(habit.habit_id, start, end) for habit in instances]
+
+    def count_full():
+        return [sum(1 for day in habit_db.iter_completion_days(habit.habit_id) if start_day <= day <= last_day)
+                for habit in instances]
+
+    def count_window():
+        return [habit.completions_in_window(30, until=end) for habit in instances]
+
+    def streak_full():
+        return [full_history_current_streak(habit) for habit in instances]
+
+    def streak_walk():
+        return [habit.calculate_current_streak() for habit in instances]
+
+    assert logs_full() == logs_range()
+    assert count_full() == count_window()
+    assert streak_full() == streak_walk()
+
+    print(f"{habits} habits with {years} years of history, window of the last 30 days")
+    print(f"{'query':<16}{'whole history ms':>18}{'range ms':>12}{'speedup':>10}")
+    for name, full, ranged in (("logs", logs_full, logs_range), ("count", count_full, count_window),
+                               ("current streak", streak_full, streak_walk)):
+        full_time, ranged_time = best_of(full), best_of(ranged)
+        print(f"{name:<16}{full_time * 1000:>18.2f}{ranged_time * 1000:>12.2f}{full_time / ranged_time:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,124 @@
+"""
+Load-tests a local instance of server.py and reports requests per second and latency
+percentiles, with and without grouped commits of the completions.
+
+Usage: python -m benchmarks.bench_server [requests] [clients]
+
+The server runs in its own process. Every client thread keeps one HTTP/1.1 connection open and
+sends the mixed workload: four in five requests read the metrics of a random habit, the others
+complete one.
+"""
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.common import make_db
+
+HABITS = 200
+DAYS = 365
+WRITE_SHARE = 0.2
+
+
+def start_server(db_path, group_commit):
+    """
+    Starts server.py on a free port and returns the process and its (host, port).
+    """
+    command = [sys.executable, "server.py", "--db", db_path, "--port", "0", "--readers", "4"]
+    if not group_commit:
+        command.append("--no-group-commit")
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()  # "Serving on http://HOST:PORT"
+    host, port = line.rsplit("/", 1)[1].strip().split(":")
+    return process, (host, int(port))
+
+
+def client(address, requests, seed, latencies):
+    """
+    Sends requests over one connection and appends (is_write, seconds) per request.
+    """
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(*address)
+    for _ in range(requests):
+        habit_id = rng.randint(1, HABITS)
+        is_write = rng.random() < WRITE_SHARE
+        start = time.perf_counter()
+        if is_write:
+            body = json.dumps({"completed_at": f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"})
+            conn.request("POST", f"/habits/{habit_id}/completions", body=body,
+                         headers={"Content-Type": "application/json"})
+        else:
+            conn.request("GET", f"/habits/{habit_id}")
+        response = conn.getresponse()
+        response.read()
+        latencies.append((is_write, time.perf_counter() - start))
+        if response.status >= 400:
+            raise RuntimeError(f"Request failed with status {response.status}")
+    conn.close()
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def run(template, requests, clients, group_commit):
+    """
+    Load-tests a server on a copy of the template database and returns its results.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(directory, "main.db")
+        shutil.copy(template, db_path)
+        process, address = start_server(db_path, group_commit)
+        try:
+            latencies = []
+            threads = [threading.Thread(target=client, args=(address, requests // clients, seed, latencies))
+                       for seed in range(clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            process.terminate()
+            process.wait()
+    finally:
+        shutil.rmtree(directory)
+
+    reads = [seconds for is_write, seconds in latencies if not is_write]
+    writes = [seconds for is_write, seconds in latencies if is_write]
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": percentile([seconds for _, seconds in latencies], 0.5),
+        "p99": percentile([seconds for _, seconds in latencies], 0.99),
+        "read_p99": percentile(reads, 0.99),
+        "write_p99": percentile(writes, 0.99),
+    }
+
+
+def main(requests=2000, clients=16):
+    directory = tempfile.mkdtemp()
+    try:
+        template = os.path.join(directory, "template.db")
+        make_db(HABITS, DAYS, template).close()
+        print(f"{requests} requests from {clients} clients, {HABITS} habits with {DAYS} days of history")
+        print(f"{'mode':<22}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'read p99':>10}{'write p99':>11}")
+        for group_commit in (False, True):
+            result = run(template, requests, clients, group_commit)
+            mode = "grouped commits" if group_commit else "one commit per write"
+            print(f"{mode:<22}{result['rps']:>10.0f}{result['p50'] * 1000:>10.2f}{result['p99'] * 1000:>10.2f}"
+                  f"{result['read_p99'] * 1000:>10.2f}{result['write_p99'] * 1000:>11.2f}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
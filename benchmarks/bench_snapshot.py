@@ -0,0 +1,91 @@
+"""
+Compares reports on the database file with reports on an in-memory snapshot of it: the analyze
+latency, and how long a concurrent writer, like a running GUI, waits for its commits meanwhile.
+
+Usage: python -m benchmarks.bench_snapshot [habits] [years]
+
+The file is generated by benchmarks.synthetic and stays in the OS page cache, so the on-disk
+reads do not wait for the disk; the difference comes from SQLite's file locking and the I/O
+layer. With the default rollback journal, a long read holds a shared lock that makes the
+writer's commits wait.
+"""
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from analytics import analyze_habits
+from benchmarks.common import best_of
+from benchmarks.synthetic import synthetic_db
+from db import Main_Db
+
+
+def with_writer(db_path, func):
+    """
+    Runs func while another connection completes a habit every few milliseconds.
+
+    Returns:
+    - tuple: (seconds func took, list of the writer's commit latencies in seconds)
+    """
+    stop = threading.Event()
+    latencies = []
+
+    def write():
+        writer = Main_Db(db_path)
+        day = date(2030, 1, 1)
+        while not stop.is_set():
+            start = time.perf_counter()
+            writer.add_habit_log(1, day.isoformat())
+            latencies.append(time.perf_counter() - start)
+            day += timedelta(days=1)
+            time.sleep(0.005)
+        writer.close()
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    time.sleep(0.05)
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    return elapsed, latencies
+
+
+def main(habits=1000, years=3):
+    directory = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(directory, "main.db")
+        synthetic_db(db_path, habits, years).close()
+        disk_db = Main_Db(db_path)
+        start = time.perf_counter()
+        snapshot = Main_Db.open_snapshot(db_path)
+        load = time.perf_counter() - start
+        refresh = best_of(snapshot.refresh_snapshot)
+        assert analyze_habits(snapshot) == analyze_habits(disk_db)
+
+        print(f"{habits} habits, {years} years, {os.path.getsize(db_path) / 2 ** 20:.1f} MiB; "
+              f"snapshot taken in {load * 1000:.0f} ms, refreshed in {refresh * 1000:.0f} ms")
+        print(f"{'analyze (ms)':<24}{'on disk':>10}{'in memory':>11}{'speedup':>9}")
+        for engine in ("python", "sql", "cached"):
+            on_disk = best_of(lambda: analyze_habits(disk_db, engine=engine))
+            in_memory = best_of(lambda: analyze_habits(snapshot, engine=engine))
+            print(f"{engine:<24}{on_disk * 1000:>10.1f}{in_memory * 1000:>11.1f}{on_disk / in_memory:>8.1f}x")
+
+        print(f"\n{'with a writer':<24}{'analyze ms':>12}{'commits':>9}{'median ms':>11}{'max ms':>9}")
+        for name, habit_db in (("on disk", disk_db), ("in memory", snapshot)):
+            elapsed, latencies = with_writer(db_path, lambda: analyze_habits(habit_db, engine="python"))
+            print(f"{name:<24}{elapsed * 1000:>12.1f}{len(latencies):>9}"
+                  f"{statistics.median(latencies) * 1000:>11.1f}{max(latencies) * 1000:>9.1f}")
+        snapshot.close()
+        disk_db.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
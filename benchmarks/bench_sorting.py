@@ -0,0 +1,84 @@
+"""
+Measures the latency of a header click in the Analyze window: sorting inside SQLite and fetching
+the visible page, against reordering every row on the client as sort_by_column used to.
+
+Usage: python -m benchmarks.bench_sorting [habits] [days]
+
+The Treeview reorder is only measured when a display is available.
+"""
+import sys
+
+from analytics import analyze_habits
+from benchmarks.common import best_of, make_db
+from pager import HabitPager
+
+VISIBLE_ROWS = 25
+NUMERIC = ("current_streak", "longest_streak", "total_completed")
+# In the column order of analytics.analyze_habits
+COLUMNS = ("id", "name", "category", "periodicity", "created_at", "current_streak", "longest_streak",
+           "last_completed", "total_completed")
+
+
+def client_sort(rows, index, numeric):
+    """
+    Sorts all rows by one column, like the old sort_by_column did with the Treeview values.
+    """
+    key = (lambda row: int(row[index])) if numeric else (lambda row: str(row[index]))
+    return sorted(rows, key=key, reverse=True)
+
+
+def treeview_sort(rows):
+    """
+    Returns the time of the old in-widget sort over a Treeview holding every row, or None
+    without a display.
+    """
+    try:
+        from tkinter import Tk, TclError, ttk
+        root = Tk()
+    except (ImportError, TclError):
+        return None
+    tree = ttk.Treeview(root, columns=COLUMNS[1:])
+    for row in rows:
+        tree.insert("", "end", text=row[0], values=row[1:])
+
+    def sort():
+        data_list = [(tree.set(child, "total_completed"), child) for child in tree.get_children('')]
+        data_list.sort(key=lambda t: int(t[0]), reverse=True)
+        for index, (_, child) in enumerate(data_list):
+            tree.move(child, '', index)
+
+    elapsed = best_of(sort)
+    root.destroy()
+    return elapsed
+
+
+def main(habits, days):
+    habit_db = make_db(habits, days)
+    rows = analyze_habits(habit_db, engine="cached")
+    print(f"{habits} habits, {VISIBLE_ROWS} visible rows")
+
+    pager = HabitPager(habit_db)
+
+    def click(order_by, offset=0):
+        pager.sort(order_by)
+        return pager.rows(offset, offset + VISIBLE_ROWS)
+
+    print(f"{'sort key':<34} {'client (ms)':>12} {'server (ms)':>12}")
+    for index, column in enumerate(COLUMNS):
+        client = best_of(lambda: client_sort(rows, index, column in NUMERIC + ("id", "periodicity")))
+        server = best_of(lambda: click([(column, True)]))
+        print(f"{column:<34} {client * 1000:>12.2f} {server * 1000:>12.2f}")
+
+    server = best_of(lambda: click([("category", False), ("current_streak", True)]))
+    print(f"{'category, current_streak DESC':<34} {'':>12} {server * 1000:>12.2f}")
+    server = best_of(lambda: click([("total_completed", True)], habits - VISIBLE_ROWS))
+    print(f"{'total_completed, last page':<34} {'':>12} {server * 1000:>12.2f}")
+
+    elapsed = treeview_sort(rows)
+    if elapsed is not None:
+        print(f"Treeview reorder of all rows by total_completed: {elapsed * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args or [50000, 30]))
@@ -0,0 +1,71 @@
+"""
+Measures the wall-clock startup time of completing one habit through the CLI, against the GUI
+path of main.py up to the point where it opens the window (importing GUI loads Tkinter).
+
+Usage: python -m benchmarks.bench_startup [runs]
+
+Every command runs in a fresh interpreter. The commands take turns, so noise on the machine
+hits all of them alike, and the fastest and the median run are reported. With
+PYTHONDONTWRITEBYTECODE set, run python -m compileall . first, or every run compiles the
+modules changed since their bytecode was written.
+
+Without a display the CLI is not faster than the GUI path: it skips Tkinter (about 15-20 ms to
+import) but pays about as much for argparse, which imports re, gettext and shutil and looks up
+translations while the parser is built, even though only the selected command is built and a
+database of the current schema is not migrated again. Creating the window comes on top of the GUI path, so
+the gain shows with DISPLAY set, and with batch, which starts Python once for many commands.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_time(command):
+    """
+    Returns the wall-clock time in seconds of running a command in a new process.
+    """
+    start = time.perf_counter()
+    subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main(runs):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "main.db")
+        subprocess.run([sys.executable, "cli.py", "--db", db_path, "add", "Run", "1", "Sport"],
+                       cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+
+        commands = {
+            "python -c pass": [sys.executable, "-c", "pass"],
+            "cli.py complete": [sys.executable, "cli.py", "--db", db_path, "complete", "1"],
+            "main.py complete": [sys.executable, "main.py", "--db", db_path, "complete", "1"],
+            # The GUI path of main.py up to the main loop; creating the window needs a display
+            "main.py GUI path": [sys.executable, "-c", (
+                "from db import Main_Db; habit_db = Main_Db(%r); habit_db.create_table(); "
+                "from GUI import GUI" % db_path)],
+        }
+        if os.environ.get("DISPLAY"):
+            commands["main.py GUI window"] = [sys.executable, "-c", (
+                "import os; from db import Main_Db; from GUI import GUI; os.chdir(%r); habit_db = Main_Db(); "
+                "habit_db.create_table(); gui = GUI(); gui.root.update(); gui.root.destroy(); "
+                "gui.worker.close()" % tmp)]
+        else:
+            print("No display: the GUI path is measured without creating the window.")
+        timings = {name: [] for name in commands}
+        for _ in range(runs):
+            for name, command in commands.items():
+                timings[name].append(run_time(command))
+
+        print(f"{'command':<20} {'best (ms)':>10} {'median (ms)':>12}")
+        for name, values in timings.items():
+            print(f"{name:<20} {min(values) * 1000:>10.1f} {statistics.median(values) * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args or [15]))
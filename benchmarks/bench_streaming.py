@@ -0,0 +1,73 @@
+"""
+Compares the peak memory of materialising the log table with fetchall against streaming it
+with Main_Db.iter_logs, on a table with about the given number of rows.
+
+Each measurement runs in a fresh child process and reports its peak resident set size and the
+time to read every row. Pass 10000000 for a 10M-row table; building it takes a few minutes.
+
+Usage: python -m benchmarks.bench_streaming [rows]
+"""
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import populate
+from benchmarks.synthetic import generate_habit
+from db import Main_Db
+
+# The length of every habit's history; the number of habits is chosen to reach the rows
+DAYS = 10 * 365
+
+# The number of habits whose completions estimate the completions per habit
+SAMPLE = 200
+
+
+def build(path, rows):
+    """
+    Creates a database with generated habits holding about the given number of logs in total.
+
+    Returns:
+    - tuple: (number of habits, number of logs)
+    """
+    per_habit = sum(len(generate_habit(0, number, DAYS)[1]) for number in range(1, SAMPLE + 1)) / SAMPLE
+    habits = max(math.ceil(rows / per_habit), 1)
+    habit_db = Main_Db(path, synchronous="OFF")
+    habit_db.create_table(migrate=False)
+    populate(habit_db, habits, DAYS)
+    habit_db.migrate()
+    logs = habit_db.conn.execute("SELECT COUNT(*) FROM habit_logs").fetchone()[0]
+    habit_db.close()
+    return habits, logs
+
+
+def child(mode, path):
+    habit_db = Main_Db(path)
+    started = time.perf_counter()
+    if mode == "fetchall":
+        count = len(habit_db.list_all_logs())
+    else:
+        count = sum(1 for _ in habit_db.iter_logs(None))
+    elapsed = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:<10} {peak_mb:>14.1f} {elapsed:>9.2f} {count:>12,}")
+
+
+def main(rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "main.db")
+        habits, logs = build(path, rows)
+        print(f"{logs:,} log rows of {habits:,} habits")
+        print(f"{'path':<10} {'peak RSS (MB)':>14} {'time (s)':>9} {'rows':>12}")
+        for mode in ("fetchall", "iter_logs"):
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_streaming", "--child", mode, path], check=True)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ["--child"]:
+        child(sys.argv[2], sys.argv[3])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
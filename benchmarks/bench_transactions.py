@@ -0,0 +1,63 @@
+"""
+Measures completion write throughput for each journal_mode/synchronous combination, committing
+every write versus grouping the writes with Main_Db.transaction().
+
+Usage: python -m benchmarks.bench_transactions [writes]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from db import Main_Db
+
+MODES = [
+    ("DELETE", "FULL"),
+    ("DELETE", "NORMAL"),
+    ("WAL", "FULL"),
+    ("WAL", "NORMAL"),
+    ("WAL", "OFF"),
+]
+
+
+def write(habit_db, writes):
+    start = date(2020, 1, 1)
+    for i in range(writes):
+        habit_db.add_habit_log(i % 10 + 1, (start + timedelta(days=i // 10)).isoformat())
+
+
+def measure(path, journal_mode, synchronous, writes, grouped):
+    """
+    Returns the writes per second of one mode on a fresh database.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    habit_db = Main_Db(path, journal_mode=journal_mode, synchronous=synchronous)
+    habit_db.create_table()
+    habit_db.add_habits_bulk((f"habit {i}", 1, "sport", '2020-01-01') for i in range(10))
+
+    started = time.perf_counter()
+    if grouped:
+        with habit_db.transaction():
+            write(habit_db, writes)
+    else:
+        write(habit_db, writes)
+    elapsed = time.perf_counter() - started
+    habit_db.conn.close()
+    return writes / elapsed
+
+
+def main(writes):
+    print(f"{'journal_mode':<13} {'synchronous':<12} {'commit each (w/s)':>18} {'transaction (w/s)':>18}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "main.db")
+        for journal_mode, synchronous in MODES:
+            each = measure(path, journal_mode, synchronous, writes, grouped=False)
+            grouped = measure(path, journal_mode, synchronous, writes, grouped=True)
+            print(f"{journal_mode:<13} {synchronous:<12} {each:>18,.0f} {grouped:>18,.0f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
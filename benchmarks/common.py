@@ -0,0 +1,55 @@
+import time
+from datetime import date, timedelta
+
+from benchmarks.synthetic import generate_habit
+from db import Main_Db
+
+
+def populate(habit_db, habits, days, seed=0, start=date(2022, 1, 1)):
+    """
+    Fills a database with the habits and completions of benchmarks.synthetic, written with
+    plain inserts so that the schema before the migrations can be measured too.
+
+    Parameters:
+    - habit_db (Main_Db): The database to fill. Its tables must be created with
+      create_table(migrate=False); migrate() afterwards derives the indexed columns and summaries.
+    - habits (int): The number of habits to create.
+    - days (int): The number of days of history; habits are created during its first half.
+    - seed (int): The seed of the catalogue, so runs are repeatable.
+    - start (date): The first day of the history.
+    """
+    end = start + timedelta(days=days - 1)
+    cur = habit_db.conn.cursor()
+    for number in range(1, habits + 1):
+        habit, completed = generate_habit(seed, number, days, end)
+        cur.execute("INSERT INTO habits (id, name, periodicity, category, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (number, *habit))
+        cur.executemany("INSERT INTO habit_logs (habit_id, completed_at, completed) VALUES (?, ?, 1)",
+                        ((number, day) for day in completed))
+    habit_db.conn.commit()
+
+
+def make_db(habits, days, db_path=":memory:", seed=0):
+    """
+    Creates a database with its tables and fills it with a generated catalogue.
+
+    Returns:
+    - Main_Db: The filled database.
+    """
+    habit_db = Main_Db(db_path)
+    habit_db.create_table(migrate=False)
+    populate(habit_db, habits, days, seed)
+    habit_db.migrate()
+    return habit_db
+
+
+def best_of(func, repeat=3):
+    """
+    Runs a function several times and returns the fastest wall-clock time in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
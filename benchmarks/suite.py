@@ -0,0 +1,201 @@
+"""
+Times the everyday operations of the tracker on generated catalogues of several sizes and saves
+the results as JSON, so that runs of different commits can be compared.
+
+Usage:
+  python -m benchmarks.suite [--scales small,medium,large] [--output results.json] [--repeat 5] [--seed 0]
+  python -m benchmarks.suite --compare baseline.json [--threshold 0.2]
+
+Every scale is bulk-loaded into a temporary main.db with benchmarks.synthetic. With --compare,
+the new results are checked against the earlier file, and the exit code is 1 if an operation
+got slower by more than the threshold. Only compare runs with the same data digest and machine.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from analytics import analyze_habits
+from benchmarks.synthetic import dataset_digest, synthetic_db
+from db import Main_Db
+from habit import Habit
+from pager import HabitPager
+
+# Scale -> (habits, years)
+SCALES = {"small": (100, 1), "medium": (1000, 2), "large": (5000, 3)}
+
+# The number of habits whose metrics and logs are timed one by one
+SAMPLE_SIZE = 200
+
+
+def measure(func, repeat):
+    """
+    Runs a function several times.
+
+    Returns:
+    - dict: The fastest and the median wall-clock time in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"min": min(timings), "median": statistics.median(timings)}
+
+
+def operations(habit_db):
+    """
+    Returns the timed operations on a loaded database: name -> function without arguments.
+    """
+    rows = habit_db.list_all_habits()
+    step = max(len(rows) // SAMPLE_SIZE, 1)
+    sample = [Habit.from_row(row, habit_db) for row in rows[::step]]
+    names = [habit.name for habit in sample]
+    missing = [name + " (old)" for name in names]
+
+    def habit_metric(method):
+        return lambda: [getattr(habit, method)() for habit in sample]
+
+    return {
+        "list_all_habits": habit_db.list_all_habits,
+        "get_habits_id": lambda: [habit_db.get_habits_id(habit.habit_id) for habit in sample],
+        "current_streak": habit_metric("calculate_current_streak"),
+        "longest_streak": habit_metric("calculate_longest_streak"),
+        "last_completed": habit_metric("calculate_last_completed"),
+        "total_completed": habit_metric("calculate_total_completed"),
+        "completions_in_window": lambda: [habit.completions_in_window(30, until="2024-12-31") for habit in sample],
+        "habit_exists": lambda: [habit_db.habit_exists(name) for name in names + missing],
+        "habit_exists_nocase": lambda: [habit_db.habit_exists(name.upper(), case_sensitive=False) for name in names],
+        "analyze_first_page": lambda: HabitPager(habit_db).page(0),
+        "analyze_sorted_page": lambda: HabitPager(habit_db, order_by=[("current_streak", True)]).page(0),
+        "analyze_all_python": lambda: analyze_habits(habit_db, engine="python"),
+        "analyze_all_sql": lambda: analyze_habits(habit_db, engine="sql"),
+    }
+
+
+def run_scale(habits, years, seed, repeat, directory):
+    """
+    Loads one scale into a new database file and times every operation on it.
+
+    Returns:
+    - dict: The size of the data, its digest, the load time and the timings per operation.
+    """
+    db_path = os.path.join(directory, f"main-{habits}-{years}.db")
+    start = time.perf_counter()
+    synthetic_db(db_path, habits, years, seed).close()
+    load_seconds = time.perf_counter() - start
+
+    habit_db = Main_Db(db_path)
+    try:
+        result = {
+            "habits": habits, "years": years,
+            "logs": habit_db.conn.execute("SELECT COUNT(*) FROM habit_logs").fetchone()[0],
+            "digest": dataset_digest(habit_db),
+            "db_bytes": os.path.getsize(db_path),
+            "load_seconds": load_seconds,
+            "timings": {name: measure(func, repeat) for name, func in operations(habit_db).items()},
+        }
+    finally:
+        habit_db.close()
+        os.remove(db_path)
+    return result
+
+
+def environment():
+    """
+    Returns the versions and the machine of the run, with the git commit if there is one.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def compare(baseline, results, threshold):
+    """
+    Prints the change of every operation against a baseline.
+
+    Parameters:
+    - baseline (dict): Earlier results, as written by this suite.
+    - results (dict): The new results.
+    - threshold (float): The relative slowdown of the fastest time counted as a regression, e.g. 0.2.
+
+    Returns:
+    - list: (scale, operation, change) of the regressions.
+    """
+    regressions = []
+    print(f"\nagainst {baseline['environment'].get('commit')} ({baseline['environment'].get('created')})")
+    print(f"{'scale':<8}{'operation':<24}{'before ms':>11}{'after ms':>11}{'change':>9}")
+    for scale, result in results["scales"].items():
+        before = baseline["scales"].get(scale)
+        if before is None:
+            continue
+        if before["digest"] != result["digest"]:
+            print(f"{scale:<8}different data, not compared")
+            continue
+        for name, timing in result["timings"].items():
+            if name not in before["timings"]:
+                continue
+            old, new = before["timings"][name]["min"], timing["min"]
+            change = new / old - 1 if old else 0.0
+            flag = "  REGRESSION" if change > threshold else ""
+            print(f"{scale:<8}{name:<24}{old * 1000:>11.2f}{new * 1000:>11.2f}{change:>+9.0%}{flag}")
+            if change > threshold:
+                regressions.append((scale, name, change))
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.suite", description="Time the tracker at several scales.")
+    parser.add_argument("--scales", default="small,medium", help=f"comma-separated, of {', '.join(SCALES)}")
+    parser.add_argument("--output", default="benchmark-results.json", help="JSON file for the results")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per operation")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated data")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown counted as a regression")
+    args = parser.parse_args(argv)
+    scales = args.scales.split(",")
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scales: {', '.join(unknown)}")
+
+    results = {"environment": environment(), "seed": args.seed, "repeat": args.repeat, "scales": {}}
+    directory = tempfile.mkdtemp()
+    try:
+        for scale in scales:
+            habits, years = SCALES[scale]
+            result = results["scales"][scale] = run_scale(habits, years, args.seed, args.repeat, directory)
+            print(f"{scale}: {habits} habits, {result['logs']:,} logs over {years} years, "
+                  f"loaded in {result['load_seconds']:.1f} s")
+            for name, timing in result["timings"].items():
+                print(f"  {name:<24}{timing['min'] * 1000:>10.2f} ms  (median {timing['median'] * 1000:.2f})")
+    finally:
+        shutil.rmtree(directory)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Saved {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(json.load(file), results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} operations got slower by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
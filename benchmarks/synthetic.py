@@ -0,0 +1,138 @@
+"""
+Generates realistic habit catalogues for benchmarks, identical on every run for the same seed.
+
+Habits get everyday periodicities and adherence profiles: a habit alternates between active
+spells, in which it is completed once per period, and lapses, so the logs contain long and
+short streaks like real ones. Every habit has its own random generator, so the first N habits
+of a larger catalogue are the same as those of a smaller one.
+
+Usage: python -m benchmarks.synthetic PATH [habits] [years] [seed]
+"""
+import hashlib
+import random
+import sys
+from datetime import date, timedelta
+
+from db import Main_Db
+
+# The last day of every generated history, fixed so that runs on different days match
+END = date(2024, 12, 31)
+
+# Periodicity in days -> weight: mostly daily and weekly habits
+PERIODICITIES = {1: 50, 2: 10, 3: 5, 7: 30, 14: 5}
+
+CATEGORIES = ("Health", "Sport", "Mind", "Work", "Home", "Social")
+
+# Adherence profile -> (weight, chance to stay active for another period, chance to resume after a missed one)
+PROFILES = {
+    "diligent": (30, 0.97, 0.6),
+    "average": (50, 0.85, 0.35),
+    "struggling": (20, 0.6, 0.15),
+}
+
+# Names are combined from these, so that habit_exists has realistic near-misses to tell apart
+_VERBS = ("Run", "Read", "Meditate", "Stretch", "Journal", "Cook", "Call", "Clean", "Study", "Walk")
+_OBJECTS = ("in the morning", "after work", "before bed", "with friends", "for 20 minutes", "outside")
+
+
+def habit_rng(seed, habit_number):
+    """
+    Returns the random generator of one habit.
+
+    Parameters:
+    - seed (int): The seed of the catalogue.
+    - habit_number (int): The position of the habit in the catalogue, from 1.
+    """
+    return random.Random(f"{seed}:{habit_number}")
+
+
+def generate_habit(seed, habit_number, days, end=END):
+    """
+    Generates one habit and its completion days.
+
+    Parameters:
+    - seed (int): The seed of the catalogue.
+    - habit_number (int): The position of the habit in the catalogue, from 1.
+    - days (int): The length of the history in days; habits are created during its first half.
+    - end (date): The last day of the history.
+
+    Returns:
+    - tuple: ((name, periodicity, category, created_at), list of 'YYYY-MM-DD' completion days)
+    """
+    rng = habit_rng(seed, habit_number)
+    periodicity = rng.choices(list(PERIODICITIES), weights=PERIODICITIES.values())[0]
+    _, keep, resume = PROFILES[rng.choices(list(PROFILES), weights=[p[0] for p in PROFILES.values()])[0]]
+    name = f"{rng.choice(_VERBS)} {rng.choice(_OBJECTS)} #{habit_number}"
+    created = end - timedelta(days=days - 1 - rng.randrange(max(days // 2, 1)))
+
+    # Completed on the same day of every period while active, so the gaps are exactly the periodicity
+    days = []
+    active = True
+    offset = rng.randrange(periodicity)
+    day = created + timedelta(days=offset)
+    while day <= end:
+        if active:
+            days.append(day.isoformat())
+            active = rng.random() < keep
+        else:
+            active = rng.random() < resume
+        day += timedelta(days=periodicity)
+    return (name, periodicity, rng.choice(CATEGORIES), created.isoformat()), days
+
+
+def synthetic_db(db_path, habits, years, seed=0, chunk_size=10000):
+    """
+    Creates a database and bulk-loads a generated catalogue into it. Habit N of the catalogue
+    gets ID N, so the database must not contain habits yet.
+
+    Parameters:
+    - db_path (str): The database file to create, or ":memory:".
+    - habits (int): The number of habits.
+    - years (int): The length of the history in years.
+    - seed (int): The seed of the catalogue.
+    - chunk_size (int): The number of logs generated before they are loaded.
+
+    Returns:
+    - Main_Db: The loaded database.
+    """
+    habit_db = Main_Db(db_path)
+    habit_db.create_table()
+    if habit_db.count_habits():
+        raise ValueError(f"{db_path} already contains habits")
+    pending, logs = [], []
+    for number in range(1, habits + 1):
+        habit, completed = generate_habit(seed, number, years * 365)
+        pending.append(habit)
+        logs.extend((number, day) for day in completed)
+        if len(logs) >= chunk_size or number == habits:
+            # The habits go first, so the logs update their summaries
+            habit_db.add_habits_bulk(pending)
+            habit_db.add_habit_logs_bulk(logs)
+            pending, logs = [], []
+    return habit_db
+
+
+def dataset_digest(habit_db):
+    """
+    Returns a SHA-256 digest of the habits and completions of a database, e.g. to check that
+    two benchmark runs measured the same data.
+    """
+    digest = hashlib.sha256()
+    for row in habit_db.conn.execute("SELECT id, name, periodicity, category, created_at FROM habits ORDER BY id"):
+        digest.update(repr(row).encode())
+    for row in habit_db.conn.execute(
+            "SELECT habit_id, completed_day FROM habit_logs WHERE completed = 1 ORDER BY habit_id, completed_day"):
+        digest.update(repr(row).encode())
+    return digest.hexdigest()
+
+
+def main(path, habits=1000, years=3, seed=0):
+    habit_db = synthetic_db(path, habits, years, seed)
+    logs = habit_db.conn.execute("SELECT COUNT(*) FROM habit_logs").fetchone()[0]
+    print(f"{habits} habits, {logs:,} completions over {years} years in {path}")
+    print(f"digest {dataset_digest(habit_db)}")
+    habit_db.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], *(int(arg) for arg in sys.argv[2:]))
@@ -0,0 +1,440 @@
+import re
+import sqlite3
+from itertools import groupby
+
+from analytics import to_day, to_iso
+from db import Main_Db, _chunked
+
+# Positions of the set bits of every byte value, lowest first
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def set_days(bits, origin, days):
+    """
+    Sets the bits of completion days in a bitmap, growing it as needed.
+
+    Parameters:
+    - bits (bytes): The bitmap; bit i marks a completion on day origin + i.
+    - origin (int): The day ordinal of bit 0.
+    - days (iterable): Day ordinals of the completions to set.
+
+    Returns:
+    - tuple: (bits, origin, added) with the new bitmap, its origin, which moves back in whole
+      bytes for days before it, and the ascending days that were not set before.
+    """
+    days = sorted(set(days))
+    if not days:
+        return bytes(bits), origin, []
+    bits = bytearray(bits)
+    if days[0] < origin:
+        prepend = (origin - days[0] + 7) // 8
+        bits[:0] = bytes(prepend)
+        origin -= prepend * 8
+    last_byte = (days[-1] - origin) >> 3
+    if last_byte >= len(bits):
+        bits.extend(bytes(last_byte + 1 - len(bits)))
+
+    added = []
+    for day in days:
+        offset = day - origin
+        mask = 1 << (offset & 7)
+        if not bits[offset >> 3] & mask:
+            bits[offset >> 3] |= mask
+            added.append(day)
+    return bytes(bits), origin, added
+
+
+def _offsets(bits, origin, since, until):
+    """
+    Returns the first and last bit offset within the days since..until (ordinals or None).
+    """
+    first = 0 if since is None else max(0, since - origin)
+    last = len(bits) * 8 - 1 if until is None else min(len(bits) * 8 - 1, until - origin)
+    return first, last
+
+
+def iter_days(bits, origin, since=None, until=None, reverse=False):
+    """
+    Yields the completion days of a bitmap in order, skipping empty bytes.
+
+    Parameters:
+    - bits (bytes): The bitmap.
+    - origin (int): The day ordinal of bit 0.
+    - since (int): Only days on or after this day ordinal.
+    - until (int): Only days on or before this day ordinal.
+    - reverse (bool): Yield the newest day first.
+
+    Returns:
+    - generator: Day ordinals.
+    """
+    first, last = _offsets(bits, origin, since, until)
+    if first > last:
+        return
+    indexes = range(first >> 3, (last >> 3) + 1)
+    for index in reversed(indexes) if reverse else indexes:
+        value = bits[index]
+        if not value:
+            continue
+        base = index * 8
+        for bit in reversed(_BYTE_BITS[value]) if reverse else _BYTE_BITS[value]:
+            if first <= base + bit <= last:
+                yield origin + base + bit
+
+
+def count_days(bits, origin, since=None, until=None):
+    """
+    Counts the completion days of a bitmap with a popcount over the masked range.
+
+    Parameters:
+    - bits (bytes): The bitmap.
+    - origin (int): The day ordinal of bit 0.
+    - since (int): Only days on or after this day ordinal.
+    - until (int): Only days on or before this day ordinal.
+
+    Returns:
+    - int: The number of completions.
+    """
+    first, last = _offsets(bits, origin, since, until)
+    if first > last:
+        return 0
+    number = int.from_bytes(bits, "little") & ((1 << (last + 1)) - 1)
+    return bin(number >> first).count("1")
+
+
+def bitmap_metrics(bits, origin, periodicity):
+    """
+    Calculates the metrics of a habit from its bitmap with run scans instead of a loop per day.
+
+    A streak continues while fewer than periodicity days pass without a completion, so the
+    runs of at least periodicity zero bits split the history into streaks.
+
+    Parameters:
+    - bits (bytes): The bitmap.
+    - origin (int): The day ordinal of bit 0.
+    - periodicity (int): The frequency (in days) at which the habit should be completed.
+
+    Returns:
+    - tuple: (current_streak, longest_streak, last_completed_day, total_completed), where
+      last_completed_day is a day ordinal or None, like Main_Db.list_habit_metrics.
+    """
+    number = int.from_bytes(bits, "little")
+    if not number:
+        return 0, 0, None, 0
+    history = format(number, "b")[::-1].strip("0")  # Oldest day first, first to last completion
+    total = history.count("1")
+    last_day = origin + number.bit_length() - 1
+    if periodicity < 1:
+        return 1, 1, last_day, total  # No gap is short enough, every completion stands alone
+    streaks = [run.count("1") for run in re.split(f"0{{{periodicity},}}", history)]
+    return streaks[-1], max(streaks), last_day, total
+
+
+class BitmapMainDb(Main_Db):
+    """
+    A Main_Db that keeps the completion history of each habit as one bitmap instead of one
+    habit_logs row per completion.
+
+    Bit i of a habit's bitmap marks a completion on day origin_day + i, where origin_day starts
+    at the day the habit was created. A daily habit needs one bit per day instead of a row with
+    an ID, a flag and a date string. Streaks come from run scans and totals from a popcount.
+
+    The read methods return what they return for Main_Db. A bitmap only holds completions, so
+    log rows are built from it: their ID is None and they are always completed. A database must
+    always be opened with the same class; pack_logs() moves the logs of a database written by
+    Main_Db into bitmaps.
+    """
+
+    def create_table(self, migrate=True):
+        """
+        Creates the tables of Main_Db and the habit_bitmaps table if they do not already exist
+        and, unless migrate is False, applies the pending migrations.
+        """
+        super().create_table(migrate=False)
+        with self._writing() as cur:
+            # Bit i of bits marks a completion on day origin_day + i
+            cur.execute("""
+        CREATE TABLE IF NOT EXISTS habit_bitmaps (
+        habit_id INTEGER PRIMARY KEY,
+        origin_day INTEGER NOT NULL,
+        bits BLOB NOT NULL,
+        FOREIGN KEY(habit_id) REFERENCES habits(id))
+        """)
+            self._commit()
+
+        # The summaries of the migrations are built from the bitmaps
+        if migrate:
+            self.migrate()
+
+    def _load_bitmap(self, cur, habit_id):
+        """
+        Reads the bitmap of a habit, or an empty one starting at its creation day.
+        """
+        cur.execute("SELECT origin_day, bits FROM habit_bitmaps WHERE habit_id = ?", (habit_id,))
+        row = cur.fetchone()
+        if row is not None:
+            return row[0], row[1]
+        cur.execute("SELECT created_at FROM habits WHERE id = ?", (habit_id,))
+        created = cur.fetchone()
+        return (to_day(created[0]) if created else None), b""
+
+    def _set_days(self, cur, habit_id, days):
+        """
+        Sets completion days in the bitmap of a habit, without committing.
+
+        Returns:
+        - list: The ascending days that were not completed before.
+        """
+        origin, bits = self._load_bitmap(cur, habit_id)
+        bits, origin, added = set_days(bits, origin if origin is not None else min(days), days)
+        if added:
+            cur.execute("INSERT OR REPLACE INTO habit_bitmaps (habit_id, origin_day, bits) VALUES (?, ?, ?)",
+                        (habit_id, origin, bits))
+        return added
+
+    def _read_bitmap(self, habit_id):
+        """
+        Returns (origin_day, bits) of a habit, with an empty bitmap if it has no completions.
+        """
+        with self._reading() as cur:
+            cur.execute("SELECT origin_day, bits FROM habit_bitmaps WHERE habit_id = ?", (habit_id,))
+            return cur.fetchone() or (0, b"")
+
+    def _iter_bitmaps(self, habit_id=None, reverse=False, batch_size=1000):
+        """
+        Streams (habit_id, origin_day, bits) of one or all habits, ordered by habit ID.
+        """
+        query = "SELECT habit_id, origin_day, bits FROM habit_bitmaps"
+        params = ()
+        if habit_id is not None:
+            query += " WHERE habit_id = ?"
+            params = (habit_id,)
+        query += " ORDER BY habit_id DESC" if reverse else " ORDER BY habit_id"
+        yield from self._stream(query, params, batch_size)
+
+    def add_habit_log(self, habit_id, completed_at):
+        """
+        Adds a completion to the bitmap of a habit.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+        - completed_at (str): The date when the habit was completed; the time is not kept.
+
+        Returns:
+        - bool: True if the completion was logged, False if the habit was already completed that day.
+        """
+        habit_id = int(habit_id)
+        with self._writing() as cur:
+            try:
+                added = self._set_days(cur, habit_id, [to_day(completed_at)])
+                if added:
+                    self._record_completions(habit_id, added)
+            except sqlite3.Error:
+                self._rollback()
+                raise
+            self._commit()
+        return bool(added)
+
+    def add_habit_logs_bulk(self, logs, chunk_size=1000):
+        """
+        Adds many completions, writing each habit's bitmap once per chunk.
+
+        Parameters:
+        - logs (iterable): (habit_id, completed_at) tuples, consumed lazily.
+        - chunk_size (int): The number of logs committed together, or None to commit once at the end.
+
+        Returns:
+        - int: The number of logs added, without the completions of days that were already logged.
+        """
+        total = 0
+        for chunk in _chunked(logs, chunk_size):
+            days_by_habit = {}
+            for habit_id, completed_at in chunk:
+                days_by_habit.setdefault(int(habit_id), []).append(to_day(completed_at))
+            with self._writing() as cur:
+                try:
+                    for habit_id, days in days_by_habit.items():
+                        added = self._set_days(cur, habit_id, days)
+                        if added:
+                            self._record_completions(habit_id, added)
+                            total += len(added)
+                except sqlite3.Error:
+                    self._rollback()
+                    raise
+                self._commit()
+        return total
+
+    def complete_habits(self, habit_id, completed_at):
+        """
+        Updates the habit's updated_at field. A bitmap has no uncompleted logs to mark, so
+        completions are added with add_habit_log.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+        - completed_at (str): The date when the habit was completed.
+        """
+        self.update_habit_updated_at(habit_id)
+
+    def delete_habits(self, habit_id):
+        """
+        Deletes a habit and its bitmap.
+
+        Parameters:
+        - habit_id (int): The ID of the habit to delete.
+        """
+        habit_id = int(habit_id)
+        with self._writing() as cur:
+            cur.execute("DELETE FROM habit_bitmaps WHERE habit_id = ?", (habit_id,))
+            super().delete_habits(habit_id)
+
+    def pack_logs(self):
+        """
+        Moves the completed logs from habit_logs into the bitmaps, e.g. of a database written by
+        Main_Db, and rebuilds the summaries from them. Uncompleted logs are dropped. Run
+        compact_logs() afterwards to shrink the file.
+
+        Returns:
+        - int: The number of logs moved.
+        """
+        with self._writing() as cur:
+            try:
+                cur.execute("SELECT habit_id, completed_day FROM habit_logs WHERE completed = 1 ORDER BY habit_id")
+                rows = cur.fetchall()
+                for habit_id, group in groupby(rows, key=lambda row: row[0]):
+                    self._set_days(cur, habit_id, [day for _, day in group])
+                cur.execute("DELETE FROM habit_logs")
+                self._rebuild_habit_stats()
+                self._changed()
+            except sqlite3.Error:
+                self._rollback()
+                raise
+            self._commit()
+        return len(rows)
+
+    def iter_completion_days(self, habit_id, since=None, until=None, reverse=False, batch_size=1000):
+        """
+        Streams the completion days of a habit as integer day ordinals, in order.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+        - since (str): Only completions on or after this 'YYYY-MM-DD' date.
+        - until (str): Only completions on or before this 'YYYY-MM-DD' date.
+        - reverse (bool): Stream the newest completion first.
+        - batch_size (int): Unused; the whole bitmap is read at once.
+
+        Returns:
+        - generator: One int per completion.
+        """
+        origin, bits = self._read_bitmap(habit_id)
+        yield from iter_days(bits, origin, to_day(since) if since is not None else None,
+                             to_day(until) if until is not None else None, reverse)
+
+    def iter_all_completion_days(self, batch_size=1000):
+        """
+        Streams the completion days of all habits, ordered by habit ID and day.
+
+        Parameters:
+        - batch_size (int): The number of bitmaps fetched from SQLite at a time.
+
+        Returns:
+        - generator: One (habit_id, day) tuple per completion.
+        """
+        for habit_id, origin, bits in self._iter_bitmaps(batch_size=batch_size):
+            for day in iter_days(bits, origin):
+                yield habit_id, day
+
+    def count_completions_between(self, habit_id, start=None, end=None):
+        """
+        Counts the completions of a habit within a date range with a popcount.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+        - start (str): The first day of the range as 'YYYY-MM-DD', inclusive, or None for no lower bound.
+        - end (str): The last day of the range as 'YYYY-MM-DD', inclusive, or None for no upper bound.
+
+        Returns:
+        - int: The number of completions in the range.
+        """
+        origin, bits = self._read_bitmap(habit_id)
+        return count_days(bits, origin, to_day(start) if start is not None else None,
+                          to_day(end) if end is not None else None)
+
+    @staticmethod
+    def _log_rows(habit_id, days):
+        """
+        Builds habit_logs rows (id, habit_id, completed, completed_at, completed_day) from completion days.
+        """
+        return [(None, habit_id, 1, to_iso(day), day) for day in days]
+
+    def get_habits_id(self, habit_id):
+        """
+        Retrieves all logs of a habit, oldest first.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+
+        Returns:
+        - list: The logs, like Main_Db.get_habits_id, with None as ID.
+        """
+        return self._log_rows(habit_id, self.iter_completion_days(habit_id))
+
+    def get_logs_between(self, habit_id, start, end):
+        """
+        Retrieves the logs of a habit completed within a date range, oldest first.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+        - start (str): The first day of the range as 'YYYY-MM-DD', inclusive.
+        - end (str): The last day of the range as 'YYYY-MM-DD', inclusive.
+
+        Returns:
+        - list: The logs in the range, like Main_Db.get_habits_id, with None as ID.
+        """
+        return self._log_rows(habit_id, self.iter_completion_days(habit_id, since=start, until=end))
+
+    def iter_logs(self, habit_id, since=None, until=None, reverse=False, batch_size=1000):
+        """
+        Streams the logs of a habit in completion date order.
+
+        Parameters:
+        - habit_id (int): The ID of the habit, or None for the logs of all habits ordered by habit ID.
+        - since (str): Only logs completed on or after this 'YYYY-MM-DD' date.
+        - until (str): Only logs completed on or before this 'YYYY-MM-DD' date.
+        - reverse (bool): Stream the newest logs first.
+        - batch_size (int): The number of bitmaps fetched from SQLite at a time.
+
+        Returns:
+        - generator: One tuple per log, like Main_Db.get_habits_id, with None as ID.
+        """
+        since = to_day(since) if since is not None else None
+        until = to_day(until) if until is not None else None
+        for current_id, origin, bits in self._iter_bitmaps(habit_id, reverse, batch_size):
+            yield from self._log_rows(current_id, iter_days(bits, origin, since, until, reverse))
+
+    def list_all_logs(self):
+        """
+        Retrieves the logs of all habits.
+
+        Returns:
+        - list: The logs ordered by habit ID and completion date, with None as ID.
+        """
+        return list(self.iter_logs(None))
+
+    def list_habit_metrics(self):
+        """
+        Calculates the metrics of all habits from their bitmaps.
+
+        Returns:
+        - list: (id, name, periodicity, category, created_at, current_streak, longest_streak,
+          last_completed_day, total_completed) per habit, ordered by ID, like Main_Db.list_habit_metrics.
+        """
+        with self._reading() as cur:
+            cur.execute("""
+        SELECT h.*, b.origin_day, b.bits FROM habits h
+        LEFT JOIN habit_bitmaps b ON b.habit_id = h.id
+        ORDER BY h.id
+        """)
+            rows = cur.fetchall()
+        return [
+            tuple(habit) + bitmap_metrics(bits or b"", origin or 0, int(habit[2]))
+            for *habit, origin, bits in rows
+        ]
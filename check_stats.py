@@ -0,0 +1,32 @@
+"""
+Checks the cached habit summaries against a full recompute from the habit logs.
+
+Usage: python check_stats.py [--repair] [db_path]
+"""
+import sys
+
+from db import Main_Db
+
+
+def main(argv):
+    repair = "--repair" in argv
+    paths = [arg for arg in argv if arg != "--repair"]
+    habit_db = Main_Db(paths[0] if paths else "main.db")
+    habit_db.create_table()
+
+    mismatches = habit_db.check_habit_stats()
+    for habit_id, cached, recomputed in mismatches:
+        print(f"habit {habit_id}: cached {cached} != recomputed {recomputed}")
+    if not mismatches:
+        print("All habit summaries are consistent.")
+        return 0
+
+    if repair:
+        habit_db.rebuild_habit_stats()
+        print(f"Rebuilt the summaries of {len(mismatches)} habits.")
+        return 0
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
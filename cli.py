@@ -0,0 +1,294 @@
+"""
+Manages habits from the command line, without loading Tkinter.
+
+Usage: python cli.py [--db PATH] [--profile PATH [--trace-sql]] COMMAND ...
+
+Commands:
+  add NAME PERIODICITY CATEGORY [--created-at DATE]
+  complete HABIT [--date DATE]        HABIT is an ID or a name
+  delete HABIT_ID
+  edit HABIT_ID NAME PERIODICITY CATEGORY
+  analyze [--engine ENGINE] [--json] [--snapshot]
+  import {habits,logs} PATH
+  batch [FILE]                        One command per line from FILE or stdin, in one transaction
+"""
+import argparse
+import sqlite3
+import sys
+from datetime import datetime
+
+from analytics import ENGINES, analyze_habits
+from db import MIGRATIONS, Main_Db
+
+# json, shlex and importer are imported by the commands that need them, which keeps the
+# startup of a single "complete" short
+
+COMMANDS = ("add", "complete", "delete", "edit", "analyze", "import", "batch")
+
+ANALYZE_COLUMNS = ("habit_id", "name", "category", "periodicity", "created_at", "current_streak",
+                   "longest_streak", "last_completed", "total_completed")
+
+
+class CommandError(Exception):
+    """
+    Raised by a command that cannot be carried out, e.g. for an unknown habit.
+    """
+
+
+# Errors of bad input or of the database, reported as "error: ..." instead of a traceback: invalid
+# dates and unsupported files (ValueError), CSV rows without a column (KeyError), unreadable files
+# (OSError) and a locked or corrupt database (sqlite3.Error)
+INPUT_ERRORS = (ValueError, KeyError, OSError, sqlite3.Error)
+
+
+def describe(error):
+    """
+    Returns the message of an error for the command line.
+    """
+    if isinstance(error, KeyError):
+        return f"missing field {error}"
+    return str(error)
+
+
+def resolve_habit(habit_db, habit):
+    """
+    Looks up the ID of a habit given by ID or by name.
+
+    Parameters:
+    - habit_db: The database instance.
+    - habit (str): A habit ID or a habit name.
+
+    Returns:
+    - int: The habit ID.
+    """
+    if habit.isdigit() and habit_db.get_habit(int(habit)) is not None:
+        return int(habit)
+    habit_id = habit_db.get_habit_id_by_name(habit)
+    if habit_id is None:
+        raise CommandError(f"Unknown habit: {habit}")
+    return habit_id
+
+
+def cmd_add(habit_db, args):
+    """
+    Adds a habit.
+    """
+    if habit_db.habit_exists(args.name):
+        raise CommandError(f"Habit with this name already exists: {args.name}")
+    created_at = args.created_at or datetime.now().strftime('%Y-%m-%d')
+    habit_db.add_habits(args.name, args.periodicity, args.category, created_at)
+    return f"Added habit {args.name}"
+
+
+def cmd_complete(habit_db, args):
+    """
+    Logs a completion of a habit given by ID or name.
+    """
+    habit_id = resolve_habit(habit_db, args.habit)
+    completed_at = args.date or datetime.now().strftime('%Y-%m-%d')
+    if not habit_db.add_habit_log(habit_id, completed_at):
+        return f"Habit {habit_id} was already completed on {completed_at[:10]}"
+    current_streak = habit_db.get_habit_stats(habit_id)[0]
+    return f"Completed habit {habit_id}, current streak {current_streak}"
+
+
+def cmd_delete(habit_db, args):
+    """
+    Deletes a habit.
+    """
+    if habit_db.get_habit(args.habit_id) is None:
+        raise CommandError(f"Unknown habit: {args.habit_id}")
+    habit_db.delete_habits(args.habit_id)
+    return f"Deleted habit {args.habit_id}"
+
+
+def cmd_edit(habit_db, args):
+    """
+    Changes the name, periodicity and category of a habit.
+    """
+    if habit_db.get_habit(args.habit_id) is None:
+        raise CommandError(f"Unknown habit: {args.habit_id}")
+    habit_db.edit_habits(args.habit_id, args.name, args.periodicity, args.category)
+    return f"Edited habit {args.habit_id}"
+
+
+def cmd_analyze(habit_db, args):
+    """
+    Prints the metrics of all habits as tab-separated values or JSON.
+    """
+    if args.snapshot:
+        # Read an in-memory copy, so a long report does not hold up the writers of the file
+        snapshot = Main_Db.open_snapshot(habit_db.db_path)
+        try:
+            rows = analyze_habits(snapshot, engine=args.engine)
+        finally:
+            snapshot.close()
+    else:
+        rows = analyze_habits(habit_db, engine=args.engine)
+    if args.json:
+        import json
+        return json.dumps([dict(zip(ANALYZE_COLUMNS, row)) for row in rows], indent=2)
+    lines = ["\t".join(ANALYZE_COLUMNS)]
+    lines.extend("\t".join(str(value) for value in row) for row in rows)
+    return "\n".join(lines)
+
+
+def cmd_import(habit_db, args):
+    """
+    Imports habits or completion logs from a CSV or JSONL file.
+    """
+    from importer import import_habits, import_logs
+
+    if args.kind == "habits":
+        count = import_habits(habit_db, args.path)
+    else:
+        count = import_logs(habit_db, args.path)
+    return f"Imported {count} {args.kind}"
+
+
+def cmd_batch(habit_db, args):
+    """
+    Runs one command per line from a file or stdin, all in one transaction.
+    """
+    import shlex
+
+    parser = build_parser(batch=True)
+    lines = args.file if args.file is not None else sys.stdin
+    messages = []
+    # Every command of the batch is committed together, or none of them
+    with habit_db.transaction():
+        for number, line in enumerate(lines, start=1):
+            try:
+                words = shlex.split(line, comments=True)
+                if not words:
+                    continue
+                command = parser.parse_args(words)
+                messages.append(command.func(habit_db, command))
+            except SystemExit as error:
+                # argparse has printed the usage error already
+                raise CommandError(f"line {number}: invalid command") from error
+            except (CommandError, argparse.ArgumentError, *INPUT_ERRORS) as error:
+                raise CommandError(f"line {number}: {describe(error)}") from error
+    messages.append(f"Committed {len(messages)} commands")
+    return "\n".join(messages)
+
+
+def selected_command(argv):
+    """
+    Returns the command named in the arguments, or None if there is no known one, e.g. for --help.
+    """
+    words = iter(argv)
+    for word in words:
+        if word in ("--db", "--profile"):
+            next(words, None)  # The value of the option
+        elif not word.startswith("-"):
+            return word if word in COMMANDS else None
+    return None
+
+
+def build_parser(batch=False, command=None):
+    """
+    Builds the argument parser; without the global options and the batch command inside a batch.
+
+    Parameters:
+    - batch (bool): Whether the parser reads the lines of a batch.
+    - command (str): The only command to add, which saves building the others on every start,
+      or None for all of them, e.g. for the help and the errors that list them.
+    """
+    def wanted(name):
+        return command is None or command == name
+
+    parser = argparse.ArgumentParser(prog="cli.py" if not batch else "batch", description="Manage habits.",
+                                      exit_on_error=not batch)
+    if not batch:
+        parser.add_argument("--db", default="main.db", help="path to the database file (default: main.db)")
+        parser.add_argument("--profile", metavar="PATH",
+                            help="write call counts and latencies to PATH (.json, .prom or .folded)")
+        parser.add_argument("--trace-sql", action="store_true", help="also profile the SQL statements")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    if wanted("add"):
+        add = commands.add_parser("add", help="add a habit")
+        add.add_argument("name")
+        add.add_argument("periodicity", type=int, help="days between completions, e.g. 1 or 7")
+        add.add_argument("category")
+        add.add_argument("--created-at", help="creation date as YYYY-MM-DD (default: today)")
+        add.set_defaults(func=cmd_add)
+
+    if wanted("complete"):
+        complete = commands.add_parser("complete", help="complete a habit")
+        complete.add_argument("habit", help="habit ID or name")
+        complete.add_argument("--date", help="completion date as YYYY-MM-DD (default: today)")
+        complete.set_defaults(func=cmd_complete)
+
+    if wanted("delete"):
+        delete = commands.add_parser("delete", help="delete a habit")
+        delete.add_argument("habit_id", type=int)
+        delete.set_defaults(func=cmd_delete)
+
+    if wanted("edit"):
+        edit = commands.add_parser("edit", help="edit a habit")
+        edit.add_argument("habit_id", type=int)
+        edit.add_argument("name")
+        edit.add_argument("periodicity", type=int)
+        edit.add_argument("category")
+        edit.set_defaults(func=cmd_edit)
+
+    if wanted("analyze"):
+        analyze = commands.add_parser("analyze", help="print the metrics of all habits")
+        analyze.add_argument("--engine", choices=sorted(ENGINES), default="python")
+        analyze.add_argument("--json", action="store_true", help="print JSON instead of tab-separated values")
+        analyze.add_argument("--snapshot", action="store_true", help="analyze an in-memory copy of the database")
+        analyze.set_defaults(func=cmd_analyze)
+
+    if wanted("import"):
+        import_ = commands.add_parser("import", help="import habits or logs from a CSV or JSONL file")
+        import_.add_argument("kind", choices=("habits", "logs"))
+        import_.add_argument("path")
+        import_.set_defaults(func=cmd_import)
+
+    if not batch and wanted("batch"):
+        batch_ = commands.add_parser("batch", help="run one command per line from a file or stdin in one transaction")
+        batch_.add_argument("file", nargs="?", type=argparse.FileType("r"), help="file with commands (default: stdin)")
+        batch_.set_defaults(func=cmd_batch)
+    return parser
+
+
+def main(argv):
+    args = build_parser(command=selected_command(argv)).parse_args(argv)
+    try:
+        print(run(args))
+    except (CommandError, *INPUT_ERRORS) as error:
+        print(f"error: {describe(error)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def run(args):
+    """
+    Opens the database and runs the command of the parsed arguments.
+
+    Returns:
+    - str: The output of the command.
+    """
+    habit_db = Main_Db(args.db)
+    # A database of the current schema version needs no setup, which saves its statements
+    if habit_db.conn.execute("PRAGMA user_version").fetchone()[0] < len(MIGRATIONS):
+        habit_db.create_table()
+    profiler = None
+    if args.profile:
+        from instrumentation import Profiler  # Not loaded unless profiling
+        profiler = Profiler(trace_sql=args.trace_sql)
+        profiler.instrument_db(habit_db)
+        profiler.instrument_habits()
+    try:
+        return args.func(habit_db, args)
+    finally:
+        if profiler is not None:
+            profiler.uninstrument()
+            profiler.write(args.profile)
+        habit_db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,28 +1,470 @@
+import queue
 import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import groupby, islice
+
+from analytics import calculate_metrics, to_day, to_iso
+
+# Schema migrations applied by Main_Db.migrate(), which create_table() runs. Migration n
+# (counting from 1) upgrades a database whose PRAGMA user_version is n - 1, so new migrations
+# are only ever appended.
+# A step is either an SQL statement or a function called with the Main_Db instance.
+MIGRATIONS = [
+    [
+        # Older versions of the GUI stored the category in the periodicity column and the
+        # periodicity in the category column; swap those rows back.
+        """
+        UPDATE habits SET periodicity = CAST(category AS INTEGER), category = periodicity
+        WHERE typeof(periodicity) = 'text' AND category GLOB '[0-9]*' AND category NOT GLOB '*[^0-9]*'
+        """,
+        # Habit names must be unique, so rename duplicates before indexing them
+        """
+        UPDATE habits SET name = name || ' (' || id || ')'
+        WHERE id NOT IN (SELECT MIN(id) FROM habits GROUP BY name)
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_habits_name ON habits (name)",
+        "CREATE INDEX IF NOT EXISTS idx_habit_logs_habit_id_completed_at ON habit_logs (habit_id, completed_at)",
+    ],
+    [
+        "CREATE INDEX IF NOT EXISTS idx_habits_name_nocase ON habits (name COLLATE NOCASE)",
+    ],
+    [
+        """
+        CREATE TABLE IF NOT EXISTS habit_stats (
+        habit_id INTEGER PRIMARY KEY,
+        current_streak INTEGER,
+        longest_streak INTEGER,
+        last_completed TEXT,
+        total_completed INTEGER,
+        updated_at DATETIME,
+        FOREIGN KEY(habit_id) REFERENCES habits(id))
+        """,
+        # The summaries are built by the next migration, which adds the columns they are computed from
+    ],
+    [
+        # Completion dates as integer day ordinals (0001-01-01 is day 1, as date.toordinal)
+        "ALTER TABLE habit_logs ADD COLUMN completed_day INTEGER",
+        "UPDATE habit_logs SET completed_day = CAST(julianday(completed_at) - 1721424.5 AS INTEGER)",
+        """
+        CREATE INDEX IF NOT EXISTS idx_habit_logs_habit_id_completed_day
+        ON habit_logs (habit_id, completed_day, completed)
+        """,
+        lambda db: db._rebuild_habit_stats(),
+    ],
+    [
+        # Every habit gets a summary row, so sorted pages can join habits to habit_stats
+        # and walk an index of either table in order.
+        """
+        INSERT OR IGNORE INTO habit_stats (habit_id, current_streak, longest_streak, total_completed)
+        SELECT id, 0, 0, 0 FROM habits
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS habits_insert_stats AFTER INSERT ON habits
+        BEGIN
+        INSERT OR IGNORE INTO habit_stats (habit_id, current_streak, longest_streak, total_completed)
+        VALUES (NEW.id, 0, 0, 0);
+        END
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_habits_category ON habits (category)",
+        "CREATE INDEX IF NOT EXISTS idx_habits_periodicity ON habits (periodicity)",
+        "CREATE INDEX IF NOT EXISTS idx_habits_created_at ON habits (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_habit_stats_current_streak ON habit_stats (current_streak)",
+        "CREATE INDEX IF NOT EXISTS idx_habit_stats_longest_streak ON habit_stats (longest_streak)",
+        "CREATE INDEX IF NOT EXISTS idx_habit_stats_last_completed ON habit_stats (last_completed)",
+        "CREATE INDEX IF NOT EXISTS idx_habit_stats_total_completed ON habit_stats (total_completed)",
+    ],
+    [
+        # A habit is completed at most once per day: drop the repeated logs of a day, then
+        # enforce it. The summaries counted the repeats, so they are rebuilt.
+        lambda db: db._dedupe_logs(),
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_habit_logs_habit_id_day ON habit_logs (habit_id, completed_day)",
+        lambda db: db._rebuild_habit_stats(),
+    ],
+]
+
+# Logs a habit completion once per day. A log of the day that is not marked completed yet is
+# marked instead; a completed one is left alone, so the statement changes no row.
+INSERT_LOG = """
+INSERT INTO habit_logs (habit_id, completed_at, completed, completed_day) VALUES (?, ?, 1, ?)
+ON CONFLICT (habit_id, completed_day) DO UPDATE SET completed = 1 WHERE completed != 1
+"""
+
+# The same for the logs staged by add_habit_logs_bulk, returning the logs that were written.
+# "WHERE true" keeps SQLite from reading ON CONFLICT as a join constraint.
+STAGED_INSERT_LOG = """
+INSERT INTO habit_logs (habit_id, completed_at, completed, completed_day)
+SELECT habit_id, completed_at, 1, completed_day FROM staged_logs WHERE true ORDER BY rowid
+ON CONFLICT (habit_id, completed_day) DO UPDATE SET completed = 1 WHERE completed != 1
+RETURNING habit_id, completed_day
+"""
+
+# Columns of the Analyze window that list_habits_sorted can order by, and their SQL expression
+SORT_COLUMNS = {
+    "id": "h.id",
+    "name": "h.name",
+    "category": "h.category",
+    "periodicity": "h.periodicity",
+    "created_at": "h.created_at",
+    "current_streak": "s.current_streak",
+    "longest_streak": "s.longest_streak",
+    "last_completed": "s.last_completed",
+    "total_completed": "s.total_completed",
+}
+
+# Accepted values of the journal_mode and synchronous pragmas
+JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+# Folds names the way SQLite's NOCASE collation does: only ASCII letters are case-insensitive
+NOCASE = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+def _connect_read_only(db_path):
+    """
+    Opens a connection to a database file that cannot write to it.
+    """
+    from pathlib import Path  # Only needed for read-only connections; keeps the CLI startup short
+    return sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True, check_same_thread=False)
+
+
+def _chunked(rows, chunk_size):
+    """
+    Splits an iterable into lists of at most chunk_size items, or one list if chunk_size is None.
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _fetch_in_batches(cur, batch_size):
+    """
+    Yields the rows of an executed cursor, fetching batch_size rows at a time.
+    """
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
 
 class Main_Db:
     """
     A class to manage the database operations for habits and habit logs using SQLite.
+
+    An instance can be shared by several threads. Every method runs on a cursor of its own.
+    Writes go through the single write connection, one thread at a time; a transaction() block
+    keeps the write connection for its thread until the block ends. With readers, reads run on
+    a pool of read-only connections in WAL mode and do not wait for the writer. Each thread keeps
+    one pooled connection while it reads, so nested streams share it.
     """
 
-    def __init__(self, db_path="main.db"):
+    def __init__(self, db_path="main.db", name_index=False, autocommit=True, journal_mode=None, synchronous=None,
+                 readers=0, read_only=False):
         """
-        Initializes the database connection and cursor.
+        Initializes the write connection and the pool of read connections.
 
         Parameters:
         - db_path (str): Path to the SQLite database file. Defaults to "main.db".
+        - name_index (bool): Keep the habit names in memory so habit_exists does not query the
+          database. Only use it when this instance is the only writer of the habits table.
+        - autocommit (bool): Commit after every write method. If False, writes are only made
+          durable by commit() or at the end of a transaction() block.
+        - journal_mode (str): Value for PRAGMA journal_mode, e.g. "WAL". Defaults to SQLite's setting.
+        - synchronous (str): Value for PRAGMA synchronous, e.g. "NORMAL". Defaults to SQLite's setting.
+        - readers (int): The number of read-only connections for concurrent reads, opened on
+          demand. Needs a database file, and switches it to WAL mode unless journal_mode is given.
+          With 0, reads share the write connection.
+        - read_only (bool): Open the database file read-only, e.g. for worker processes that only
+          read. Write methods then raise sqlite3.OperationalError.
+        """
+        if (readers or read_only) and db_path == ":memory:":
+            raise ValueError("Read connections need a database file, not ':memory:'")
+        if readers and journal_mode is None:
+            journal_mode = "WAL"
+
+        # Connect to the SQLite database (or create it if it doesn't exist). Threads take turns
+        # on the connection under the write lock.
+        self.db_path = db_path
+        if read_only:
+            self.conn = _connect_read_only(db_path)
+        else:
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._write_lock = threading.RLock()
+        self._writing_threads = threading.local()  # Depth of _writing() blocks of the current thread
+
+        if journal_mode is not None:
+            if journal_mode.upper() not in JOURNAL_MODES:
+                raise ValueError(f"Invalid journal_mode: {journal_mode}")
+            self.conn.cursor().execute(f"PRAGMA journal_mode = {journal_mode}")
+        if synchronous is not None:
+            if synchronous.upper() not in SYNCHRONOUS_MODES:
+                raise ValueError(f"Invalid synchronous mode: {synchronous}")
+            self.conn.cursor().execute(f"PRAGMA synchronous = {synchronous}")
+
+        # The read connections are opened on demand, up to readers of them
+        self.readers = readers
+        self._idle_readers = queue.LifoQueue()
+        self._reader_connections = []
+        self._readers_lock = threading.Lock()
+        self._thread_readers = {}  # Thread ident -> [connection, number of open reads]
+        self._trace_callback = None  # Also set on read connections opened later
+        self.snapshot_of = None  # The copied database file of a snapshot, see open_snapshot
+
+        # Write methods only commit when autocommit is on and no transaction() block is open
+        self.autocommit = autocommit
+        self._transaction_depth = 0
+
+        # The in-memory name index is loaded on the first habit_exists call
+        self.name_index = name_index
+        self._names = None
+        self._nocase_names = None
+
+        # Writes of this instance bump the change counter of the habit they touch, and rollbacks
+        # or rewrites of many habits bump the epoch; see habit_version
+        self._habit_changes = {}  # Habit ID -> number of changes
+        self._changes_epoch = 0
+        self._uncommitted_changes = set()  # Habit IDs, or None for all, changed since the last commit
+
+    @contextmanager
+    def _writing(self):
+        """
+        Holds the write lock for the block and yields a new cursor on the write connection.
+
+        If the outermost block raises, its pending writes are rolled back before the lock is
+        released, so the next writer of any thread does not join and commit them. Inside
+        transaction() the transaction decides instead.
+        """
+        with self._write_lock:
+            depth = self._writing_threads.depth = getattr(self._writing_threads, "depth", 0) + 1
+            try:
+                yield self.conn.cursor()
+            except BaseException:
+                if depth == 1 and self.conn.in_transaction:
+                    self._rollback()
+                raise
+            finally:
+                self._writing_threads.depth -= 1
+
+    @contextmanager
+    def _reading(self):
+        """
+        Yields a new cursor for a read.
+
+        The cursor belongs to the pooled read connection of the current thread. Without
+        readers, or inside a write of this thread, it belongs to the write connection instead,
+        so the read sees the thread's own pending writes.
+        """
+        if not self.readers or getattr(self._writing_threads, "depth", 0):
+            with self._writing() as cur:
+                yield cur
+            return
+
+        thread = threading.get_ident()
+        conn = self._acquire_reader(thread)
+        try:
+            yield conn.cursor()
+        finally:
+            self._release_reader(thread)
+
+    def _acquire_reader(self, thread):
+        """
+        Checks a read connection out for a thread, or returns the one it already holds.
+        """
+        with self._readers_lock:
+            if thread in self._thread_readers:
+                self._thread_readers[thread][1] += 1
+                return self._thread_readers[thread][0]
+            open_new = self._idle_readers.empty() and len(self._reader_connections) < self.readers
+            if open_new:
+                conn = _connect_read_only(self.db_path)
+                conn.set_trace_callback(self._trace_callback)
+                self._reader_connections.append(conn)
+
+        if not open_new:
+            conn = self._idle_readers.get()  # Waits while every read connection is in use
+        with self._readers_lock:
+            self._thread_readers[thread] = [conn, 1]
+        return conn
+
+    def _release_reader(self, thread):
+        """
+        Returns a thread's read connection to the pool once its last read has ended.
+        """
+        with self._readers_lock:
+            entry = self._thread_readers[thread]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._thread_readers[thread]
+                self._idle_readers.put(entry[0])
+
+    def _stream(self, query, params, batch_size):
+        """
+        Runs a read query and yields its rows, fetching batch_size rows at a time.
+
+        On a read connection, the connection stays checked out until the stream ends. On the
+        write connection, the write lock is only held while a batch is fetched, so a stream
+        consumed slowly does not block the writers.
+        """
+        if self.readers and not getattr(self._writing_threads, "depth", 0):
+            with self._reading() as cur:
+                cur.execute(query, params)
+                yield from _fetch_in_batches(cur, batch_size)
+            return
+
+        with self._writing() as cur:
+            cur.execute(query, params)
+        while True:
+            with self._write_lock:
+                rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    @classmethod
+    def open_snapshot(cls, db_path="main.db"):
+        """
+        Copies a database file into memory with SQLite's backup API and opens the copy read-only.
+
+        Reports then read RAM only, so they neither wait for nor block the writers of the file,
+        e.g. a running GUI. The copy is consistent as of the moment it was taken and is updated
+        by refresh_snapshot(). Write methods raise sqlite3.OperationalError.
+
+        Parameters:
+        - db_path (str): Path to the SQLite database file; it is opened read-only.
+
+        Returns:
+        - Main_Db: The snapshot, an instance of the class it is called on.
+        """
+        habit_db = cls(":memory:")
+        habit_db.snapshot_of = db_path
+        habit_db.refresh_snapshot()
+        return habit_db
+
+    def refresh_snapshot(self):
+        """
+        Copies the database file of a snapshot into memory again, replacing the previous copy.
+        """
+        if self.snapshot_of is None:
+            raise ValueError("Only a database opened with open_snapshot can be refreshed")
+        source = _connect_read_only(self.snapshot_of)
+        with self._write_lock:
+            self.conn.rollback()  # Ends the transaction a refused write may have left open
+            cur = self.conn.cursor()
+            cur.execute("PRAGMA query_only = OFF")
+            try:
+                # One step, so the copy is consistent even while the file is written
+                source.backup(self.conn)
+                # A file of an older version is migrated in memory only
+                self.create_table()
+            finally:
+                cur.execute("PRAGMA query_only = ON")
+                source.close()
+            self._names = None
+            self._bump()
+
+    def set_trace_callback(self, callback):
+        """
+        Sets the SQLite trace callback of the write connection and of every read connection,
+        including the ones opened later.
+
+        Parameters:
+        - callback (callable): Called with the text of each SQL statement as it starts, on the
+          thread running it, or None to stop tracing.
+        """
+        with self._write_lock, self._readers_lock:
+            self._trace_callback = callback
+            self.conn.set_trace_callback(callback)
+            for conn in self._reader_connections:
+                conn.set_trace_callback(callback)
+
+    def close(self):
+        """
+        Closes the write connection and all read connections.
+        """
+        with self._write_lock:
+            self.conn.close()
+        with self._readers_lock:
+            for conn in self._reader_connections:
+                conn.close()
+            self._reader_connections = []
+
+    def _commit(self):
+        """
+        Commits the pending writes unless they are deferred to an enclosing transaction.
+        """
+        if self.autocommit and self._transaction_depth == 0:
+            self.conn.commit()
+            self._publish_changes()
+
+    def _rollback(self):
+        """
+        Rolls back the pending writes unless an enclosing transaction decides about them.
+        """
+        if self.autocommit and self._transaction_depth == 0:
+            self.conn.rollback()
+            self._names = None  # Reload the name index, it may contain rolled back names
+            self._discard_changes()
+
+    def commit(self):
+        """
+        Commits all pending writes, e.g. the writes deferred with autocommit=False.
         """
-        # Connect to the SQLite database (or create it if it doesn't exist)
-        self.conn = sqlite3.connect(db_path)
-        self.cur = self.conn.cursor()
+        with self._write_lock:
+            self.conn.commit()
+            self._publish_changes()
 
-    def create_table(self):
+    def rollback(self):
         """
-        Creates the necessary tables in the database if they do not already exist.
+        Discards all pending writes.
         """
-        # Create the 'habits' table if it does not exist
-        self.cur.execute("""
+        with self._write_lock:
+            self.conn.rollback()
+            self._names = None  # Reload the name index, it may contain rolled back names
+            self._discard_changes()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Groups the writes in the block into one atomic commit.
+
+        The writes are committed when the block ends and rolled back if it raises. Nested
+        blocks join the outermost transaction. Other threads wait to write until the block ends.
+
+        Example:
+            with db.transaction():
+                db.add_habit_log(1, '2024-07-05')
+                db.add_habit_log(2, '2024-07-05')
+        """
+        with self._writing():
+            self._transaction_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._transaction_depth -= 1
+                if self._transaction_depth == 0:
+                    self.rollback()
+                raise
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.commit()
+
+    def create_table(self, migrate=True):
+        """
+        Creates the necessary tables in the database if they do not already exist and applies
+        the pending migrations, so a new or older database gets the current schema.
+
+        Parameters:
+        - migrate (bool): Whether to migrate; False leaves the tables of schema version 0, e.g.
+          to load data in the format written before the migrations.
+        """
+        with self._writing() as cur:
+            # Create the 'habits' table if it does not exist
+            cur.execute("""
         CREATE TABLE IF NOT EXISTS habits (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT,
@@ -30,10 +472,10 @@ class Main_Db:
         category TEXT,
         created_at DATETIME)
         """)
-        self.conn.commit()
+            self._commit()
 
-        # Create the 'habit_logs' table if it does not exist
-        self.cur.execute("""
+            # Create the 'habit_logs' table if it does not exist
+            cur.execute("""
         CREATE TABLE IF NOT EXISTS habit_logs (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         habit_id INTEGER,
@@ -41,26 +483,127 @@ class Main_Db:
         completed_at TEXT,
         FOREIGN KEY(habit_id) REFERENCES habits(id))
         """)
-        self.conn.commit()
+            self._commit()
+
+        if migrate:
+            self.migrate()
+
+    def migrate(self):
+        """
+        Upgrades the database schema in place by applying all pending migrations.
+
+        Each migration runs in its own transaction and bumps PRAGMA user_version, so an
+        interrupted upgrade resumes from the last completed migration.
+
+        Returns:
+        - int: The schema version of the database after the upgrade.
+        """
+        with self._writing() as cur:
+            self.conn.commit()  # Each migration opens its own transaction below
+            cur.execute("PRAGMA user_version")
+            version = cur.fetchone()[0]
+
+            for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+                try:
+                    cur.execute("BEGIN")
+                    for statement in statements:
+                        if callable(statement):
+                            statement(self)
+                        else:
+                            cur.execute(statement)
+                    cur.execute(f"PRAGMA user_version = {number}")
+                    self.conn.commit()
+                    self._publish_changes()
+                except sqlite3.Error:
+                    self.conn.rollback()
+                    self._discard_changes()
+                    raise
+
+        return max(version, len(MIGRATIONS))
 
     def edit_habits(self, habit_id, name, periodicity, category):
-        query="UPDATE habits SET name=?, periodicity=?, category=? WHERE id=?"
-        self.cur.execute(query, (name, category, periodicity, habit_id))
-        self.conn.commit()
+        habit_id = int(habit_id)  # The GUI passes the ID as entered; the summaries are keyed by int
+        with self._writing() as cur:
+            old_name = self._get_habit_name(habit_id) if self._names is not None else None
+            query="UPDATE habits SET name=?, periodicity=?, category=? WHERE id=?"
+            try:
+                cur.execute(query, (name, periodicity, category, habit_id))
+                renamed = cur.rowcount
+                self._changed(habit_id)
+                # A new periodicity changes every streak of the habit
+                self._rebuild_habit_stats(habit_id)
+            except sqlite3.Error:
+                self._rollback()
+                raise
+            self._commit()
+            if renamed:
+                self._unindex_name(old_name)
+                self._index_name(name)
 
-    def habit_exists(self, habit_name):
+    def habit_exists(self, habit_name, case_sensitive=True):
         """
         Checks if a habit with the given name exists in the database.
 
         Parameters:
         - habit_name (str): The name of the habit to check.
+        - case_sensitive (bool): If False, names differing only in the case of ASCII letters match.
 
         Returns:
         - bool: True if the habit exists, otherwise False.
         """
-        # Retrieve all habits and check if any habit has the given name
-        habits = self.list_all_habits()
-        return any(habit[1] == habit_name for habit in habits)
+        if self.name_index:
+            # The index is changed by the writers, so it is read under the write lock
+            with self._write_lock:
+                if self._names is None:
+                    self._load_name_index()
+                if case_sensitive:
+                    return habit_name in self._names
+                return self._nocase_names[habit_name.translate(NOCASE)] > 0
+
+        # Both lookups are answered by an index on habits.name
+        if case_sensitive:
+            query = "SELECT EXISTS(SELECT 1 FROM habits WHERE name = ?)"
+        else:
+            query = "SELECT EXISTS(SELECT 1 FROM habits WHERE name = ? COLLATE NOCASE)"
+        with self._reading() as cur:
+            cur.execute(query, (habit_name,))
+            return bool(cur.fetchone()[0])
+
+    def _load_name_index(self):
+        """
+        Loads the names of all habits into the in-memory name index.
+        """
+        with self._writing() as cur:
+            cur.execute("SELECT name FROM habits")
+            self._names = set()
+            self._nocase_names = Counter()
+            for (name,) in cur.fetchall():
+                self._index_name(name)
+
+    def _index_name(self, name):
+        """
+        Adds a habit name to the in-memory name index, if it is loaded.
+        """
+        if self._names is not None and name is not None:
+            self._names.add(name)
+            self._nocase_names[name.translate(NOCASE)] += 1
+
+    def _unindex_name(self, name):
+        """
+        Removes a habit name from the in-memory name index, if it is loaded.
+        """
+        if self._names is not None and name in self._names:
+            self._names.discard(name)
+            self._nocase_names[name.translate(NOCASE)] -= 1
+
+    def _get_habit_name(self, habit_id):
+        """
+        Retrieves the name of a habit, or None if the habit does not exist.
+        """
+        with self._reading() as cur:
+            cur.execute("SELECT name FROM habits WHERE id = ?", (habit_id,))
+            result = cur.fetchone()
+        return result[0] if result else None
 
     def add_habits(self, name, periodicity, category, created_at=datetime.now().strftime('%Y-%m-%d')):
         """
@@ -73,8 +616,44 @@ class Main_Db:
         - completed_at (int): The default value for completed_at, usually 0.
         """
         query = "INSERT INTO habits (name, periodicity, category, created_at) VALUES (?, ?, ?, ?)"
-        self.cur.execute(query, (name, periodicity, category, created_at))
-        self.conn.commit()
+        with self._writing() as cur:
+            try:
+                cur.execute(query, (name, periodicity, category, created_at))
+            except sqlite3.Error:
+                # E.g. a duplicate name; the open transaction would keep other writers locked out
+                self._rollback()
+                raise
+            self._commit()
+            self._index_name(name)
+
+    def add_habits_bulk(self, habits, chunk_size=1000):
+        """
+        Adds many habits with one statement per chunk.
+
+        Parameters:
+        - habits (iterable): (name, periodicity, category) or (name, periodicity, category, created_at)
+          tuples. Any iterable works, including generators, and it is consumed lazily.
+        - chunk_size (int): The number of habits committed together, or None to commit once at the end.
+
+        Returns:
+        - int: The number of habits added.
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        query = "INSERT INTO habits (name, periodicity, category, created_at) VALUES (?, ?, ?, ?)"
+        total = 0
+        for chunk in _chunked(habits, chunk_size):
+            chunk = [habit if len(habit) == 4 else (*habit, today) for habit in chunk]
+            with self._writing() as cur:
+                try:
+                    cur.executemany(query, chunk)
+                except sqlite3.Error:
+                    self._rollback()
+                    raise
+                self._commit()
+                for habit in chunk:
+                    self._index_name(habit[0])
+            total += len(chunk)
+        return total
 
     def delete_habits(self, habit_id):
         """
@@ -83,9 +662,29 @@ class Main_Db:
         Parameters:
         - habit_id (int): The ID of the habit to delete.
         """
-        query = "DELETE FROM habits WHERE id = ?"
-        self.cur.execute(query, (habit_id,))
-        self.conn.commit()
+        habit_id = int(habit_id)
+        with self._writing() as cur:
+            name = self._get_habit_name(habit_id) if self._names is not None else None
+            query = "DELETE FROM habits WHERE id = ?"
+            cur.execute(query, (habit_id,))
+            cur.execute("DELETE FROM habit_stats WHERE habit_id = ?", (habit_id,))
+            self._changed(habit_id)
+            self._commit()
+            self._unindex_name(name)
+
+    def get_habit(self, habit_id):
+        """
+        Retrieves one habit by its ID.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+
+        Returns:
+        - tuple: The row of the habit, like list_all_habits, or None if it does not exist.
+        """
+        with self._reading() as cur:
+            cur.execute("SELECT * FROM habits WHERE id = ?", (habit_id,))
+            return cur.fetchone()
 
     def list_all_habits(self):
         """
@@ -95,8 +694,281 @@ class Main_Db:
         - list: A list of tuples representing all habits.
         """
         query = "SELECT * FROM habits"
-        self.cur.execute(query)
-        return self.cur.fetchall()
+        with self._reading() as cur:
+            cur.execute(query)
+            return cur.fetchall()
+
+    def list_all_logs(self):
+        """
+        Retrieves the logs of all habits in a single query.
+
+        Returns:
+        - list: A list of tuples representing all logs, ordered by habit ID and completion date.
+        """
+        query = "SELECT * FROM habit_logs ORDER BY habit_id, completed_at"
+        with self._reading() as cur:
+            cur.execute(query)
+            return cur.fetchall()
+
+    def count_habits(self):
+        """
+        Counts the habits in the database.
+
+        Returns:
+        - int: The number of habits.
+        """
+        with self._reading() as cur:
+            cur.execute("SELECT COUNT(*) FROM habits")
+            return cur.fetchone()[0]
+
+    def list_habits_page(self, after_id=None, limit=100):
+        """
+        Retrieves one page of habits ordered by ID, using keyset pagination.
+
+        Parameters:
+        - after_id (int): The ID of the last habit on the previous page, or None for the first page.
+        - limit (int): The maximum number of habits on the page.
+
+        Returns:
+        - list: A list of tuples representing the habits on the page.
+        """
+        with self._reading() as cur:
+            if after_id is None:
+                cur.execute("SELECT * FROM habits ORDER BY id LIMIT ?", (limit,))
+            else:
+                cur.execute("SELECT * FROM habits WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit))
+            return cur.fetchall()
+
+    def list_habits_sorted(self, order_by, limit=100, offset=0):
+        """
+        Retrieves one page of habits with their cached summaries, sorted inside SQLite.
+
+        Parameters:
+        - order_by (list): (column, descending) pairs, most significant first. Columns are keys of
+          SORT_COLUMNS. Ties are broken by habit ID in the direction of the last key.
+        - limit (int): The maximum number of habits on the page.
+        - offset (int): The number of habits before the page.
+
+        Returns:
+        - list: Tuples of the habit columns followed by current_streak, longest_streak,
+          last_completed and total_completed, like list_habit_stats.
+        """
+        keys = []
+        for column, descending in order_by:
+            if column not in SORT_COLUMNS:
+                raise ValueError(f"Cannot sort by column: {column}")
+            keys.append(f"{SORT_COLUMNS[column]} {'DESC' if descending else 'ASC'}")
+        # The tiebreaker names the ID of the first key's table, so SQLite can walk that table's
+        # index in order and stop after the page instead of sorting every habit
+        tiebreaker = "s.habit_id" if order_by and SORT_COLUMNS[order_by[0][0]].startswith("s.") else "h.id"
+        last_descending = order_by[-1][1] if order_by else False
+        keys.append(f"{tiebreaker} {'DESC' if last_descending else 'ASC'}")
+
+        query = f"""
+        SELECT h.*, s.current_streak, s.longest_streak, IFNULL(s.last_completed, 'N/A'), s.total_completed
+        FROM habits h JOIN habit_stats s ON s.habit_id = h.id
+        ORDER BY {", ".join(keys)}
+        LIMIT ? OFFSET ?
+        """
+        with self._reading() as cur:
+            cur.execute(query, (limit, offset))
+            return cur.fetchall()
+
+    def get_habit_id_at(self, offset):
+        """
+        Retrieves the ID of the habit at a position in ID order.
+
+        Used to find the keyset of a page that was jumped to without reading the pages before it.
+
+        Parameters:
+        - offset (int): The zero-based position of the habit.
+
+        Returns:
+        - int: The ID of the habit, or None if there are not that many habits.
+        """
+        with self._reading() as cur:
+            cur.execute("SELECT id FROM habits ORDER BY id LIMIT 1 OFFSET ?", (offset,))
+            result = cur.fetchone()
+        return result[0] if result else None
+
+    def iter_habits(self, batch_size=1000):
+        """
+        Streams all habits from the database, ordered by ID.
+
+        Parameters:
+        - batch_size (int): The number of rows fetched from SQLite at a time.
+
+        Returns:
+        - generator: One tuple per habit, like list_all_habits.
+        """
+        yield from self._stream("SELECT * FROM habits ORDER BY id", (), batch_size)
+
+    def iter_logs(self, habit_id, since=None, until=None, reverse=False, batch_size=1000):
+        """
+        Streams the logs of a habit in completion day order without loading them all at once.
+
+        Parameters:
+        - habit_id (int): The ID of the habit, or None for the logs of all habits ordered by habit ID.
+        - since (str): Only logs completed on or after this 'YYYY-MM-DD' date.
+        - until (str): Only logs completed on or before this 'YYYY-MM-DD' date.
+        - reverse (bool): Stream the newest logs first.
+        - batch_size (int): The number of rows fetched from SQLite at a time.
+
+        Returns:
+        - generator: One tuple per log, like get_habits_id.
+        """
+        conditions, params = [], []
+        if habit_id is not None:
+            conditions.append("habit_id = ?")
+            params.append(habit_id)
+        # By day like get_logs_between, so a log with a time, e.g. of complete_habits, is in the
+        # range of its day
+        if since is not None:
+            conditions.append("completed_day >= ?")
+            params.append(to_day(since))
+        if until is not None:
+            conditions.append("completed_day <= ?")
+            params.append(to_day(until))
+
+        query = "SELECT * FROM habit_logs"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        direction = "DESC" if reverse else "ASC"
+        query += f" ORDER BY habit_id {direction}, completed_day {direction}"
+
+        yield from self._stream(query, params, batch_size)
+
+    def iter_completion_days(self, habit_id, since=None, until=None, reverse=False, batch_size=1000):
+        """
+        Streams the completion days of a habit as integer day ordinals, in order.
+
+        Only completed logs are returned, read from the (habit_id, completed_day) index.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+        - since (str): Only completions on or after this 'YYYY-MM-DD' date.
+        - until (str): Only completions on or before this 'YYYY-MM-DD' date.
+        - reverse (bool): Stream the newest completion first.
+        - batch_size (int): The number of rows fetched from SQLite at a time.
+
+        Returns:
+        - generator: One int per completed log; convert with analytics.to_iso for display.
+        """
+        query = "SELECT completed_day FROM habit_logs WHERE habit_id = ? AND completed = 1"
+        params = [habit_id]
+        if since is not None:
+            query += " AND completed_day >= ?"
+            params.append(to_day(since))
+        if until is not None:
+            query += " AND completed_day <= ?"
+            params.append(to_day(until))
+        query += " ORDER BY completed_day DESC" if reverse else " ORDER BY completed_day"
+
+        for (day,) in self._stream(query, params, batch_size):
+            yield day
+
+    def get_logs_between(self, habit_id, start, end):
+        """
+        Retrieves the logs of a habit completed within a date range, through the
+        (habit_id, completed_day) index instead of reading the whole history.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+        - start (str): The first day of the range as 'YYYY-MM-DD', inclusive.
+        - end (str): The last day of the range as 'YYYY-MM-DD', inclusive.
+
+        Returns:
+        - list: The logs in the range, like get_habits_id, oldest first.
+        """
+        query = "SELECT * FROM habit_logs WHERE habit_id = ? AND completed_day BETWEEN ? AND ? ORDER BY completed_day"
+        with self._reading() as cur:
+            cur.execute(query, (habit_id, to_day(start), to_day(end)))
+            return cur.fetchall()
+
+    def count_completions_between(self, habit_id, start=None, end=None):
+        """
+        Counts the completed logs of a habit within a date range. The count is answered from the
+        (habit_id, completed_day, completed) index alone.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+        - start (str): The first day of the range as 'YYYY-MM-DD', inclusive, or None for no lower bound.
+        - end (str): The last day of the range as 'YYYY-MM-DD', inclusive, or None for no upper bound.
+
+        Returns:
+        - int: The number of completions in the range.
+        """
+        query = "SELECT COUNT(*) FROM habit_logs WHERE habit_id = ? AND completed = 1"
+        params = [habit_id]
+        if start is not None:
+            query += " AND completed_day >= ?"
+            params.append(to_day(start))
+        if end is not None:
+            query += " AND completed_day <= ?"
+            params.append(to_day(end))
+        with self._reading() as cur:
+            cur.execute(query, params)
+            return cur.fetchone()[0]
+
+    def iter_all_completion_days(self, batch_size=1000):
+        """
+        Streams the completion days of all habits, ordered by habit ID and day.
+
+        Parameters:
+        - batch_size (int): The number of rows fetched from SQLite at a time.
+
+        Returns:
+        - generator: One (habit_id, day) tuple per completed log.
+        """
+        yield from self._stream(
+            "SELECT habit_id, completed_day FROM habit_logs WHERE completed = 1 ORDER BY habit_id, completed_day",
+            (), batch_size)
+
+    def list_habit_metrics(self):
+        """
+        Calculates the metrics of all habits inside SQLite with window functions.
+
+        Consecutive completions whose gap is within the habit's periodicity form an island
+        (gaps-and-islands); the islands give the streaks in one statement. The running sum
+        uses the default RANGE frame, so completions on the same day share their island.
+
+        Returns:
+        - list: (id, name, periodicity, category, created_at, current_streak, longest_streak,
+          last_completed_day, total_completed) per habit, ordered by ID. last_completed_day is a
+          day ordinal or None.
+        """
+        query = """
+        WITH gaps AS (
+            SELECT l.habit_id, l.completed_day AS day,
+            l.completed_day - LAG(l.completed_day) OVER (PARTITION BY l.habit_id ORDER BY l.completed_day) AS gap,
+            CAST(h.periodicity AS INTEGER) AS periodicity
+            FROM habit_logs l JOIN habits h ON h.id = l.habit_id
+            WHERE l.completed = 1
+        ),
+        islands AS (
+            SELECT habit_id, day,
+            SUM(CASE WHEN gap IS NULL OR gap > periodicity THEN 1 ELSE 0 END)
+            OVER (PARTITION BY habit_id ORDER BY day) AS island
+            FROM gaps
+        ),
+        runs AS (
+            SELECT habit_id, island, COUNT(*) AS length, MAX(day) AS last_day
+            FROM islands GROUP BY habit_id, island
+        ),
+        summary AS (
+            SELECT habit_id, MAX(island) AS last_island, MAX(length) AS longest,
+            MAX(last_day) AS last_day, SUM(length) AS total
+            FROM runs GROUP BY habit_id
+        )
+        SELECT h.*, IFNULL(c.length, 0), IFNULL(s.longest, 0), s.last_day, IFNULL(s.total, 0)
+        FROM habits h
+        LEFT JOIN summary s ON s.habit_id = h.id
+        LEFT JOIN runs c ON c.habit_id = h.id AND c.island = s.last_island
+        ORDER BY h.id
+        """
+        with self._reading() as cur:
+            cur.execute(query)
+            return cur.fetchall()
 
     def get_habits_id(self, habit_id):
         """
@@ -109,8 +981,9 @@ class Main_Db:
         - list: A list of tuples representing all logs for the specified habit.
         """
         query = "SELECT * FROM habit_logs WHERE habit_id = ?"
-        self.cur.execute(query, (habit_id,))
-        return self.cur.fetchall()
+        with self._reading() as cur:
+            cur.execute(query, (habit_id,))
+            return cur.fetchall()
 
     def add_habit_log(self, habit_id, completed_at):
         """
@@ -119,12 +992,64 @@ class Main_Db:
         Parameters:
         - habit_id (int): The ID of the habit.
         - completed_at (str): The date and time when the habit was completed.
+
+        Returns:
+        - bool: True if the completion was logged, False if the habit was already completed that day.
         """
-        query = "INSERT INTO habit_logs (habit_id, completed_at, completed) VALUES (?, ?, ?)"
-        self.cur.execute(query, (habit_id, completed_at, 1))  # 'completed' is set to 1 to mark completion
-        self.conn.commit()
+        habit_id = int(habit_id)
+        day = to_day(completed_at)
+        with self._writing() as cur:
+            try:
+                cur.execute(INSERT_LOG, (habit_id, completed_at, day))
+                logged = cur.rowcount > 0
+                if logged:
+                    self._record_completions(habit_id, [day])
+            except sqlite3.Error:
+                self._rollback()
+                raise
+            self._commit()
+        return logged
 
 
+    def add_habit_logs_bulk(self, logs, chunk_size=1000):
+        """
+        Adds many completion logs, one transaction per chunk.
+
+        The summaries of the habits in a chunk are updated once per chunk. Like add_habit_log,
+        a day that is already logged for a habit is not logged again.
+
+        Parameters:
+        - logs (iterable): (habit_id, completed_at) tuples. Any iterable works, including
+          generators, and it is consumed lazily.
+        - chunk_size (int): The number of logs committed together, or None to commit once at the end.
+
+        Returns:
+        - int: The number of logs added, without the completions of days that were already logged.
+        """
+        total = 0
+        for chunk in _chunked(logs, chunk_size):
+            chunk = [(habit_id, completed_at, to_day(completed_at)) for habit_id, completed_at in chunk]
+            days_by_habit = {}
+            with self._writing() as cur:
+                try:
+                    # Stage the chunk with one statement, then copy it over with the per-day upsert;
+                    # RETURNING names the logs that were written, and only those count towards the
+                    # summaries.
+                    cur.execute("CREATE TEMP TABLE IF NOT EXISTS staged_logs (habit_id, completed_at, completed_day)")
+                    cur.executemany("INSERT INTO staged_logs VALUES (?, ?, ?)", chunk)
+                    cur.execute(STAGED_INSERT_LOG)
+                    for habit_id, day in cur.fetchall():
+                        days_by_habit.setdefault(habit_id, []).append(day)
+                    cur.execute("DELETE FROM staged_logs")
+                    for habit_id, days in days_by_habit.items():
+                        self._record_completions(habit_id, sorted(days))
+                except sqlite3.Error:
+                    self._rollback()
+                    raise
+                self._commit()
+            total += sum(len(days) for days in days_by_habit.values())
+        return total
+
     def complete_habits(self, habit_id, completed_at):
         """
         Marks a habit as completed in the logs and updates the habit's updated_at field.
@@ -133,13 +1058,295 @@ class Main_Db:
         - habit_id (int): The ID of the habit.
         - completed_at (str): The date and time when the habit was completed.
         """
+        habit_id = int(habit_id)
         # Update the habit_logs to mark the completion
-        query = "UPDATE habit_logs SET completed = 1 WHERE completed_at = ? AND habit_id = ?"
-        self.cur.execute(query, (completed_at, habit_id))
-        self.conn.commit()
+        query = "UPDATE habit_logs SET completed = 1 WHERE completed_at = ? AND habit_id = ? AND completed != 1"
+        with self._writing() as cur:
+            try:
+                cur.execute(query, (completed_at, habit_id))
+                if cur.rowcount > 0:
+                    self._record_completions(habit_id, [to_day(completed_at)] * cur.rowcount)
+            except sqlite3.Error:
+                self._rollback()
+                raise
+            self._commit()
+
+            # Update the updated_at field in the habit_stats table
+            self.update_habit_updated_at(habit_id)
+
+    def update_habit_updated_at(self, habit_id):
+        """
+        Sets the updated_at field of a habit's summary to the current time.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+        """
+        query = "UPDATE habit_stats SET updated_at = ? WHERE habit_id = ?"
+        with self._writing() as cur:
+            cur.execute(query, (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), habit_id))
+            self._commit()
+
+    def _record_completions(self, habit_id, days):
+        """
+        Updates the summary of a habit for new completions without reading its logs.
+
+        Completions dated before the last completion change streaks in the middle of the
+        history, so the summary of that habit is rebuilt from its logs instead.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+        - days (list): The day ordinals of the completions, in ascending order.
+        """
+        self._changed(habit_id)
+        with self._writing() as cur:
+            cur.execute("""
+        SELECT h.periodicity, s.current_streak, s.longest_streak, s.last_completed, s.total_completed
+        FROM habits h LEFT JOIN habit_stats s ON s.habit_id = h.id
+        WHERE h.id = ?
+        """, (habit_id,))
+            row = cur.fetchone()
+        if row is None:
+            return  # Logs of unknown habits have no summary
+
+        periodicity, current_streak, longest_streak, last_completed, total_completed = row
+        last_day = to_day(last_completed) if last_completed is not None else None
+        if last_day is not None and days[0] < last_day:
+            # Backdated completion
+            self._rebuild_habit_stats(habit_id)
+            return
+
+        if last_day is None:
+            longest_streak, total_completed = 0, 0
+        for day in days:
+            if last_day is not None and day - last_day <= int(periodicity):
+                current_streak += 1
+            else:
+                current_streak = 1
+            longest_streak = max(longest_streak, current_streak)
+            total_completed += 1
+            last_day = day
+
+        self._write_habit_stats(habit_id, (current_streak, longest_streak, to_iso(last_day), total_completed))
+
+    def _write_habit_stats(self, habit_id, metrics):
+        """
+        Stores the summary of a habit.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+        - metrics (tuple): (current_streak, longest_streak, last_completed, total_completed)
+        """
+        current_streak, longest_streak, last_completed, total_completed = metrics
+        query = "INSERT OR REPLACE INTO habit_stats VALUES (?, ?, ?, ?, ?, ?)"
+        with self._writing() as cur:
+            cur.execute(query, (habit_id, current_streak, longest_streak,
+                                None if last_completed == "N/A" else last_completed, total_completed,
+                                datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+    def _recompute_habit_stats(self, habit_id=None):
+        """
+        Computes the summaries of one or all habits from their full log history.
+
+        Parameters:
+        - habit_id (int): The ID of the habit, or None for all habits.
+
+        Returns:
+        - dict: Maps each habit ID to (current_streak, longest_streak, last_completed, total_completed).
+        """
+        with self._reading() as cur:
+            if habit_id is None:
+                cur.execute("SELECT id, periodicity FROM habits")
+                periodicities = dict(cur.fetchall())
+            else:
+                cur.execute("SELECT id, periodicity FROM habits WHERE id = ?", (habit_id,))
+                periodicities = dict(cur.fetchall())
+        if habit_id is None:
+            days = self.iter_all_completion_days()
+        else:
+            days = ((habit_id, day) for day in self.iter_completion_days(habit_id))
+
+        stats = {current_id: (0, 0, "N/A", 0) for current_id in periodicities}
+        for current_id, rows in groupby(days, key=lambda row: row[0]):
+            if current_id in periodicities:
+                stats[current_id] = calculate_metrics((day for _, day in rows), int(periodicities[current_id]))
+        return stats
+
+    def _rebuild_habit_stats(self, habit_id=None):
+        """
+        Replaces the summaries of one or all habits with a full recompute, without committing.
+        """
+        for current_id, metrics in self._recompute_habit_stats(habit_id).items():
+            self._write_habit_stats(current_id, metrics)
+
+    def rebuild_habit_stats(self, habit_id=None):
+        """
+        Rebuilds the summaries of one or all habits from their logs.
+
+        Parameters:
+        - habit_id (int): The ID of the habit, or None for all habits.
+        """
+        with self._writing() as cur:
+            if habit_id is None:
+                cur.execute("DELETE FROM habit_stats")
+            self._rebuild_habit_stats(habit_id)
+            self._commit()
+
+    def _dedupe_logs(self):
+        """
+        Deletes the repeated logs of a habit's day, without committing. The kept log is the
+        oldest completed one of the day, or the oldest one if none is completed.
+
+        Returns:
+        - int: The number of deleted logs.
+        """
+        with self._writing() as cur:
+            cur.execute("""
+        DELETE FROM habit_logs WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY habit_id, completed_day ORDER BY completed = 1 DESC, id
+                ) AS position
+                FROM habit_logs WHERE completed_day IS NOT NULL)
+            WHERE position > 1)
+        """)
+            if cur.rowcount:
+                self._changed()
+            return cur.rowcount
+
+    def habit_version(self, habit_id):
+        """
+        Returns a token that changes whenever the logs or the settings of a habit may have
+        changed, e.g. to tell whether metrics calculated earlier are still valid. Writes of this
+        instance change the token of the habit they touch; a commit of another connection or
+        process, e.g. the server or the CLI next to the GUI, changes the token of every habit.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+
+        Returns:
+        - tuple: A token to compare with an earlier one of the same habit.
+        """
+        # Changes whenever another connection commits to the file, but not for this one's commits.
+        # It is read without the write lock, so a reader does not wait for a running transaction.
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, self._changes_epoch, self._habit_changes.get(habit_id, 0)
 
-        # Update the updated_at field in the habits table
-        self.update_habit_updated_at(habit_id)
+    def _changed(self, habit_id=None):
+        """
+        Bumps the change counter of a habit, or the epoch of all habits if habit_id is None.
+
+        The counter is bumped again when the write is committed: until then the read connections
+        still see the old rows, and metrics they calculate meanwhile must not stay cached.
+        """
+        with self._write_lock:
+            self._bump(habit_id)
+            self._uncommitted_changes.add(habit_id)
+
+    def _bump(self, habit_id=None):
+        """
+        Increments the change counter of a habit, or the epoch if habit_id is None.
+        """
+        if habit_id is None:
+            self._changes_epoch += 1
+        else:
+            self._habit_changes[habit_id] = self._habit_changes.get(habit_id, 0) + 1
+
+    def _publish_changes(self):
+        """
+        Bumps the counters of the habits changed since the last commit again, after the commit.
+        """
+        with self._write_lock:
+            for habit_id in self._uncommitted_changes:
+                self._bump(habit_id)
+            self._uncommitted_changes.clear()
+
+    def _discard_changes(self):
+        """
+        Bumps the epoch after a rollback, which may undo writes that were already read.
+        """
+        with self._write_lock:
+            self._uncommitted_changes.clear()
+            self._bump()
+
+    def compact_logs(self):
+        """
+        Deletes repeated logs of a day and shrinks the database file with VACUUM.
+
+        The migration to one log per habit and day deletes the repeated logs but leaves their
+        pages in the file; run this once afterwards to give the space back. It cannot run inside
+        a transaction() block.
+
+        Returns:
+        - tuple: (number of deleted logs, number of bytes reclaimed)
+        """
+        if self._transaction_depth:
+            raise sqlite3.OperationalError("cannot compact the logs from within a transaction")
+        with self._writing() as cur:
+            before = self._database_size(cur)
+            removed = self._dedupe_logs()
+            if removed:
+                self._rebuild_habit_stats()
+            self.conn.commit()
+            self._publish_changes()
+            cur.execute("VACUUM")
+            return removed, before - self._database_size(cur)
+
+    @staticmethod
+    def _database_size(cur):
+        """
+        Returns the size of the database in bytes.
+        """
+        page_count = cur.execute("PRAGMA page_count").fetchone()[0]
+        return page_count * cur.execute("PRAGMA page_size").fetchone()[0]
+
+    def get_habit_stats(self, habit_id):
+        """
+        Retrieves the cached summary of a habit.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+
+        Returns:
+        - tuple: (current_streak, longest_streak, last_completed, total_completed)
+        """
+        query = "SELECT current_streak, longest_streak, last_completed, total_completed FROM habit_stats WHERE habit_id = ?"
+        with self._reading() as cur:
+            cur.execute(query, (habit_id,))
+            row = cur.fetchone()
+        if row is None:
+            return 0, 0, "N/A", 0
+        return row[0], row[1], row[2] or "N/A", row[3]
+
+    def list_habit_stats(self):
+        """
+        Retrieves all habits together with their cached summaries.
+
+        Returns:
+        - list: Tuples of the habit columns followed by current_streak, longest_streak,
+          last_completed and total_completed.
+        """
+        query = """
+        SELECT h.*, IFNULL(s.current_streak, 0), IFNULL(s.longest_streak, 0),
+        IFNULL(s.last_completed, 'N/A'), IFNULL(s.total_completed, 0)
+        FROM habits h LEFT JOIN habit_stats s ON s.habit_id = h.id
+        """
+        with self._reading() as cur:
+            cur.execute(query)
+            return cur.fetchall()
+
+    def check_habit_stats(self):
+        """
+        Compares the cached summaries against a full recompute from the logs.
+
+        Returns:
+        - list: (habit_id, cached, recomputed) for every habit whose summary is wrong.
+        """
+        mismatches = []
+        for habit_id, recomputed in self._recompute_habit_stats().items():
+            cached = self.get_habit_stats(habit_id)
+            if cached != recomputed:
+                mismatches.append((habit_id, cached, recomputed))
+        return mismatches
 
     def get_habit_id_by_name(self, habit_name):
         """
@@ -148,8 +1355,9 @@ class Main_Db:
         :return:
         """
         query = "SELECT id FROM habits WHERE name = ?"
-        self.cur.execute(query, (habit_name,))
-        result = self.cur.fetchone()
+        with self._reading() as cur:
+            cur.execute(query, (habit_name,))
+            result = cur.fetchone()
         return result[0] if result else None
 
 
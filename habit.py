@@ -1,4 +1,10 @@
-from datetime import datetime
+from datetime import date
+
+from analytics import calculate_metrics, to_day, to_iso
+
+# A current streak usually ends long before the history does, so its backward walk fetches
+# few rows at a time instead of the default thousand
+STREAK_BATCH_SIZE = 64
 
 
 class Habit:
@@ -6,7 +12,7 @@ class Habit:
     Represents a habit with associated methods to track its completion and streaks.
     """
 
-    def __init__(self, habit_id, name, category, periodicity, created_at, habit_db):
+    def __init__(self, habit_id, name, category, periodicity, created_at, habit_db, cache=None):
         """
         Initializes a new Habit instance.
 
@@ -19,6 +25,8 @@ class Habit:
         - created_at (str): The date the habit was created.
         - updated_at (str): The date the habit was last updated.
         - habit_db: The database instance used to track the habit.
+        - cache (MetricsCache): Serves the metrics of the whole history from memory until the
+          habit changes. Metrics of a since/until range are always calculated.
         """
         self.habit_id = habit_id
         self.name = name
@@ -26,63 +34,83 @@ class Habit:
         self.periodicity = int(periodicity)  # Ensure periodicity is an integer
         self.created_at = created_at
         self.db = habit_db
+        self.cache = cache
 
-    def calculate_current_streak(self):
+    @classmethod
+    def from_row(cls, row, habit_db, cache=None):
         """
-        Calculates the current streak of consecutive completions for the habit.
+        Creates a Habit from a row of the habits table.
+
+        Parameters:
+        - row (tuple): A row as returned by Main_Db.list_all_habits: (id, name, periodicity, category, created_at).
+        - habit_db: The database instance used to track the habit.
+        - cache (MetricsCache): The cache of the metrics, or None.
 
         Returns:
-        int: The current streak of completions.
+        Habit: The habit described by the row.
         """
-        # Retrieve all logs for this habit from the database
-        logs = self.db.get_habits_id(self.habit_id)
+        habit_id, name, periodicity, category, created_at = row
+        return cls(habit_id, name, category, periodicity, created_at, habit_db, cache)
 
-        # If no logs are found, the streak is zero
-        if not logs:
-            return 0
+    def _cached_metrics(self):
+        """
+        Retrieves all metrics of the habit from the cache, calculating them in one pass on a miss.
 
-        # Filter logs to only include completed ones and sort by date in descending order
-        logs = sorted([datetime.strptime(log[3], '%Y-%m-%d') for log in logs if log[2] == 1], reverse=True)
+        Returns:
+        tuple: (current streak, longest streak, last completed, total completed)
+        """
+        return self.cache.get(self.db, self.habit_id, self.periodicity, lambda: calculate_metrics(
+            self.db.iter_completion_days(self.habit_id), self.periodicity))
 
-        # Initialize streak counter
-        streak = 1
-        for i in range(1, len(logs)):
-            # Check if the difference between consecutive dates is within the periodicity
-            if (logs[i - 1] - logs[i]).days <= self.periodicity:
-                streak += 1  # Increment streak
-            else:
+    def calculate_current_streak(self):
+        """
+        Calculates the current streak of consecutive completions for the habit.
+
+        Returns:
+        int: The current streak of completions.
+        """
+        if self.cache is not None:
+            return self._cached_metrics()[0]
+
+        # Walk back from the newest completion until the first gap
+        streak = 0
+        previous = None
+        for day in self.db.iter_completion_days(self.habit_id, reverse=True, batch_size=STREAK_BATCH_SIZE):
+            # Check if the difference between consecutive days is within the periodicity
+            if previous is not None and previous - day > self.periodicity:
                 break  # Stop streak calculation if the gap is too long
+            streak += 1  # Increment streak
+            previous = day
 
         return streak
 
-    def calculate_longest_streak(self):
+    def calculate_longest_streak(self, since=None, until=None):
         """
         Calculates the longest streak of consecutive completions for the habit.
 
+        Parameters:
+        - since (str): Only count completions on or after this 'YYYY-MM-DD' date.
+        - until (str): Only count completions on or before this 'YYYY-MM-DD' date.
+
         Returns:
         int: The longest streak of completions.
         """
-        # Retrieve all logs for this habit from the database
-        logs = self.db.get_habits_id(self.habit_id)
-
-        # If no logs are found, the longest streak is zero
-        if not logs:
-            return 0
-
-        # Filter logs to only include completed ones and sort by date in ascending order
-        logs = sorted([datetime.strptime(log[3], '%Y-%m-%d') for log in logs if log[2] == 1])
+        if self.cache is not None and since is None and until is None:
+            return self._cached_metrics()[1]
 
         # Initialize counters for the longest and current streaks
-        longest_streak = 1
-        current_streak = 1
+        longest_streak = 0
+        current_streak = 0
+        previous = None
 
-        for i in range(1, len(logs)):
-            # Check if the difference between consecutive dates is within the periodicity
-            if (logs[i] - logs[i - 1]).days <= self.periodicity:
+        for day in self.db.iter_completion_days(self.habit_id, since=since, until=until):
+            # Check if the difference between consecutive days is within the periodicity
+            if previous is not None and day - previous <= self.periodicity:
                 current_streak += 1  # Increment current streak
-                longest_streak = max(longest_streak, current_streak)  # Update longest streak
             else:
                 current_streak = 1  # Reset current streak if the gap is too long
+            longest_streak = max(longest_streak, current_streak)  # Update longest streak
+            previous = day
 
         return longest_streak
 
@@ -93,33 +121,40 @@ class Habit:
         Returns:
         str: The last completion date as a string in 'YYYY-MM-DD' format, or "N/A" if no completion exists.
         """
-        # Retrieve all logs for this habit from the database
-        logs = self.db.get_habits_id(self.habit_id)
-
-        # If no logs are found, return "N/A"
-        if not logs:
-            return "N/A"
-
-        # Filter logs to only include completed ones
-        logs = [datetime.strptime(log[3], '%Y-%m-%d') for log in logs if log[2] == 1]
+        if self.cache is not None:
+            return self._cached_metrics()[2]
 
-        # Determine the most recent completion date
-        last_completed = max(logs).strftime('%Y-%m-%d') if logs else "N/A"
-        return last_completed
+        # The newest completion comes first, so only one row is read
+        return to_iso(next(self.db.iter_completion_days(self.habit_id, reverse=True), None))
 
-    def calculate_total_completed(self):
+    def calculate_total_completed(self, since=None, until=None):
         """
         Calculates the total number of times the habit has been completed.
 
+        Parameters:
+        - since (str): Only count completions on or after this 'YYYY-MM-DD' date.
+        - until (str): Only count completions on or before this 'YYYY-MM-DD' date.
+
         Returns:
         int: The total number of completions.
         """
-        # Retrieve all logs for this habit from the database
-        logs = self.db.get_habits_id(self.habit_id)
+        if self.cache is not None and since is None and until is None:
+            return self._cached_metrics()[3]
+
+        # Count the number of completions
+        return sum(1 for _ in self.db.iter_completion_days(self.habit_id, since=since, until=until))
+
+    def completions_in_window(self, days=30, until=None):
+        """
+        Counts the completions in the last days of the history, e.g. the last 30 days. Only the
+        window is read, not the whole history.
 
-        # If no logs are found, the total completions are zero
-        if not logs:
-            return 0
+        Parameters:
+        - days (int): The length of the window in days.
+        - until (str): The last day of the window as 'YYYY-MM-DD'. Defaults to today.
 
-        # Sum up the completion status (assuming a status of 1 indicates completion)
-        return sum(log[2] for log in logs)  # Count the number of completions
\ No newline at end of file
+        Returns:
+        int: The number of completions in the window.
+        """
+        end = to_day(until) if until is not None else date.today().toordinal()
+        return self.db.count_completions_between(self.habit_id, to_iso(end - days + 1), to_iso(end))
@@ -0,0 +1,101 @@
+import csv
+import json
+import os
+
+
+def read_csv(path):
+    """
+    Reads the records of a CSV file with a header row one at a time.
+
+    Parameters:
+    - path (str): Path to the CSV file.
+
+    Returns:
+    - generator: One dict per row, keyed by the header.
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        yield from csv.DictReader(file)
+
+
+def read_jsonl(path):
+    """
+    Reads the records of a JSON Lines file one at a time.
+
+    Parameters:
+    - path (str): Path to the JSONL file. Blank lines are skipped.
+
+    Returns:
+    - generator: One dict per line.
+    """
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_records(path):
+    """
+    Reads a CSV or JSONL file, chosen by its extension.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return read_csv(path)
+    if extension in ('.jsonl', '.ndjson'):
+        return read_jsonl(path)
+    raise ValueError(f"Unsupported file type: {extension}")
+
+
+def import_habits(habit_db, path, chunk_size=1000):
+    """
+    Imports habits from a CSV or JSONL file.
+
+    Every record needs the fields name, periodicity and category; created_at is optional.
+
+    Parameters:
+    - habit_db: The database instance to import into.
+    - path (str): Path to the file.
+    - chunk_size (int): The number of habits committed together.
+
+    Returns:
+    - int: The number of habits imported.
+    """
+    def habits():
+        for record in read_records(path):
+            habit = (record['name'], int(record['periodicity']), record['category'])
+            if record.get('created_at'):
+                habit += (record['created_at'],)
+            yield habit
+
+    return habit_db.add_habits_bulk(habits(), chunk_size)
+
+
+def import_logs(habit_db, path, chunk_size=1000):
+    """
+    Imports completion logs from a CSV or JSONL file.
+
+    Every record needs completed_at and either habit_id or the habit's name in habit.
+
+    Parameters:
+    - habit_db: The database instance to import into.
+    - path (str): Path to the file.
+    - chunk_size (int): The number of logs committed together.
+
+    Returns:
+    - int: The number of logs imported; days that were already logged for a habit are skipped.
+    """
+    habit_ids = {}
+
+    def logs():
+        for record in read_records(path):
+            if record.get('habit_id'):
+                habit_id = int(record['habit_id'])
+            else:
+                name = record['habit']
+                if name not in habit_ids:
+                    habit_ids[name] = habit_db.get_habit_id_by_name(name)
+                habit_id = habit_ids[name]
+                if habit_id is None:
+                    raise ValueError(f"Unknown habit: {name}")
+            yield habit_id, record['completed_at']
+
+    return habit_db.add_habit_logs_bulk(logs(), chunk_size)
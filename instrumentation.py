@@ -0,0 +1,448 @@
+"""
+Opt-in profiling: call counts, latencies and row counts of the Main_Db methods, the Habit
+metrics and the GUI handlers, optionally with the SQL statements they run.
+
+Nothing is wrapped until a Profiler instruments an object, so the tracker runs at full speed
+without one. Usage:
+
+    profiler = Profiler(trace_sql=True)
+    profiler.instrument_db(habit_db)
+    profiler.instrument_habits()
+    ...
+    profiler.write("profile.json")  # or .prom for Prometheus text, .folded for flame graphs
+    profiler.uninstrument()
+"""
+import inspect
+import json
+import re
+import threading
+from functools import wraps
+from time import perf_counter
+
+from habit import Habit
+
+# Upper bounds of the latency histogram buckets in seconds, as exported to Prometheus
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Public Main_Db methods that are not timed: a context manager, the tracing switch and the
+# change token read on every metrics cache lookup
+SKIPPED_DB_METHODS = {"transaction", "set_trace_callback", "habit_version"}
+
+HABIT_METHODS = ("calculate_current_streak", "calculate_longest_streak", "calculate_last_completed",
+                 "calculate_total_completed", "completions_in_window")
+
+GUI_HANDLERS = ("open_add_habit_window", "open_delete_habit_window", "open_complete_habit_window",
+                "open_edit_habit_window", "open_analyze_habit_window", "open_pre_def_habit_window",
+                "show_analyze_table", "sort_by_column")
+
+# File suffixes of the export formats, see Profiler.write
+FORMAT_SUFFIXES = {".json": "json", ".prom": "prometheus", ".folded": "folded"}
+
+# SQLite traces statements with their bound values; literals are replaced so that the
+# executions of a statement are counted together
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(statement):
+    """
+    Replaces the literals of an SQL statement with ? and collapses its whitespace.
+
+    Parameters:
+    - statement (str): The statement text, e.g. as passed to a trace callback.
+
+    Returns:
+    - str: The normalized statement.
+    """
+    return _SPACES.sub(" ", _LITERALS.sub("?", statement)).strip()
+
+
+class CallStats:
+    """
+    The counters of one instrumented method or SQL statement.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)  # Calls per latency bucket, not cumulative
+
+    def add(self, elapsed, rows=0, error=False):
+        """
+        Counts one call.
+
+        Parameters:
+        - elapsed (float): The duration of the call in seconds.
+        - rows (int): The number of rows the call returned.
+        - error (bool): Whether the call raised an exception.
+        """
+        self.count += 1
+        self.errors += error
+        self.rows += rows
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        for index, bound in enumerate(BUCKETS):
+            if elapsed <= bound:
+                self.buckets[index] += 1
+                break
+
+    def as_dict(self):
+        """
+        Returns the counters as a JSON-serialisable dict.
+        """
+        return {"count": self.count, "errors": self.errors, "rows": self.rows, "total_seconds": self.total,
+                "mean_seconds": self.total / self.count if self.count else 0.0, "max_seconds": self.max}
+
+
+class Profiler:
+    """
+    Records the calls of the methods it instruments, and with trace_sql the SQL statements of
+    the instrumented databases.
+
+    Methods are wrapped on the instrumented instance or class and restored by uninstrument().
+    Streams such as Main_Db.iter_completion_days are timed while they are consumed, and their
+    rows are counted as they are yielded; a method returning a list counts its length as rows.
+    Nested calls are kept as call stacks with the time spent in each, for flame graphs.
+
+    SQLite reports only when a statement starts, so the duration of a statement is measured up
+    to the start of the next statement or the end of the instrumented call running it. It
+    includes fetching the rows.
+    """
+
+    def __init__(self, trace_sql=False):
+        """
+        Initializes an empty profiler.
+
+        Parameters:
+        - trace_sql (bool): Also record the SQL statements of the databases passed to instrument_db.
+        """
+        self.trace_sql = trace_sql
+        self.enabled = True  # Set to False to pause recording without unwrapping
+        self.calls = {}  # Method name -> CallStats
+        self.statements = {}  # Normalized SQL -> CallStats
+        self.folded = {}  # Call stack tuple -> seconds spent in its last frame itself
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Call stack and running statement of each thread
+        self._patched = []  # (target, attribute, original or None if it was not set on the target)
+        self._traced = []  # Databases with this profiler's trace callback
+
+    def instrument_db(self, habit_db, name=None):
+        """
+        Times every public method of a database instance.
+
+        Parameters:
+        - habit_db (Main_Db): The database; BitmapMainDb and other subclasses work alike.
+        - name (str): The prefix of the recorded method names. Defaults to the class name.
+        """
+        name = name or type(habit_db).__name__
+        for attribute, value in inspect.getmembers(type(habit_db), inspect.isfunction):
+            if not attribute.startswith("_") and attribute not in SKIPPED_DB_METHODS:
+                self._patch(habit_db, attribute, f"{name}.{attribute}")
+        if self.trace_sql:
+            habit_db.set_trace_callback(self._trace)
+            self._traced.append(habit_db)
+        return habit_db
+
+    def instrument_habits(self, habit_class=Habit):
+        """
+        Times the metric methods of every Habit.
+
+        Parameters:
+        - habit_class (type): The class to instrument.
+        """
+        for attribute in HABIT_METHODS:
+            self._patch(habit_class, attribute, f"{habit_class.__name__}.{attribute}")
+
+    def instrument_gui(self, gui):
+        """
+        Times the window handlers of a GUI and the jobs it runs on its worker thread. Call it
+        before the buttons are created, since they keep the handlers they were given.
+
+        Parameters:
+        - gui (GUI): The GUI instance, with its worker already started.
+        """
+        for attribute in GUI_HANDLERS:
+            self._patch(gui, attribute, f"{type(gui).__name__}.{attribute}")
+
+        submit = gui.worker.submit
+
+        @wraps(submit)
+        def submit_timed(func, *args, **kwargs):
+            return submit(self.wrap(func, "job " + func.__qualname__.replace(".<locals>", "")), *args, **kwargs)
+
+        gui.worker.submit = submit_timed
+        self._patched.append((gui.worker, "submit", None))
+
+    def wrap(self, func, name):
+        """
+        Returns a function that records the calls of func under a name.
+
+        Parameters:
+        - func (callable): The function or method to time.
+        - name (str): The name of the recorded calls.
+
+        Returns:
+        - callable: The timed function.
+        """
+        @wraps(func)
+        def timed(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            return self._call(name, func, args, kwargs)
+
+        timed.profiler = self
+        return timed
+
+    def uninstrument(self):
+        """
+        Restores every wrapped method and removes the trace callbacks.
+        """
+        for target, attribute, original in reversed(self._patched):
+            if original is None:
+                delattr(target, attribute)
+            else:
+                setattr(target, attribute, original)
+        self._patched = []
+        for habit_db in self._traced:
+            habit_db.set_trace_callback(None)
+        self._traced = []
+
+    def reset(self):
+        """
+        Forgets all recorded calls and statements.
+        """
+        with self._lock:
+            self.calls = {}
+            self.statements = {}
+            self.folded = {}
+
+    def stats(self):
+        """
+        Returns the recorded counters.
+
+        Returns:
+        - dict: {"calls": {method: counters}, "statements": {sql: counters}}, sorted by name.
+        """
+        self._finish_statement()
+        with self._lock:
+            return {"calls": {name: stats.as_dict() for name, stats in sorted(self.calls.items())},
+                    "statements": {sql: stats.as_dict() for sql, stats in sorted(self.statements.items())}}
+
+    def to_json(self, indent=2):
+        """
+        Returns the recorded counters as JSON, see stats.
+        """
+        return json.dumps(self.stats(), indent=indent)
+
+    def to_prometheus(self, prefix="habit_tracker"):
+        """
+        Returns the recorded counters in the Prometheus text exposition format.
+
+        Parameters:
+        - prefix (str): The prefix of the metric names.
+
+        Returns:
+        - str: One latency histogram and row, error and call counters per method, and a
+          count and duration per SQL statement.
+        """
+        self._finish_statement()
+        lines = []
+        with self._lock:
+            calls, statements = sorted(self.calls.items()), sorted(self.statements.items())
+            lines.append(f"# HELP {prefix}_call_duration_seconds Duration of the instrumented calls.")
+            lines.append(f"# TYPE {prefix}_call_duration_seconds histogram")
+            for name, stats in calls:
+                label = f'method="{_escape(name)}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'{prefix}_call_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_call_duration_seconds_bucket{{{label},le="+Inf"}} {stats.count}')
+                lines.append(f"{prefix}_call_duration_seconds_sum{{{label}}} {stats.total}")
+                lines.append(f"{prefix}_call_duration_seconds_count{{{label}}} {stats.count}")
+            for metric, attribute, help_text in (("call_rows_total", "rows", "Rows returned by the instrumented calls."),
+                                                 ("call_errors_total", "errors", "Instrumented calls that raised.")):
+                lines.append(f"# HELP {prefix}_{metric} {help_text}")
+                lines.append(f"# TYPE {prefix}_{metric} counter")
+                for name, stats in calls:
+                    lines.append(f'{prefix}_{metric}{{method="{_escape(name)}"}} {getattr(stats, attribute)}')
+            for metric, attribute, help_text in (("sql_statements_total", "count", "Executions of each SQL statement."),
+                                                 ("sql_seconds_total", "total", "Time spent in each SQL statement.")):
+                lines.append(f"# HELP {prefix}_{metric} {help_text}")
+                lines.append(f"# TYPE {prefix}_{metric} counter")
+                for sql, stats in statements:
+                    lines.append(f'{prefix}_{metric}{{statement="{_escape(sql)}"}} {getattr(stats, attribute)}')
+        return "\n".join(lines) + "\n"
+
+    def to_folded(self):
+        """
+        Returns the recorded call stacks in the folded format of flamegraph.pl and speedscope:
+        one "outer;inner;innermost microseconds" line per stack, with the time spent in the
+        innermost frame itself. SQL statements appear as "SQL <statement>" frames.
+        """
+        self._finish_statement()
+        with self._lock:
+            stacks = sorted(self.folded.items())
+        return "".join(f"{';'.join(frame.replace(';', ',') for frame in stack)} {round(seconds * 1e6)}\n"
+                       for stack, seconds in stacks if seconds > 0)
+
+    def write(self, path, fmt=None):
+        """
+        Writes the recorded counters to a file.
+
+        Parameters:
+        - path (str): The file to write.
+        - fmt (str): "json", "prometheus" or "folded". Defaults to the format of the file
+          suffix (.json, .prom, .folded), or JSON.
+        """
+        if fmt is None:
+            fmt = next((fmt for suffix, fmt in FORMAT_SUFFIXES.items() if str(path).endswith(suffix)), "json")
+        exporters = {"json": self.to_json, "prometheus": self.to_prometheus, "folded": self.to_folded}
+        if fmt not in exporters:
+            raise ValueError(f"Unknown format: {fmt}")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(exporters[fmt]())
+
+    def _patch(self, target, attribute, name):
+        """
+        Replaces a method of an instance or class with its timed version.
+        """
+        current = getattr(target, attribute)
+        if getattr(current, "profiler", None) is self:
+            return  # Already instrumented
+        original = target.__dict__.get(attribute) if isinstance(target, type) else None
+        setattr(target, attribute, self.wrap(current, name))
+        self._patched.append((target, attribute, original))
+
+    def _stack(self):
+        """
+        Returns the call stack of the current thread: [name, seconds spent in calls below] frames.
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _call(self, name, func, args, kwargs):
+        """
+        Runs and records one call of an instrumented method.
+        """
+        stack = self._stack()
+        stack.append([name, 0.0])
+        start = perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            self._record(name, self._pop(stack, start), error=True)
+            raise
+        elapsed = self._pop(stack, start)
+        if inspect.isgenerator(result):
+            return self._iterate(name, result, elapsed)
+        self._record(name, elapsed, rows=len(result) if isinstance(result, list) else 0)
+        return result
+
+    def _iterate(self, name, iterator, elapsed):
+        """
+        Yields the rows of a stream, timing each step under the name of the call that created it.
+        The call and its stack are recorded once the stream ends or is closed.
+        """
+        rows = 0
+        error = False
+        own = 0.0  # Time of the steps outside the SQL statements and calls below them
+        path = None
+        stack = self._stack()  # A stream is consumed on the thread that created it
+        try:
+            while True:
+                frame = [name, 0.0]
+                stack.append(frame)
+                start = perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    if self.trace_sql:
+                        self._finish_statement()
+                    step = perf_counter() - start
+                    stack.pop()
+                    if stack:
+                        stack[-1][1] += step
+                    if path is None:
+                        path = tuple(outer[0] for outer in stack) + (name,)
+                    elapsed += step
+                    own += step - frame[1]
+                rows += 1
+                yield item
+        finally:
+            iterator.close()  # Releases the connection of a stream closed early
+            self._record(name, elapsed, rows, error)
+            if path is not None:
+                with self._lock:
+                    self.folded[path] = self.folded.get(path, 0.0) + own
+
+    def _pop(self, stack, start):
+        """
+        Ends the innermost frame of a call stack and returns its duration.
+        """
+        self._finish_statement()
+        elapsed = perf_counter() - start
+        frame = stack.pop()
+        path = tuple(outer[0] for outer in stack) + (frame[0],)
+        if stack:
+            stack[-1][1] += elapsed
+        with self._lock:
+            self.folded[path] = self.folded.get(path, 0.0) + elapsed - frame[1]
+        return elapsed
+
+    def _record(self, name, elapsed, rows=0, error=False):
+        """
+        Adds a call to the counters of a method.
+        """
+        with self._lock:
+            stats = self.calls.get(name)
+            if stats is None:
+                stats = self.calls[name] = CallStats()
+            stats.add(elapsed, rows, error)
+
+    def _trace(self, statement):
+        """
+        The SQLite trace callback: ends the previous statement of the thread and starts timing this one.
+        """
+        if not self.enabled:
+            return
+        self._finish_statement()
+        self._local.statement = (normalize_sql(statement), perf_counter())
+
+    def _finish_statement(self):
+        """
+        Records the running statement of the current thread, as a child of the current call.
+        """
+        running = getattr(self._local, "statement", None)
+        if running is None:
+            return
+        self._local.statement = None
+        sql, start = running
+        elapsed = perf_counter() - start
+        stack = self._stack()
+        path = tuple(frame[0] for frame in stack) + ("SQL " + sql,)
+        if stack:
+            stack[-1][1] += elapsed
+        with self._lock:
+            stats = self.statements.get(sql)
+            if stats is None:
+                stats = self.statements[sql] = CallStats()
+            stats.add(elapsed)
+            self.folded[path] = self.folded.get(path, 0.0) + elapsed
+
+
+def _escape(value):
+    """
+    Escapes a Prometheus label value.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
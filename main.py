@@ -1,5 +1,25 @@
+import os
+import sys
+
 from db import Main_Db
+
+if len(sys.argv) > 1:
+    # Commands run headless, see cli.py; Tkinter is only loaded for the GUI
+    from cli import main
+    sys.exit(main(sys.argv[1:]))
+
+habit_db = Main_Db()
+habit_db.create_table()
+
 from GUI import GUI
 
-Main_Db().create_table()
-GUI().run()
\ No newline at end of file
+# HABIT_PROFILE=profile.json (or .prom, .folded) records where the GUI spends its time, and
+# HABIT_PROFILE_SQL=1 adds the SQL statements; the file is written when the window closes
+profile_path = os.environ.get("HABIT_PROFILE")
+if profile_path:
+    from instrumentation import Profiler
+    profiler = Profiler(trace_sql=bool(os.environ.get("HABIT_PROFILE_SQL")))
+    GUI(profiler).run()
+    profiler.write(profile_path)
+else:
+    GUI().run()
@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+
+
+class MetricsCache:
+    """
+    Keeps the metrics of the most recently used habits in memory, least recently used first out.
+
+    An entry is keyed by habit ID and remembers the change token of Main_Db.habit_version it
+    was calculated at, so a completion, edit or deletion of the habit through the same Main_Db
+    invalidates exactly that habit, and a commit of another connection or process invalidates
+    every habit. Use one cache per database instance.
+    """
+
+    def __init__(self, maxsize=1024):
+        """
+        Initializes an empty cache.
+
+        Parameters:
+        - maxsize (int): The number of habits kept in memory.
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # Habit ID -> (change token, periodicity, metrics)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, habit_db, habit_id, periodicity, calculate):
+        """
+        Retrieves the metrics of a habit, calculating them on a miss.
+
+        Parameters:
+        - habit_db: The database instance holding the habit.
+        - habit_id (int): The ID of the habit.
+        - periodicity (int): The periodicity the metrics are calculated with.
+        - calculate (callable): Takes no arguments and returns the metrics of the habit, as
+          analytics.calculate_metrics does.
+
+        Returns:
+        - tuple: (current streak, longest streak, last completed as 'YYYY-MM-DD' or "N/A", total completed)
+        """
+        # The token is taken before calculating, so a write during the calculation leaves
+        # the entry stale rather than hiding the write
+        version = habit_db.habit_version(habit_id)
+        with self._lock:
+            entry = self._entries.get(habit_id)
+            if entry is not None and entry[0] == version and entry[1] == periodicity:
+                self._entries.move_to_end(habit_id)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        metrics = calculate()
+        with self._lock:
+            self._entries[habit_id] = (version, periodicity, metrics)
+            self._entries.move_to_end(habit_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return metrics
+
+    def clear(self):
+        """
+        Forgets all entries. The statistics are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns the statistics of the cache.
+
+        Returns:
+        - dict: The number of hits, misses and evictions, the current size and the maxsize.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self._entries), "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self._entries)
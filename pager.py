@@ -0,0 +1,134 @@
+from collections import OrderedDict
+
+from analytics import analyze_habit_rows, format_summary_rows
+
+
+class HabitPager:
+    """
+    Serves the rows of the Analyze window page by page, computing the metrics of a page only
+    when it is first requested.
+
+    Pages are fetched with keyset pagination on the habit ID and a bounded number of them is
+    kept in memory, least recently used first out. Once a sort order is set, pages are sorted
+    by SQLite instead and read with their metrics from the habit_stats summary table.
+    """
+
+    def __init__(self, habit_db, page_size=100, max_pages=10, order_by=None, cache=None):
+        """
+        Initializes the pager.
+
+        Parameters:
+        - habit_db: The database instance holding the habits and their logs.
+        - page_size (int): The number of habits per page.
+        - max_pages (int): The number of analyzed pages kept in memory.
+        - order_by (list): (column, descending) pairs as taken by Main_Db.list_habits_sorted,
+          or None for the order of the habit IDs.
+        - cache (MetricsCache): Keeps the metrics of unchanged habits across refreshes and
+          pagers, or None.
+        """
+        self.db = habit_db
+        self.cache = cache
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.order_by = order_by
+        self.refresh()
+
+    def sort(self, order_by):
+        """
+        Changes the sort order and forgets the cached pages.
+
+        Parameters:
+        - order_by (list): (column, descending) pairs, or None for the order of the habit IDs.
+        """
+        self.order_by = list(order_by) if order_by else None
+        self.refresh()
+
+    def refresh(self):
+        """
+        Forgets all cached pages, e.g. after habits were added, edited or completed.
+        """
+        self._pages = OrderedDict()  # Page number -> analyzed rows
+        self._last_ids = {}  # Page number -> ID of the last habit on the page
+        self._count = None
+
+    def __len__(self):
+        """
+        Returns the total number of rows.
+        """
+        if self._count is None:
+            self._count = self.db.count_habits()
+        return self._count
+
+    def page(self, number, check=None):
+        """
+        Retrieves the analyzed rows of a page.
+
+        Parameters:
+        - number (int): The zero-based page number.
+        - check (callable): Called before each habit is analyzed, e.g. Job.check to stop a
+          cancelled job, or None. A page that is stopped is not kept.
+
+        Returns:
+        - list: The rows of the page, in the column order of analytics.analyze_habits.
+        """
+        if number in self._pages:
+            self._pages.move_to_end(number)
+            return self._pages[number]
+
+        if self.order_by:
+            # Sorted pages are addressed by offset, since their keys are not unique
+            rows = format_summary_rows(self.db.list_habits_sorted(
+                self.order_by, self.page_size, number * self.page_size))
+        else:
+            habits = self.db.list_habits_page(self._first_id_before(number), self.page_size)
+            rows = analyze_habit_rows(self.db, habits, cache=self.cache, check=check)
+            if habits:
+                self._last_ids[number] = habits[-1][0]
+
+        self._pages[number] = rows
+        if len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return rows
+
+    def _first_id_before(self, number):
+        """
+        Returns the keyset of a page: the ID of the last habit before it.
+        """
+        if number == 0:
+            return None
+        if number - 1 in self._last_ids:
+            return self._last_ids[number - 1]
+        # The page was jumped to, so look its keyset up by position
+        return self.db.get_habit_id_at(number * self.page_size - 1)
+
+    def rows(self, start, stop, check=None):
+        """
+        Retrieves the analyzed rows in the range [start, stop).
+
+        Parameters:
+        - start (int): The position of the first row.
+        - stop (int): The position after the last row.
+        - check (callable): Called between the rows that are analyzed, as for page.
+
+        Returns:
+        - list: The rows in the range; fewer at the end of the table.
+        """
+        rows = []
+        if start >= stop:
+            return rows
+        for number in range(start // self.page_size, (stop - 1) // self.page_size + 1):
+            page_start = number * self.page_size
+            page = self.page(number, check)
+            rows.extend(page[max(start - page_start, 0):stop - page_start])
+        return rows
+
+    def prefetch(self, position, check=None):
+        """
+        Analyzes the page holding a position ahead of time, if it is not cached yet.
+
+        Parameters:
+        - position (int): The position of a row.
+        - check (callable): Called between the rows that are analyzed, as for page.
+        """
+        if 0 <= position < len(self):
+            self.page(position // self.page_size, check)
@@ -0,0 +1,411 @@
+"""
+Serves the habits as a local HTTP/JSON API, so other tools can log completions without the GUI.
+
+Usage: python server.py [--db PATH] [--host HOST] [--port PORT] [--readers N] [--profile [--trace-sql]]
+
+Endpoints:
+  GET    /habits                        All habits
+  POST   /habits                        Add a habit: {"name", "periodicity", "category", "created_at"?}
+  GET    /habits/<id>                   A habit with its metrics
+  PUT    /habits/<id>                   Edit a habit: {"name", "periodicity", "category"}
+  DELETE /habits/<id>                   Delete a habit
+  GET    /habits/<id>/logs              The logs of a habit, optionally ?since=DATE&until=DATE
+  POST   /habits/<id>/completions       Complete a habit: {"completed_at"?}; 200 if that day was already logged
+  GET    /analyze?engine=python         The metrics of all habits
+  POST   /batch                         [{"method", "path", "body"?}, ...] in one transaction
+  GET    /metrics                       Call counts and latencies in Prometheus text format, with --profile
+
+Errors are answered as {"error"}: 400 for an invalid request, 404 for an unknown habit or endpoint,
+409 for a duplicate, 503 if the database is locked or unavailable and 500 for other database errors.
+"""
+import argparse
+import json
+import queue
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from analytics import analyze_habits, to_day
+from db import Main_Db
+from habit import Habit
+from metrics_cache import MetricsCache
+
+HABIT_FIELDS = ("id", "name", "periodicity", "category", "created_at")
+ANALYZE_FIELDS = ("id", "name", "category", "periodicity", "created_at", "current_streak",
+                  "longest_streak", "last_completed", "total_completed")
+LOG_FIELDS = ("id", "habit_id", "completed", "completed_at", "completed_day")
+
+
+class ApiError(Exception):
+    """
+    Raised by an endpoint to answer with an error status.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class CompletionBatcher:
+    """
+    Groups the completions of concurrent requests into shared commits.
+
+    Requests queue their completion and wait. A single thread takes everything queued at once
+    and writes it in one transaction, so the commits of many requests share one fsync. A lone
+    request is written at once, without waiting for company.
+    """
+
+    def __init__(self, habit_db, max_batch=500):
+        """
+        Starts the batching thread.
+
+        Parameters:
+        - habit_db (Main_Db): The database to write to.
+        - max_batch (int): The maximum number of completions committed together.
+        """
+        self.db = habit_db
+        self.max_batch = max_batch
+        self.commits = 0  # Number of transactions, to compare against the completions
+        self.completions = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="CompletionBatcher", daemon=True)
+        self._thread.start()
+
+    def complete(self, habit_id, completed_at):
+        """
+        Logs a completion and returns once it is committed.
+
+        Parameters:
+        - habit_id (int): The ID of the habit.
+        - completed_at (str): The completion date.
+
+        Returns:
+        - bool: True if the completion was logged, False if the habit was already completed that day.
+        """
+        item = [habit_id, completed_at, threading.Event(), None, False]
+        self._queue.put(item)
+        item[2].wait()
+        if item[3] is not None:
+            raise item[3]
+        return item[4]
+
+    def close(self):
+        """
+        Commits the queued completions and stops the batching thread.
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        """
+        The batching thread: commits everything queued, one transaction at a time.
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # Stop after this batch
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        """
+        Writes a batch in one transaction; if that fails, writes its completions one by one so
+        only the faulty ones fail.
+        """
+        try:
+            with self.db.transaction():
+                for item in batch:
+                    item[4] = self.db.add_habit_log(item[0], item[1])
+            self.commits += 1
+        except Exception:
+            for item in batch:
+                try:
+                    item[4] = self.db.add_habit_log(item[0], item[1])
+                    self.commits += 1
+                except Exception as error:
+                    item[3] = error
+        self.completions += len(batch)
+        for item in batch:
+            item[2].set()
+
+
+class HabitApi:
+    """
+    The endpoints of the server, independent of HTTP: each call takes a method, a path and a
+    decoded JSON body and returns a status and a JSON-serialisable body.
+    """
+
+    def __init__(self, habit_db, group_commit=True):
+        """
+        Initializes the API.
+
+        Parameters:
+        - habit_db (Main_Db): The database, shared by all request threads.
+        - group_commit (bool): Group the completions of concurrent requests into shared commits.
+        """
+        self.db = habit_db
+        self.batcher = CompletionBatcher(habit_db) if group_commit else None
+        # All writes go through habit_db, so its change counters keep the cache exact
+        self.cache = MetricsCache()
+
+    def close(self):
+        """
+        Commits the pending completions.
+        """
+        if self.batcher is not None:
+            self.batcher.close()
+
+    def handle(self, method, path, body=None, in_batch=False):
+        """
+        Dispatches a request to its endpoint.
+
+        Parameters:
+        - method (str): The HTTP method.
+        - path (str): The request path, including the query string.
+        - body: The decoded JSON body, or None.
+        - in_batch (bool): Whether the request is part of a /batch request.
+
+        Returns:
+        - tuple: (status, body)
+        """
+        url = urlsplit(path)
+        parts = [part for part in url.path.split("/") if part]
+        query = parse_qs(url.query)
+        try:
+            if parts == ["habits"]:
+                if method == "GET":
+                    return 200, [dict(zip(HABIT_FIELDS, row)) for row in self.db.list_all_habits()]
+                if method == "POST":
+                    return self.add_habit(body)
+            elif len(parts) >= 2 and parts[0] == "habits":
+                habit_id = self.habit_id(parts[1])
+                if len(parts) == 2:
+                    if method == "GET":
+                        return self.get_habit(habit_id)
+                    if method == "PUT":
+                        return self.edit_habit(habit_id, body)
+                    if method == "DELETE":
+                        self.db.delete_habits(habit_id)
+                        return 200, {"id": habit_id}
+                elif parts[2:] == ["logs"] and method == "GET":
+                    if "since" in query or "until" in query:
+                        rows = self.db.get_logs_between(habit_id, query.get("since", ["0001-01-01"])[0],
+                                                        query.get("until", ["9999-12-31"])[0])
+                    else:
+                        rows = self.db.get_habits_id(habit_id)
+                    return 200, [dict(zip(LOG_FIELDS, row)) for row in rows]
+                elif parts[2:] == ["completions"] and method == "POST":
+                    return self.complete_habit(habit_id, body, in_batch)
+            elif parts == ["analyze"] and method == "GET":
+                engine = query.get("engine", ["python"])[0]
+                rows = analyze_habits(self.db, engine=engine)
+                return 200, [dict(zip(ANALYZE_FIELDS, row)) for row in rows]
+            elif parts == ["batch"] and method == "POST" and not in_batch:
+                return self.batch(body)
+            raise ApiError(404, f"No endpoint for {method} {url.path}")
+        except ApiError as error:
+            return error.status, {"error": str(error)}
+        except (ValueError, KeyError, TypeError) as error:
+            return 400, {"error": f"Invalid request: {error}"}
+        except sqlite3.IntegrityError as error:
+            return 409, {"error": str(error)}
+        except sqlite3.OperationalError as error:
+            # E.g. "database is locked" while another process writes; the request can be retried
+            return 503, {"error": f"Database unavailable: {error}"}
+        except sqlite3.Error as error:
+            return 500, {"error": f"Database error: {error}"}
+
+    def habit_id(self, text):
+        """
+        Parses a habit ID from the path and checks that the habit exists.
+        """
+        if not text.isdigit() or self.db.get_habit(int(text)) is None:
+            raise ApiError(404, f"Unknown habit: {text}")
+        return int(text)
+
+    def add_habit(self, body):
+        if self.db.habit_exists(body["name"]):
+            raise ApiError(409, f"Habit with this name already exists: {body['name']}")
+        created_at = body.get("created_at") or datetime.now().strftime('%Y-%m-%d')
+        self.db.add_habits(body["name"], int(body["periodicity"]), body["category"], created_at)
+        return 201, {"id": self.db.get_habit_id_by_name(body["name"])}
+
+    def get_habit(self, habit_id):
+        habit = Habit.from_row(self.db.get_habit(habit_id), self.db, self.cache)
+        return 200, {
+            "id": habit.habit_id, "name": habit.name, "category": habit.category,
+            "periodicity": habit.periodicity, "created_at": habit.created_at,
+            "current_streak": habit.calculate_current_streak(),
+            "longest_streak": habit.calculate_longest_streak(),
+            "last_completed": habit.calculate_last_completed(),
+            "total_completed": habit.calculate_total_completed(),
+        }
+
+    def edit_habit(self, habit_id, body):
+        self.db.edit_habits(habit_id, body["name"], int(body["periodicity"]), body["category"])
+        return 200, {"id": habit_id}
+
+    def complete_habit(self, habit_id, body, in_batch):
+        if body is not None and not isinstance(body, dict):
+            raise ApiError(400, "The completion must be an object")
+        completed_at = (body or {}).get("completed_at") or datetime.now().strftime('%Y-%m-%d')
+        to_day(completed_at)  # Reject malformed dates before they reach the batch
+        if self.batcher is None or in_batch:
+            # Inside /batch the completion joins the batch's own transaction
+            logged = self.db.add_habit_log(habit_id, completed_at)
+        else:
+            logged = self.batcher.complete(habit_id, completed_at)
+        # A day that was already completed is not logged again
+        return 201 if logged else 200, {"habit_id": habit_id, "completed_at": completed_at, "logged": logged}
+
+    def batch(self, requests):
+        """
+        Runs several requests in one transaction; the first failing one rolls all of them back.
+        """
+        if not isinstance(requests, list):
+            raise ApiError(400, "The batch must be a list of requests")
+        responses = []
+        try:
+            with self.db.transaction():
+                for number, request in enumerate(requests):
+                    if not (isinstance(request, dict) and isinstance(request.get("method"), str)
+                            and isinstance(request.get("path"), str)):
+                        raise ApiError(400, f"Request {number} must be an object with a method and a path")
+                    status, body = self.handle(request["method"].upper(), request["path"], request.get("body"),
+                                               in_batch=True)
+                    if status >= 400:
+                        raise ApiError(status, f"Request {number} failed: {body['error']}")
+                    responses.append({"status": status, "body": body})
+        except ApiError as error:
+            return error.status, {"error": str(error), "index": number}
+        return 200, responses
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    Translates HTTP requests into HabitApi calls. HTTP/1.1 keeps client connections open
+    between requests.
+    """
+
+    protocol_version = "HTTP/1.1"
+    api = None  # Set by make_server
+    profiler = None  # Set by make_server when profiling
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.respond()
+
+    def do_PUT(self):
+        self.respond()
+
+    def do_DELETE(self):
+        self.respond()
+
+    def respond(self):
+        if self.path == "/metrics" and self.command == "GET" and self.profiler is not None:
+            self.send_body(200, self.profiler.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length)) if length else None
+        except ValueError:
+            status, payload = 400, {"error": "The body is not valid JSON"}
+        else:
+            status, payload = self.api.handle(self.command, self.path, body)
+
+        self.send_body(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+    def send_body(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # One log line per request would dominate the cost of small requests
+
+
+class HabitServer(ThreadingHTTPServer):
+    """
+    The HTTP server, one thread per client connection.
+    """
+
+    daemon_threads = True
+    # The default backlog of 5 resets connections when many clients connect at once
+    request_queue_size = 128
+
+
+def make_server(db_path="main.db", host="127.0.0.1", port=8000, readers=4, group_commit=True, profiler=None):
+    """
+    Creates the server with its database and API, without starting it.
+
+    Parameters:
+    - db_path (str): Path to the SQLite database file.
+    - host (str): The address to listen on; the default only accepts local clients.
+    - port (int): The port to listen on, or 0 for any free port.
+    - readers (int): The number of pooled read connections.
+    - group_commit (bool): Group the completions of concurrent requests into shared commits.
+    - profiler (Profiler): Records the database and Habit calls and serves them at GET /metrics,
+      or None.
+
+    Returns:
+    - HabitServer: The server; its api attribute holds the HabitApi.
+    """
+    habit_db = Main_Db(db_path, readers=readers)
+    habit_db.create_table()
+    if profiler is not None:
+        profiler.instrument_db(habit_db)
+        profiler.instrument_habits()
+    api = HabitApi(habit_db, group_commit)
+    handler = type("HabitRequestHandler", (RequestHandler,), {"api": api, "profiler": profiler})
+    server = HabitServer((host, port), handler)
+    server.api = api
+    return server
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="server.py", description="Serve the habits as a local JSON API.")
+    parser.add_argument("--db", default="main.db", help="path to the database file (default: main.db)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="0 picks a free port")
+    parser.add_argument("--readers", type=int, default=4, help="number of pooled read connections")
+    parser.add_argument("--no-group-commit", action="store_true", help="commit every completion on its own")
+    parser.add_argument("--profile", action="store_true", help="serve call counts and latencies at /metrics")
+    parser.add_argument("--trace-sql", action="store_true", help="also profile the SQL statements")
+    args = parser.parse_args(argv)
+
+    profiler = None
+    if args.profile:
+        from instrumentation import Profiler  # Not loaded unless profiling
+        profiler = Profiler(trace_sql=args.trace_sql)
+    server = make_server(args.db, args.host, args.port, args.readers, not args.no_group_commit, profiler)
+    print(f"Serving on http://{server.server_address[0]}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.api.close()
+        server.api.db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
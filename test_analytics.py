@@ -0,0 +1,152 @@
+# test_analytics.py
+
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+import analytics
+from analytics import calculate_metrics, analyze_habits, iter_analyze_parallel, to_day, to_iso, ENGINES, HAS_NUMPY
+from db import Main_Db
+from habit import Habit
+
+
+class TestAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with a few habits and logs for each test."""
+        self.db = Main_Db(":memory:")
+        self.db.create_table()
+        self.db.add_habits('Exercise', 1, 'Health', created_at='2023-08-01')
+        self.db.add_habits('Read', 2, 'Education', created_at='2023-08-01 08:00:00')
+        self.db.add_habits('Swim', 7, 'Sport', created_at='2023-08-01')
+        for completed_at in ['2023-08-01', '2023-08-02', '2023-08-03', '2023-08-05', '2023-08-06']:
+            self.db.add_habit_log(1, completed_at)
+        for completed_at in ['2023-08-07', '2023-08-01', '2023-08-03', '2023-08-10']:
+            self.db.add_habit_log(2, completed_at)
+
+    def test_to_day_and_back(self):
+        """Test converting dates to day ordinals and back."""
+        self.assertEqual(to_day('0001-01-01'), 1)
+        self.assertEqual(to_day('2023-08-02') - to_day('2023-07-31'), 2)
+        self.assertEqual(to_day('2023-08-02 10:30:00'), to_day('2023-08-02'))
+        self.assertEqual(to_iso(to_day('2023-08-02')), '2023-08-02')
+        self.assertEqual(to_iso(None), "N/A")
+
+    def test_calculate_metrics_no_logs(self):
+        """Test the metrics of a habit without completions."""
+        self.assertEqual(calculate_metrics([], 1), (0, 0, "N/A", 0))
+
+    def test_calculate_metrics(self):
+        """Test the metrics of a habit with a break in its completions."""
+        days = [to_day(completed_at) for completed_at in ['2023-08-01', '2023-08-02', '2023-08-05']]
+        self.assertEqual(calculate_metrics(days, 1), (1, 2, '2023-08-05', 3))
+
+    def test_migrated_days_match_python(self):
+        """Test that SQLite's backfill of completed_day agrees with to_day."""
+        day = self.db.conn.execute("SELECT CAST(julianday('2023-08-02') - 1721424.5 AS INTEGER)").fetchone()[0]
+        self.assertEqual(day, to_day('2023-08-02'))
+
+    def test_analyze_habits(self):
+        """Test the batch analysis of all habits."""
+        table = analyze_habits(self.db)
+        self.assertEqual(table, [
+            (1, 'Exercise', 'Health', 1, '2023-08-01', 2, 3, '2023-08-06', 5),
+            (2, 'Read', 'Education', 2, '2023-08-01', 1, 2, '2023-08-10', 4),
+            (3, 'Swim', 'Sport', 7, '2023-08-01', 0, 0, "N/A", 0)
+        ])
+
+    def test_analyze_habits_cached(self):
+        """Test that the cached metrics match the metrics calculated from the logs."""
+        self.assertEqual(analyze_habits(self.db, engine="cached"), analyze_habits(self.db))
+
+    def test_analyze_habits_sql(self):
+        """Test that the SQL engine matches the Python engine."""
+        self.assertEqual(analyze_habits(self.db, engine="sql"), analyze_habits(self.db))
+
+    @unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+    def test_analyze_habits_numpy(self):
+        """Test that the NumPy engine matches the Python engine, also with deleted habits."""
+        self.db.delete_habits(1)
+        self.assertEqual(analyze_habits(self.db, engine="numpy"), analyze_habits(self.db))
+
+    @unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+    def test_analyze_habits_numpy_without_logs(self):
+        """Test the NumPy engine on a database without completions."""
+        db = Main_Db(":memory:")
+        db.create_table()
+        db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+        self.assertEqual(analyze_habits(db, engine="numpy"), [(1, 'Exercise', 'Health', 1, '2023-08-01', 0, 0, "N/A", 0)])
+
+    def test_parallel_workers_match_python(self):
+        """Test that worker processes on a database file return the table of the Python engine."""
+        with tempfile.TemporaryDirectory() as directory:
+            db = Main_Db(os.path.join(directory, "main.db"))
+            self.db.conn.backup(db.conn)
+            expected = analyze_habits(db)
+            rows = iter_analyze_parallel(db, workers=2, shard_size=1)
+            self.assertEqual(next(rows), expected[0])  # Streamed before the remaining shards are read
+            self.assertEqual([expected[0]] + list(rows), expected)
+            db.close()
+
+    def test_shard_connection_is_read_only(self):
+        """Test that the connection of a worker process opens the file read-only."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "main.db")
+            db = Main_Db(path)
+            self.db.conn.backup(db.conn)
+            db.close()
+            analytics._open_shard_db(Main_Db, path)
+            try:
+                self.assertEqual(analytics._shard_db.count_habits(), 3)
+                with self.assertRaises(sqlite3.OperationalError):
+                    analytics._shard_db.add_habits('Run', 1, 'Sport', '2023-08-01')
+            finally:
+                analytics._shard_db.close()
+            with self.assertRaises(sqlite3.OperationalError):
+                Main_Db(os.path.join(directory, "missing.db"), read_only=True)
+            self.assertFalse(os.path.exists(os.path.join(directory, "missing.db")))
+
+    def test_analyze_habits_unknown_engine(self):
+        """Test that an unknown engine is rejected."""
+        with self.assertRaises(ValueError):
+            analyze_habits(self.db, engine="abacus")
+
+    def test_engines_agree_on_random_histories(self):
+        """Test that every engine returns the same table for random histories."""
+        rng = random.Random(42)
+        for _ in range(20):
+            db = Main_Db(":memory:")
+            db.create_table()
+            habits = rng.randint(1, 8)
+            db.add_habits_bulk((f'habit {i}', rng.choice([1, 2, 3, 7]), 'Random', '2023-01-01') for i in range(habits))
+            logs = [(rng.randint(1, habits), to_iso(to_day('2023-01-01') + rng.randint(0, 60)))
+                    for _ in range(rng.randint(0, 150))]
+            db.add_habit_logs_bulk(logs, chunk_size=rng.randint(1, 50))
+            # Uncompleted logs must be ignored by every engine
+            db.conn.execute("UPDATE habit_logs SET completed = 0 WHERE id % 7 = 0")
+            db.rebuild_habit_stats()
+
+            expected = analyze_habits(db)
+            for engine in ENGINES:
+                if engine == "numpy" and not HAS_NUMPY:
+                    continue
+                self.assertEqual(analyze_habits(db, engine=engine), expected, engine)
+            for row in expected:
+                habit = Habit.from_row(db.list_all_habits()[row[0] - 1], db)
+                self.assertEqual(row[5:7], (habit.calculate_current_streak(), habit.calculate_longest_streak()))
+
+    def test_analyze_habits_matches_habit_methods(self):
+        """Test that the batch analysis agrees with the per-habit calculations."""
+        for row in analyze_habits(self.db):
+            habit = Habit.from_row(self.db.list_all_habits()[row[0] - 1], self.db)
+            self.assertEqual(row[5:], (
+                habit.calculate_current_streak(),
+                habit.calculate_longest_streak(),
+                habit.calculate_last_completed(),
+                habit.calculate_total_completed()
+            ))
+
+
+if __name__ == '__main__':
+    unittest.main()
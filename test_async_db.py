@@ -0,0 +1,82 @@
+# test_async_db.py
+
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from async_db import AsyncMainDb
+from db import Main_Db
+
+
+class TestAsyncMainDb(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """Set up a migrated database file behind an AsyncMainDb with two readers for each test."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = AsyncMainDb(os.path.join(self.tmp.name, "main.db"), readers=2)
+        await self.db.create_table()
+        await self.db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+
+    async def asyncTearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    async def test_mirrors_main_db(self):
+        """Test that the coroutines return what the Main_Db methods return."""
+        await self.db.add_habit_log(1, '2023-08-01')
+        await self.db.add_habit_log(1, '2023-08-02')
+        self.assertEqual(await self.db.get_habit_id_by_name('Exercise'), 1)
+        self.assertTrue(await self.db.habit_exists('Exercise'))
+        self.assertEqual(len(await self.db.get_habits_id(1)), 2)
+        self.assertEqual(await self.db.get_habit_stats(1), (2, 2, '2023-08-02', 2))
+        self.assertEqual(AsyncMainDb.get_habits_id.__doc__, Main_Db.get_habits_id.__doc__)
+
+    async def test_concurrent_reads_and_writes(self):
+        """Test that many concurrent writes all land and reads see committed data."""
+        days = [f'2023-08-{day:02d}' for day in range(1, 29)]
+        await asyncio.gather(
+            *(self.db.add_habit_log(1, day) for day in days),
+            *(self.db.count_habits() for _ in range(20)),
+        )
+        self.assertEqual(len(await self.db.get_habits_id(1)), len(days))
+        self.assertEqual(await self.db.check_habit_stats(), [])
+
+    async def test_reads_and_writes_use_separate_threads(self):
+        """Test that writes run on the single writer thread and reads on the reader threads."""
+        def thread_name(habit_db):
+            return threading.current_thread().name
+
+        self.assertTrue((await self.db.write(thread_name)).startswith("AsyncMainDb-writer"))
+        self.assertTrue((await self.db.read(thread_name)).startswith("AsyncMainDb-reader"))
+
+    async def test_reads_use_the_read_connections(self):
+        """Test that reads run on the read connections of the Main_Db and do not wait for a write."""
+        started, release = threading.Event(), threading.Event()
+
+        def slow_write(habit_db):
+            habit_db.add_habits('Read', 1, 'Mind', '2023-08-01')
+            started.set()
+            release.wait(5)
+
+        write = asyncio.ensure_future(self.db.write(slow_write))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        self.assertEqual(await self.db.count_habits(), 1)
+        release.set()
+        await write
+        self.assertEqual(await self.db.count_habits(), 2)
+        self.assertIn(len(self.db.db._reader_connections), (1, 2))
+
+    async def test_write_is_atomic(self):
+        """Test that a failing write function leaves no partial writes behind."""
+        def failing(habit_db):
+            habit_db.add_habits('Read', 1, 'Mind', '2023-08-01')
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            await self.db.write(failing)
+        self.assertEqual(await self.db.count_habits(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
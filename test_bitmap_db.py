@@ -0,0 +1,110 @@
+# test_bitmap_db.py
+
+import random
+import unittest
+from datetime import date, timedelta
+from analytics import ENGINES, HAS_NUMPY, analyze_habits, calculate_metrics, to_iso
+from bitmap_db import BitmapMainDb, bitmap_metrics, count_days, iter_days, set_days
+from db import Main_Db
+
+
+class TestBitmapHelpers(unittest.TestCase):
+
+    def test_set_days_grows_and_rebases(self):
+        """Test that days after the bitmap grow it and days before it move the origin back."""
+        bits, origin, added = set_days(b"", 100, [100, 102, 120])
+        self.assertEqual((origin, added, len(bits)), (100, [100, 102, 120], 3))
+        bits, origin, added = set_days(bits, origin, [97, 102])
+        self.assertEqual((origin, added), (92, [97]))
+        self.assertEqual(list(iter_days(bits, origin)), [97, 100, 102, 120])
+
+    def test_iter_days_range_and_reverse(self):
+        """Test iterating the days of a bitmap within a range, in both directions."""
+        bits, origin, _ = set_days(b"", 10, [10, 11, 18, 25, 40])
+        self.assertEqual(list(iter_days(bits, origin, since=11, until=25)), [11, 18, 25])
+        self.assertEqual(list(iter_days(bits, origin, reverse=True)), [40, 25, 18, 11, 10])
+        self.assertEqual(list(iter_days(bits, origin, since=41)), [])
+
+    def test_count_days(self):
+        """Test the popcount of a bitmap with and without range bounds."""
+        bits, origin, _ = set_days(b"", 10, [10, 11, 18, 25, 40])
+        self.assertEqual(count_days(bits, origin), 5)
+        self.assertEqual(count_days(bits, origin, since=11, until=25), 3)
+        self.assertEqual(count_days(bits, origin, since=26, until=39), 0)
+
+    def test_metrics_match_calculate_metrics(self):
+        """Test that the run scans give the metrics of the day-by-day calculation."""
+        rng = random.Random(0)
+        for periodicity in (0, 1, 2, 7):
+            for _ in range(50):
+                days = sorted(rng.sample(range(1000, 1400), rng.randint(0, 120)))
+                bits, origin, _ = set_days(b"", 1000, days)
+                current, longest, last_day, total = bitmap_metrics(bits, origin, periodicity)
+                self.assertEqual((current, longest, to_iso(last_day), total), calculate_metrics(days, periodicity))
+
+
+class TestBitmapMainDb(unittest.TestCase):
+
+    def setUp(self):
+        """Fill a Main_Db and a BitmapMainDb with the same random habits and completions."""
+        rng = random.Random(1)
+        habits = [(f'habit {number}', rng.choice([1, 2, 7]), 'Health', '2023-01-01') for number in range(5)]
+        start = date(2023, 1, 1)
+        logs = [(rng.randint(1, 5), (start + timedelta(days=rng.randint(-10, 200))).isoformat()) for _ in range(600)]
+        self.table_db = Main_Db(":memory:")
+        self.bitmap_db = BitmapMainDb(":memory:")
+        for habit_db in (self.table_db, self.bitmap_db):
+            habit_db.create_table()
+            habit_db.add_habits_bulk(habits)
+            habit_db.add_habit_logs_bulk(logs[:300], chunk_size=50)
+            for habit_id, completed_at in logs[300:]:
+                habit_db.add_habit_log(habit_id, completed_at)
+
+    def test_completions_match_table(self):
+        """Test that the read methods return the completions the log table returns."""
+        for habit_id in range(1, 6):
+            self.assertEqual(list(self.bitmap_db.iter_completion_days(habit_id, reverse=True)),
+                             list(self.table_db.iter_completion_days(habit_id, reverse=True)))
+            self.assertEqual(self.bitmap_db.count_completions_between(habit_id, '2023-02-01', '2023-03-31'),
+                             self.table_db.count_completions_between(habit_id, '2023-02-01', '2023-03-31'))
+            self.assertEqual([log[4] for log in self.bitmap_db.get_logs_between(habit_id, '2023-02-01', '2023-03-31')],
+                             [log[4] for log in self.table_db.get_logs_between(habit_id, '2023-02-01', '2023-03-31')])
+            self.assertEqual(self.bitmap_db.get_habit_stats(habit_id), self.table_db.get_habit_stats(habit_id))
+        self.assertEqual([(log[1], log[4]) for log in self.bitmap_db.iter_logs(None)],
+                         [(log[1], log[4]) for log in self.table_db.iter_logs(None)])
+        self.assertEqual(self.bitmap_db.check_habit_stats(), [])
+
+    def test_engines_match_table(self):
+        """Test that every analytics engine gives the same table on both storages."""
+        for engine in ENGINES:
+            if engine == "numpy" and not HAS_NUMPY:
+                continue
+            with self.subTest(engine=engine):
+                self.assertEqual(analyze_habits(self.bitmap_db, engine=engine),
+                                 analyze_habits(self.table_db, engine=engine))
+
+    def test_repeated_completion_is_ignored(self):
+        """Test that a completed day is not logged twice."""
+        day = next(self.bitmap_db.iter_completion_days(1))
+        self.assertFalse(self.bitmap_db.add_habit_log(1, to_iso(day)))
+        self.assertTrue(self.bitmap_db.add_habit_log(1, '2030-01-01'))
+
+    def test_delete_removes_bitmap(self):
+        """Test that deleting a habit deletes its completions."""
+        self.bitmap_db.delete_habits(1)
+        self.assertEqual(list(self.bitmap_db.iter_completion_days(1)), [])
+
+    def test_pack_logs(self):
+        """Test that the logs of a table-stored database move into bitmaps."""
+        packed_db = BitmapMainDb(":memory:")
+        self.table_db.conn.backup(packed_db.conn)
+        packed_db.create_table()
+        completions = sum(self.table_db.count_completions_between(habit_id) for habit_id in range(1, 6))
+        self.assertEqual(packed_db.pack_logs(), completions)
+        self.assertEqual(packed_db.conn.execute("SELECT COUNT(*) FROM habit_logs").fetchone()[0], 0)
+        self.assertEqual(analyze_habits(packed_db), analyze_habits(self.table_db))
+        self.assertEqual(list(packed_db.iter_completion_days(1)), list(self.table_db.iter_completion_days(1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+# test_cli.py
+
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest.mock import patch
+from cli import build_parser, main, selected_command
+from db import Main_Db
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a database file with one habit for each test."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "main.db")
+        self.run_cli('add', 'Exercise', '1', 'Health', '--created-at', '2023-08-01')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_cli(self, *argv, stdin=''):
+        """Runs the CLI and returns its exit code and output."""
+        out, err = io.StringIO(), io.StringIO()
+        with redirect_stdout(out), redirect_stderr(err), patch('sys.stdin', io.StringIO(stdin)):
+            code = main(['--db', self.path, *argv])
+        return code, out.getvalue() + err.getvalue()
+
+    def logs(self):
+        habit_db = Main_Db(self.path)
+        logs = habit_db.list_all_logs()
+        habit_db.close()
+        return logs
+
+    def test_complete_by_id_and_name(self):
+        """Test that a habit can be completed by ID or by name."""
+        self.assertEqual(self.run_cli('complete', '1', '--date', '2023-08-01'),
+                         (0, "Completed habit 1, current streak 1\n"))
+        self.assertEqual(self.run_cli('complete', 'Exercise', '--date', '2023-08-02'),
+                         (0, "Completed habit 1, current streak 2\n"))
+        self.assertEqual(self.run_cli('complete', 'Exercise', '--date', '2023-08-02'),
+                         (0, "Habit 1 was already completed on 2023-08-02\n"))
+
+    def test_unknown_habit(self):
+        """Test that an unknown habit is reported with a non-zero exit code."""
+        code, output = self.run_cli('complete', 'Nope')
+        self.assertEqual(code, 1)
+        self.assertIn("Unknown habit: Nope", output)
+
+    def test_edit_and_delete(self):
+        """Test that edit and delete change the habit."""
+        self.assertEqual(self.run_cli('edit', '1', 'Running', '2', 'Sport')[0], 0)
+        habit_db = Main_Db(self.path)
+        self.assertEqual(habit_db.get_habit(1)[1:4], ('Running', 2, 'Sport'))
+        habit_db.close()
+        self.assertEqual(self.run_cli('delete', '1')[0], 0)
+        self.assertEqual(self.run_cli('delete', '1')[0], 1)
+
+    def test_analyze_json(self):
+        """Test that analyze prints the metrics as JSON."""
+        self.run_cli('complete', '1', '--date', '2023-08-01')
+        code, output = self.run_cli('analyze', '--json', '--engine', 'cached')
+        self.assertEqual(code, 0)
+        self.assertIn('"total_completed": 1', output)
+
+    def test_analyze_snapshot(self):
+        """Test that analyze --snapshot prints the metrics of the committed data."""
+        self.run_cli('complete', '1', '--date', '2023-08-01')
+        self.assertEqual(self.run_cli('analyze', '--snapshot'), self.run_cli('analyze'))
+
+    def test_batch_commits_all_commands(self):
+        """Test that a batch from stdin runs every command."""
+        code, output = self.run_cli('batch', stdin=(
+            "add Read 1 Mind --created-at 2023-08-01\n"
+            "# comment\n"
+            "\n"
+            "complete Exercise --date 2023-08-01\n"
+            "complete Read --date '2023-08-01'\n"))
+        self.assertEqual(code, 0)
+        self.assertIn("Committed 3 commands", output)
+        self.assertEqual(len(self.logs()), 2)
+
+    def test_batch_is_atomic(self):
+        """Test that a failing line rolls the whole batch back."""
+        code, output = self.run_cli('batch', stdin=(
+            "complete Exercise --date 2023-08-01\n"
+            "complete Nope\n"))
+        self.assertEqual(code, 1)
+        self.assertIn("line 2", output)
+        self.assertEqual(self.logs(), [])
+
+    def test_bad_input_is_reported(self):
+        """Test that invalid dates, files and rows exit with an error message instead of a traceback."""
+        habits_csv = os.path.join(self.tmp.name, "habits.csv")
+        with open(habits_csv, "w", encoding="utf-8") as file:
+            file.write("name,periodicity,created_at\nRead,1,2023-08-01\n")
+        cases = [
+            (('complete', 'Exercise', '--date', '2023-13-01'), "month must be in 1..12"),
+            (('import', 'logs', 'logs.txt'), "Unsupported file type: .txt"),
+            (('import', 'habits', os.path.join(self.tmp.name, "missing.csv")), "No such file"),
+            (('import', 'habits', habits_csv), "missing field 'category'"),
+        ]
+        for argv, message in cases:
+            with self.subTest(argv=argv):
+                code, output = self.run_cli(*argv)
+                self.assertEqual(code, 1)
+                self.assertTrue(output.startswith("error: "), output)
+                self.assertIn(message, output)
+
+    def test_batch_reports_bad_input_by_line(self):
+        """Test that a batch reports the line of a missing file and rolls back."""
+        code, output = self.run_cli('batch', stdin=(
+            "complete Exercise --date 2023-08-01\n"
+            "import logs missing.csv\n"))
+        self.assertEqual(code, 1)
+        self.assertIn("error: line 2: ", output)
+        self.assertEqual(self.logs(), [])
+
+    def test_builds_only_the_selected_command(self):
+        """Test that only the named command is built, and all of them without a known one."""
+        self.assertEqual(selected_command(['--db', 'complete', '--profile', 'p.json', 'complete', '1']), 'complete')
+        self.assertIsNone(selected_command(['--help']))
+        self.assertIsNone(selected_command(['compleet', '1']))
+        self.assertIn("{complete}", build_parser(command='complete').format_usage())
+        self.assertIn("{add,complete,delete,edit,analyze,import,batch}", build_parser().format_usage())
+
+    def test_current_schema_is_not_migrated_again(self):
+        """Test that a database of the current version skips create_table and migrate."""
+        with patch('cli.Main_Db.create_table') as create_table, patch('cli.Main_Db.migrate') as migrate:
+            self.assertEqual(self.run_cli('complete', '1', '--date', '2023-08-01')[0], 0)
+        create_table.assert_not_called()
+        migrate.assert_not_called()
+
+    def test_does_not_import_tkinter(self):
+        """Test that the CLI runs without loading Tkinter."""
+        script = "import sys, cli; sys.exit('tkinter' in sys.modules)"
+        result = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.returncode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
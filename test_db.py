@@ -1,8 +1,13 @@
 # test_main_db.py
 
+import os
+import sqlite3
+import tempfile
+import threading
 import unittest
-from unittest.mock import patch, Mock
-from db import Main_Db
+from datetime import date, timedelta
+from unittest.mock import patch, Mock, call
+from db import INSERT_LOG, Main_Db, MIGRATIONS
 
 class TestMainDb(unittest.TestCase):
 
@@ -20,7 +25,7 @@ class TestMainDb(unittest.TestCase):
 
     def test_create_table(self):
         """Test table creation in the database."""
-        self.db.create_table()
+        self.db.create_table(migrate=False)
         self.mock_cursor.execute.assert_any_call("""
         CREATE TABLE IF NOT EXISTS habits (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -57,10 +62,14 @@ class TestMainDb(unittest.TestCase):
         """Test deleting a habit from the database."""
         habit_id = 1
         self.db.delete_habits(habit_id)
-        self.mock_cursor.execute.assert_called_once_with(
+        self.mock_cursor.execute.assert_any_call(
             "DELETE FROM habits WHERE id = ?",
             (habit_id,)
         )
+        self.mock_cursor.execute.assert_any_call(
+            "DELETE FROM habit_stats WHERE habit_id = ?",
+            (habit_id,)
+        )
         self.mock_conn.commit.assert_called_once()
 
     def test_list_all_habits(self):
@@ -95,36 +104,59 @@ class TestMainDb(unittest.TestCase):
         """Test adding a habit log entry."""
         habit_id = 1
         completed_at = '2023-08-05'
+        self.mock_cursor.fetchone.return_value = None  # Unknown habit, so there is no summary to update
+        self.mock_cursor.rowcount = 1
 
-        self.db.add_habit_log(habit_id, completed_at)
-        self.mock_cursor.execute.assert_called_once_with(
-            "INSERT INTO habit_logs (habit_id, completed_at, completed) VALUES (?, ?, ?)",
-            (habit_id, completed_at, 1)
-        )
+        self.assertTrue(self.db.add_habit_log(habit_id, completed_at))
+        self.assertEqual(self.mock_cursor.execute.call_args_list[0], call(
+            INSERT_LOG, (habit_id, completed_at, 738737)
+        ))
         self.mock_conn.commit.assert_called_once()
 
+    def test_add_habit_log_already_logged(self):
+        """Test that a day that is already completed is neither logged nor counted again."""
+        self.mock_cursor.rowcount = 0
+
+        self.assertFalse(self.db.add_habit_log(1, '2023-08-05'))
+        self.mock_cursor.execute.assert_called_once_with(INSERT_LOG, (1, '2023-08-05', 738737))
+
     def test_habit_exists_true(self):
         """Test checking if a habit exists (habit exists)."""
-        self.db.list_all_habits = Mock(return_value=[(1, 'Exercise', 1, 'Health', '2023-08-05')])
+        self.mock_cursor.fetchone.return_value = (1,)
         result = self.db.habit_exists('Exercise')
+        self.mock_cursor.execute.assert_called_once_with(
+            "SELECT EXISTS(SELECT 1 FROM habits WHERE name = ?)",
+            ('Exercise',)
+        )
         self.assertTrue(result)
 
     def test_habit_exists_false(self):
         """Test checking if a habit exists (habit does not exist)."""
-        self.db.list_all_habits = Mock(return_value=[(1, 'Exercise', 1, 'Health', '2023-08-05')])
+        self.mock_cursor.fetchone.return_value = (0,)
         result = self.db.habit_exists('Reading')
         self.assertFalse(result)
 
+    def test_habit_exists_case_insensitive(self):
+        """Test checking if a habit exists ignoring the case of the name."""
+        self.mock_cursor.fetchone.return_value = (1,)
+        result = self.db.habit_exists('exercise', case_sensitive=False)
+        self.mock_cursor.execute.assert_called_once_with(
+            "SELECT EXISTS(SELECT 1 FROM habits WHERE name = ? COLLATE NOCASE)",
+            ('exercise',)
+        )
+        self.assertTrue(result)
+
     def test_complete_habits(self):
         """Test completing a habit."""
         habit_id = 1
         completed_at = '2023-08-05'
 
-        self.db.update_habit_updated_at = Mock()  # Mock this function since it's not defined here
+        self.db.update_habit_updated_at = Mock()  # Mock this function since it commits on its own
+        self.mock_cursor.rowcount = 0
         self.db.complete_habits(habit_id, completed_at)
 
         self.mock_cursor.execute.assert_any_call(
-            "UPDATE habit_logs SET completed = 1 WHERE completed_at = ? AND habit_id = ?",
+            "UPDATE habit_logs SET completed = 1 WHERE completed_at = ? AND habit_id = ? AND completed != 1",
             (completed_at, habit_id)
         )
         self.mock_conn.commit.assert_called_once()
@@ -154,6 +186,680 @@ class TestMainDb(unittest.TestCase):
         )
         self.assertIsNone(result)
 
+
+class TestNameIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with the in-memory name index for each test."""
+        self.db = Main_Db(":memory:", name_index=True)
+        self.db.create_table()
+        self.db.add_habits('Exercise', 1, 'Health', '2023-08-05')
+
+    def test_habit_exists_loads_existing_names(self):
+        """Test that the name index is loaded from the database."""
+        self.assertTrue(self.db.habit_exists('Exercise'))
+        self.assertFalse(self.db.habit_exists('exercise'))
+        self.assertTrue(self.db.habit_exists('EXERCISE', case_sensitive=False))
+
+    def test_name_index_follows_writes(self):
+        """Test that adding, editing and deleting habits keeps the name index in sync."""
+        self.assertFalse(self.db.habit_exists('Read'))
+        self.db.add_habits('Read', 2, 'Education', '2023-08-06')
+        self.assertTrue(self.db.habit_exists('Read'))
+
+        self.db.edit_habits(2, 'Write', 2, 'Education')
+        self.assertFalse(self.db.habit_exists('Read'))
+        self.assertTrue(self.db.habit_exists('write', case_sensitive=False))
+
+        self.db.delete_habits(2)
+        self.assertFalse(self.db.habit_exists('Write'))
+        self.assertFalse(self.db.habit_exists('write', case_sensitive=False))
+        self.assertTrue(self.db.habit_exists('Exercise'))
+
+    def test_failed_insert_is_not_indexed(self):
+        """Test that a rejected duplicate does not change the name index."""
+        self.db.habit_exists('Exercise')
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.add_habits('Exercise', 1, 'Health', '2023-08-05')
+        self.db.delete_habits(1)
+        self.assertFalse(self.db.habit_exists('Exercise'))
+
+
+class TestHabitStats(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with one daily habit for each test."""
+        self.db = Main_Db(":memory:")
+        self.db.create_table()
+        self.db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+
+    def test_stats_follow_new_completions(self):
+        """Test that each completion updates the summary incrementally."""
+        self.assertEqual(self.db.get_habit_stats(1), (0, 0, "N/A", 0))
+        for completed_at in ['2023-08-01', '2023-08-02', '2023-08-03', '2023-08-05']:
+            self.db.add_habit_log(1, completed_at)
+        self.assertEqual(self.db.get_habit_stats(1), (1, 3, '2023-08-05', 4))
+        self.assertEqual(self.db.check_habit_stats(), [])
+
+    def test_backdated_completion_rebuilds_stats(self):
+        """Test that a completion before the last one rebuilds the summary."""
+        for completed_at in ['2023-08-01', '2023-08-02', '2023-08-04', '2023-08-05']:
+            self.db.add_habit_log(1, completed_at)
+        self.db.add_habit_log(1, '2023-08-03')
+        self.assertEqual(self.db.get_habit_stats(1), (5, 5, '2023-08-05', 5))
+        self.assertEqual(self.db.check_habit_stats(), [])
+
+    def test_complete_habits_updates_stats(self):
+        """Test that completing an uncompleted log counts it once."""
+        self.db.add_habit_log(1, '2023-08-01')
+        self.db.conn.execute(
+            "INSERT INTO habit_logs (habit_id, completed_at, completed, completed_day) VALUES (1, '2023-08-02', 0, 738734)")
+        self.db.complete_habits(1, '2023-08-02')
+        self.db.complete_habits(1, '2023-08-02')
+        self.assertEqual(self.db.get_habit_stats(1), (2, 2, '2023-08-02', 2))
+        self.assertEqual(self.db.check_habit_stats(), [])
+
+    def test_edit_and_delete_update_stats(self):
+        """Test that a new periodicity rebuilds the summary and deleting removes it."""
+        for completed_at in ['2023-08-01', '2023-08-03', '2023-08-05']:
+            self.db.add_habit_log(1, completed_at)
+        self.assertEqual(self.db.get_habit_stats(1), (1, 1, '2023-08-05', 3))
+        self.db.edit_habits(1, 'Exercise', 2, 'Health')
+        self.assertEqual(self.db.get_habit_stats(1), (3, 3, '2023-08-05', 3))
+        self.db.delete_habits(1)
+        self.assertEqual(self.db.list_habit_stats(), [])
+        self.assertEqual(self.db.conn.execute("SELECT COUNT(*) FROM habit_stats").fetchone()[0], 0)
+
+    def test_string_ids_from_the_gui(self):
+        """Test that IDs entered as text update the same summary and change counter as int IDs."""
+        self.db.add_habit_log("1", '2023-08-01')
+        self.db.add_habit_log(1, '2023-08-02')
+        version = self.db.habit_version(1)
+        self.db.edit_habits("1", 'Exercise', "1", 'Health')
+        self.assertEqual(self.db.get_habit_stats(1), (2, 2, '2023-08-02', 2))
+        self.assertEqual(self.db.check_habit_stats(), [])
+        self.assertNotEqual(self.db.habit_version(1), version)
+        self.assertEqual(set(self.db._habit_changes), {1})
+        self.db.delete_habits("1")
+        self.assertEqual(self.db.list_habit_stats(), [])
+
+    def test_check_and_rebuild_stats(self):
+        """Test that the consistency check reports a stale summary until it is rebuilt."""
+        self.db.add_habit_log(1, '2023-08-01')
+        self.db.conn.execute("UPDATE habit_stats SET total_completed = 7")
+        self.assertEqual(self.db.check_habit_stats(),
+                         [(1, (1, 1, '2023-08-01', 7), (1, 1, '2023-08-01', 1))])
+        self.db.rebuild_habit_stats()
+        self.assertEqual(self.db.check_habit_stats(), [])
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with two habits and their logs for each test."""
+        self.db = Main_Db(":memory:")
+        self.db.create_table()
+        self.db.add_habits_bulk([('Exercise', 1, 'Health', '2023-08-01'), ('Read', 2, 'Education', '2023-08-01')])
+        self.db.add_habit_logs_bulk([(1, '2023-08-03'), (2, '2023-08-02'), (1, '2023-08-01'), (1, '2023-08-02')])
+
+    def test_iter_habits(self):
+        """Test streaming all habits in ID order."""
+        self.assertEqual([habit[0] for habit in self.db.iter_habits(batch_size=1)], [1, 2])
+
+    def test_iter_logs_in_date_order(self):
+        """Test streaming the logs of a habit in both directions."""
+        dates = [log[3] for log in self.db.iter_logs(1, batch_size=2)]
+        self.assertEqual(dates, ['2023-08-01', '2023-08-02', '2023-08-03'])
+        dates = [log[3] for log in self.db.iter_logs(1, reverse=True)]
+        self.assertEqual(dates, ['2023-08-03', '2023-08-02', '2023-08-01'])
+
+    def test_iter_logs_between_dates(self):
+        """Test limiting the streamed logs to a date range."""
+        dates = [log[3] for log in self.db.iter_logs(1, since='2023-08-02', until='2023-08-02')]
+        self.assertEqual(dates, ['2023-08-02'])
+
+    def test_iter_logs_range_matches_get_logs_between(self):
+        """Test that a log with a time of day is in the range of its day for both range queries."""
+        self.db.conn.execute("INSERT INTO habit_logs (habit_id, completed_at, completed, completed_day) "
+                             "VALUES (2, '2023-08-05 10:00:00', 0, 738737)")
+        self.db.complete_habits(2, '2023-08-05 10:00:00')
+        streamed = list(self.db.iter_logs(2, since='2023-08-03', until='2023-08-05'))
+        self.assertEqual([log[3] for log in streamed], ['2023-08-05 10:00:00'])
+        self.assertEqual(streamed, self.db.get_logs_between(2, '2023-08-03', '2023-08-05'))
+
+    def test_iter_logs_of_all_habits(self):
+        """Test streaming the logs of all habits grouped by habit."""
+        logs = [(log[1], log[3]) for log in self.db.iter_logs(None)]
+        self.assertEqual(logs, [(1, '2023-08-01'), (1, '2023-08-02'), (1, '2023-08-03'), (2, '2023-08-02')])
+
+    def test_iter_logs_allows_other_queries(self):
+        """Test that other queries can run while logs are streamed."""
+        for _ in self.db.iter_logs(1, batch_size=1):
+            self.assertTrue(self.db.habit_exists('Read'))
+
+    def test_get_logs_between(self):
+        """Test retrieving the logs of a habit within an inclusive date range, oldest first."""
+        dates = [log[3] for log in self.db.get_logs_between(1, '2023-08-02', '2023-08-03')]
+        self.assertEqual(dates, ['2023-08-02', '2023-08-03'])
+        self.assertEqual(self.db.get_logs_between(2, '2023-08-03', '2023-08-31'), [])
+
+    def test_count_completions_between(self):
+        """Test counting the completions of a habit with and without range bounds."""
+        self.assertEqual(self.db.count_completions_between(1), 3)
+        self.assertEqual(self.db.count_completions_between(1, start='2023-08-02'), 2)
+        self.assertEqual(self.db.count_completions_between(1, '2023-08-01', '2023-08-01'), 1)
+
+    def test_range_queries_use_index(self):
+        """Test that the range queries search the (habit_id, completed_day) index."""
+        queries = []
+        self.db.conn.set_trace_callback(queries.append)
+        self.db.get_logs_between(1, '2023-08-02', '2023-08-03')
+        self.db.count_completions_between(1, '2023-08-02', '2023-08-03')
+        self.db.conn.set_trace_callback(None)
+        plans = [" ".join(row[3] for row in self.db.conn.execute("EXPLAIN QUERY PLAN " + query)) for query in queries]
+        for plan in plans:
+            self.assertIn("habit_id=? AND completed_day>? AND completed_day<?", plan)
+        self.assertIn("COVERING INDEX idx_habit_logs_habit_id_completed_day", plans[1])
+
+
+class TestTransactions(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a database file and a second connection to observe committed data."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "main.db")
+        self.db = Main_Db(self.path)
+        self.db.create_table()
+        self.observer = sqlite3.connect(self.path)
+
+    def tearDown(self):
+        self.observer.close()
+        self.db.conn.close()
+        self.tmp.cleanup()
+
+    def committed_habits(self):
+        return self.observer.execute("SELECT COUNT(*) FROM habits").fetchone()[0]
+
+    def test_transaction_commits_once_at_the_end(self):
+        """Test that writes inside a transaction are committed together."""
+        with self.db.transaction():
+            self.db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+            with self.db.transaction():
+                self.db.add_habits('Read', 2, 'Education', '2023-08-01')
+            self.assertEqual(self.committed_habits(), 0)
+        self.assertEqual(self.committed_habits(), 2)
+
+    def test_transaction_rolls_back_on_exception(self):
+        """Test that an exception discards every write of the transaction."""
+        self.db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+        with self.assertRaises(sqlite3.IntegrityError):
+            with self.db.transaction():
+                self.db.add_habit_log(1, '2023-08-01')
+                self.db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+        self.assertEqual(self.db.get_habits_id(1), [])
+        self.assertEqual(self.db.get_habit_stats(1), (0, 0, "N/A", 0))
+
+    def test_failed_write_releases_the_lock(self):
+        """Test that a duplicate name rolls back, so other connections can still write."""
+        self.db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+        self.db.add_habits('Read', 1, 'Mind', '2023-08-01')
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.edit_habits(2, 'Exercise', 1, 'Health')
+        self.assertFalse(self.db.conn.in_transaction)
+        other = sqlite3.connect(self.path, timeout=0.1)
+        other.execute("INSERT INTO habits (name, periodicity, category, created_at) VALUES ('Walk', 1, 'Sport', '2023-08-01')")
+        other.commit()
+        other.close()
+        self.assertEqual(self.committed_habits(), 3)
+
+    def test_failed_write_is_not_committed_by_the_next_writer(self):
+        """Test that a write that raises is rolled back before another thread writes."""
+        self.db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+        with patch.object(self.db, '_record_completions', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.db.add_habit_log(1, '2023-08-01')
+        self.assertFalse(self.db.conn.in_transaction)
+        writer = threading.Thread(target=self.db.add_habits, args=('Read', 1, 'Mind', '2023-08-01'))
+        writer.start()
+        writer.join()
+        self.assertEqual(self.committed_habits(), 2)
+        self.assertEqual(self.observer.execute("SELECT COUNT(*) FROM habit_logs").fetchone()[0], 0)
+
+    def test_transaction_resets_name_index_on_rollback(self):
+        """Test that rolled back names are not reported as existing."""
+        db = Main_Db(self.path, name_index=True)
+        db.habit_exists('Exercise')
+        with self.assertRaises(RuntimeError):
+            with db.transaction():
+                db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+                raise RuntimeError
+        self.assertFalse(db.habit_exists('Exercise'))
+        db.conn.close()
+
+    def test_deferred_commit(self):
+        """Test that autocommit=False keeps writes pending until commit()."""
+        db = Main_Db(self.path, autocommit=False)
+        db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+        db.add_habit_log(1, '2023-08-01')
+        self.assertEqual(self.committed_habits(), 0)
+        db.commit()
+        self.assertEqual(self.committed_habits(), 1)
+        db.conn.close()
+
+    def test_pragmas(self):
+        """Test that journal_mode and synchronous are applied and validated."""
+        db = Main_Db(self.path, journal_mode="WAL", synchronous="NORMAL")
+        self.assertEqual(db.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(db.conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+        db.conn.close()
+        with self.assertRaises(ValueError):
+            Main_Db(self.path, journal_mode="WAL; DROP TABLE habits")
+
+
+class TestBulkInsert(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database for each test."""
+        self.db = Main_Db(":memory:")
+        self.db.create_table()
+
+    def test_add_habits_bulk(self):
+        """Test adding habits from a generator in chunks."""
+        habits = ((f'habit {i}', 1, 'Health', '2023-08-01') for i in range(5))
+        self.assertEqual(self.db.add_habits_bulk(habits, chunk_size=2), 5)
+        self.assertEqual(len(self.db.list_all_habits()), 5)
+
+    def test_add_habits_bulk_default_created_at(self):
+        """Test that habits without created_at get today's date."""
+        self.db.add_habits_bulk([('Exercise', 1, 'Health')])
+        self.assertEqual(len(self.db.list_all_habits()[0][4]), 10)
+
+    def test_add_habits_bulk_rolls_back_failed_chunk(self):
+        """Test that a failing chunk is rolled back while earlier chunks stay committed."""
+        habits = [('Exercise', 1, 'Health'), ('Read', 2, 'Education'), ('Exercise', 1, 'Health')]
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.add_habits_bulk(habits, chunk_size=2)
+        self.assertEqual([habit[1] for habit in self.db.list_all_habits()], ['Exercise', 'Read'])
+
+    def test_add_habit_logs_bulk_updates_stats(self):
+        """Test that bulk logs keep the habit summaries consistent."""
+        self.db.add_habits_bulk([('Exercise', 1, 'Health'), ('Read', 2, 'Education')])
+        logs = [(1, '2023-08-01'), (2, '2023-08-01'), (1, '2023-08-02'), (2, '2023-08-05'),
+                (1, '2023-08-04'), (1, '2023-08-03'), (2, '2023-08-02')]
+        self.assertEqual(self.db.add_habit_logs_bulk(iter(logs), chunk_size=3), 7)
+        self.assertEqual(self.db.get_habit_stats(1), (4, 4, '2023-08-04', 4))
+        self.assertEqual(self.db.get_habit_stats(2), (1, 2, '2023-08-05', 3))
+        self.assertEqual(self.db.check_habit_stats(), [])
+
+
+class TestSortedPages(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with four habits and some completions for each test."""
+        self.db = Main_Db(":memory:")
+        self.db.create_table()
+        self.db.add_habits_bulk([
+            ('Read', 1, 'Mind', '2023-08-01'),
+            ('Run', 1, 'Health', '2023-08-01'),
+            ('Swim', 7, 'Health', '2023-08-01'),
+            ('Write', 1, 'Mind', '2023-08-01'),
+        ])
+        self.db.add_habit_logs_bulk([(2, '2023-08-01'), (2, '2023-08-02'), (4, '2023-08-01')])
+
+    def ids(self, order_by, limit=100, offset=0):
+        return [row[0] for row in self.db.list_habits_sorted(order_by, limit, offset)]
+
+    def test_every_habit_has_a_summary(self):
+        """Test that new habits get a summary row, so none is missing from sorted pages."""
+        self.db.add_habits('Cook', 1, 'Food', '2023-08-01')
+        self.assertEqual(len(self.db.list_habits_sorted([('name', False)])), 5)
+        self.assertEqual(self.db.check_habit_stats(), [])
+
+    def test_sort_by_metric(self):
+        """Test sorting by a cached metric, with ties broken by habit ID."""
+        self.assertEqual(self.ids([('total_completed', True)]), [2, 4, 3, 1])
+        self.assertEqual(self.ids([('total_completed', False)]), [1, 3, 4, 2])
+
+    def test_sort_by_several_columns(self):
+        """Test that later keys order the rows within equal earlier keys."""
+        self.assertEqual(self.ids([('category', False), ('name', True)]), [3, 2, 4, 1])
+
+    def test_sorted_page_with_offset(self):
+        """Test that a page starts after the given number of habits."""
+        self.assertEqual(self.ids([('name', True)], limit=2, offset=1), [3, 2])
+
+    def test_sorted_rows_carry_metrics(self):
+        """Test that sorted rows hold the habit columns followed by the cached metrics."""
+        self.assertEqual(self.db.list_habits_sorted([('name', False)], 1)[0][5:], (0, 0, 'N/A', 0))
+        self.assertEqual(self.db.list_habits_sorted([('name', False)], 1, 1)[0][5:], (2, 2, '2023-08-02', 2))
+
+    def test_unknown_column_is_rejected(self):
+        """Test that only whitelisted columns reach the ORDER BY clause."""
+        with self.assertRaises(ValueError):
+            self.db.list_habits_sorted([('name; DROP TABLE habits', False)])
+
+    def test_single_key_sort_uses_index(self):
+        """Test that sorting by one column walks an index instead of sorting all habits."""
+        queries = []
+        self.db.conn.set_trace_callback(queries.append)
+        for column in ('name', 'category', 'current_streak', 'last_completed'):
+            self.db.list_habits_sorted([(column, True)], 25)
+            plan = self.db.conn.execute("EXPLAIN QUERY PLAN " + queries[-1]).fetchall()
+            self.assertFalse(any("TEMP B-TREE" in row[3] for row in plan), column)
+
+
+class TestThreadSafety(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a migrated database file with eight habits, shared through a pool of three readers."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Main_Db(os.path.join(self.tmp.name, "main.db"), readers=3)
+        self.db.create_table()
+        self.db.add_habits_bulk((f'habit {i}', 1, 'Health', '2023-01-01') for i in range(8))
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def run_threads(self, targets):
+        """Runs the targets on their own threads and re-raises the first exception."""
+        errors = []
+
+        def run(target):
+            try:
+                target()
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        if errors:
+            raise errors[0]
+
+    def test_parallel_readers_and_writers(self):
+        """Stress test: parallel writers complete habits while readers query and stream."""
+        days = [date(2023, 1, 1) + timedelta(days=n) for n in range(40)]
+        stop = threading.Event()
+
+        def writer(habit_id):
+            for day in days:
+                self.db.add_habit_log(habit_id, day.isoformat())
+            with self.db.transaction():
+                self.db.edit_habits(habit_id, f'habit {habit_id - 1}', 1, 'Sport')
+
+        def reader():
+            while not stop.is_set():
+                for habit_id in range(1, 9):
+                    logs = self.db.get_habits_id(habit_id)
+                    streamed = list(self.db.iter_completion_days(habit_id))
+                    self.assertEqual(streamed, sorted(streamed))
+                    self.assertLessEqual(len(logs), len(days))
+                self.assertEqual(len(self.db.list_habits_sorted([('total_completed', True)])), 8)
+
+        def writers():
+            try:
+                self.run_threads([lambda habit_id=habit_id: writer(habit_id) for habit_id in range(1, 9)])
+            finally:
+                stop.set()
+
+        self.run_threads([writers] + [reader] * 4)
+
+        for habit_id in range(1, 9):
+            self.assertEqual(self.db.get_habit_stats(habit_id), (40, 40, days[-1].isoformat(), 40))
+        self.assertEqual(self.db.check_habit_stats(), [])
+        self.assertLessEqual(len(self.db._reader_connections), 3)
+
+    def test_transaction_is_invisible_until_commit(self):
+        """Test that readers on other threads never see part of a transaction."""
+        inside = threading.Event()
+        release = threading.Event()
+        seen = []
+
+        def write():
+            with self.db.transaction():
+                self.db.add_habit_log(1, '2023-01-01')
+                inside.set()
+                release.wait(5)
+                self.db.add_habit_log(1, '2023-01-02')
+
+        def read():
+            inside.wait(5)
+            seen.append(len(self.db.get_habits_id(1)))
+            release.set()
+
+        self.run_threads([write, read])
+        self.assertEqual(seen, [0])
+        self.assertEqual(len(self.db.get_habits_id(1)), 2)
+
+    def test_reads_inside_transaction_see_own_writes(self):
+        """Test that a thread reads its pending writes inside its transaction."""
+        with self.db.transaction():
+            self.db.add_habits('Read', 1, 'Mind', '2023-01-01')
+            self.assertTrue(self.db.habit_exists('Read'))
+
+    def test_nested_streams_share_a_connection(self):
+        """Test that one thread streaming twice at once holds a single read connection."""
+        self.db.add_habit_logs_bulk([(1, '2023-01-01'), (2, '2023-01-01')])
+        habits = self.db.iter_habits(batch_size=1)
+        next(habits)
+        self.assertEqual(list(self.db.iter_all_completion_days()), [(1, 738521), (2, 738521)])
+        self.assertEqual(len(self.db._thread_readers), 1)
+        self.assertEqual(len(list(habits)), 7)
+        self.assertEqual(self.db._thread_readers, {})
+
+    def test_readers_need_a_file(self):
+        """Test that read connections are refused for an in-memory database."""
+        with self.assertRaises(ValueError):
+            Main_Db(":memory:", readers=2)
+
+
+class TestMigrations(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with the unversioned schema for each test."""
+        self.db = Main_Db(":memory:")
+        self.db.create_table(migrate=False)
+
+    def user_version(self):
+        return self.db.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def test_migrate_sets_user_version(self):
+        """Test that migrating bumps the schema version to the latest migration."""
+        self.assertEqual(self.user_version(), 0)
+        self.assertEqual(self.db.migrate(), len(MIGRATIONS))
+        self.assertEqual(self.user_version(), len(MIGRATIONS))
+
+    def test_create_table_migrates(self):
+        """Test that a new database gets the current schema from create_table alone."""
+        habit_db = Main_Db(":memory:")
+        habit_db.create_table()
+        self.assertEqual(habit_db.conn.execute("PRAGMA user_version").fetchone()[0], len(MIGRATIONS))
+        habit_db.add_habits('Exercise', 1, 'Health', '2023-08-05')
+        self.assertEqual(habit_db.get_habit_stats(1), (0, 0, "N/A", 0))
+
+    def test_migrate_is_idempotent(self):
+        """Test that running the migrations twice leaves the database unchanged."""
+        self.db.migrate()
+        self.assertEqual(self.db.migrate(), len(MIGRATIONS))
+        self.assertEqual(self.user_version(), len(MIGRATIONS))
+
+    def test_migrate_creates_indexes(self):
+        """Test that the hot lookups use an index after migrating."""
+        self.db.migrate()
+        plan = self.db.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM habit_logs WHERE habit_id = ?", (1,)).fetchall()
+        self.assertIn("USING INDEX", plan[0][3])
+        plan = self.db.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM habits WHERE name = ?", ('Exercise',)).fetchall()
+        self.assertIn("USING COVERING INDEX", plan[0][3])
+
+    def test_migrate_renames_duplicate_names(self):
+        """Test that duplicate habit names are made unique before indexing them."""
+        self.db.add_habits('Exercise', 1, 'Health', '2023-08-05')
+        self.db.add_habits('Exercise', 2, 'Health', '2023-08-05')
+        self.db.migrate()
+        names = [habit[1] for habit in self.db.list_all_habits()]
+        self.assertEqual(names, ['Exercise', 'Exercise (2)'])
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.add_habits('Exercise', 1, 'Health', '2023-08-05')
+
+    def test_migrate_builds_habit_stats(self):
+        """Test that the summaries of existing habits are built from their logs."""
+        self.db.add_habits('Exercise', 1, 'Health', '2023-08-05')
+        self.db.conn.executemany(
+            "INSERT INTO habit_logs (habit_id, completed_at, completed) VALUES (1, ?, 1)",
+            [('2023-08-06',), ('2023-08-07',)])
+        self.db.migrate()
+        self.assertEqual(self.db.get_habit_stats(1), (2, 2, '2023-08-07', 2))
+
+    def test_migrate_swaps_periodicity_and_category(self):
+        """Test that rows with periodicity and category swapped are repaired."""
+        self.db.add_habits('running', 'sport', 1, '2024-07-04')
+        self.db.add_habits('reading', 7, 'university', '2024-07-04')
+        self.db.migrate()
+        self.assertEqual(self.db.list_all_habits(), [
+            (1, 'running', 1, 'sport', '2024-07-04'),
+            (2, 'reading', 7, 'university', '2024-07-04')
+        ])
+
+    def test_migrate_dedupes_logs(self):
+        """Test that repeated logs of a day are dropped, keeping a completed one, and counted once."""
+        self.db.add_habits('Exercise', 1, 'Health', '2023-08-05')
+        self.db.conn.executemany(
+            "INSERT INTO habit_logs (habit_id, completed_at, completed) VALUES (1, ?, ?)",
+            [('2023-08-06', 0), ('2023-08-06 09:00', 1), ('2023-08-06', 1), ('2023-08-07', 1), ('2023-08-07', 1)])
+        self.db.migrate()
+        logs = [(log[2], log[3]) for log in self.db.get_habits_id(1)]
+        self.assertEqual(logs, [(1, '2023-08-06 09:00'), (1, '2023-08-07')])
+        self.assertEqual(self.db.get_habit_stats(1), (2, 2, '2023-08-07', 2))
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.conn.execute(
+                "INSERT INTO habit_logs (habit_id, completed_at, completed, completed_day) VALUES (1, ?, 1, ?)",
+                ('2023-08-07', date(2023, 8, 7).toordinal()))
+
+
+class TestDailyLogs(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with one daily habit for each test."""
+        self.db = Main_Db(":memory:")
+        self.db.create_table()
+        self.db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+
+    def test_repeated_completion_is_ignored(self):
+        """Test that completing a habit twice on a day logs and counts it once."""
+        self.assertTrue(self.db.add_habit_log(1, '2023-08-01'))
+        self.assertFalse(self.db.add_habit_log(1, '2023-08-01'))
+        self.assertFalse(self.db.add_habit_log(1, '2023-08-01 18:30'))
+        self.assertEqual(len(self.db.get_habits_id(1)), 1)
+        self.assertEqual(self.db.get_habit_stats(1), (1, 1, '2023-08-01', 1))
+
+    def test_completion_marks_uncompleted_log(self):
+        """Test that completing a day with an uncompleted log marks that log."""
+        self.db.conn.execute(
+            "INSERT INTO habit_logs (habit_id, completed_at, completed, completed_day) VALUES (1, '2023-08-02', 0, ?)",
+            (date(2023, 8, 2).toordinal(),))
+        self.assertTrue(self.db.add_habit_log(1, '2023-08-02'))
+        self.assertEqual([log[2] for log in self.db.get_habits_id(1)], [1])
+        self.assertEqual(self.db.get_habit_stats(1), (1, 1, '2023-08-02', 1))
+
+    def test_bulk_counts_only_new_logs(self):
+        """Test that bulk logging skips days already logged, in the table and within the input."""
+        self.db.add_habit_log(1, '2023-08-01')
+        added = self.db.add_habit_logs_bulk([(1, '2023-08-01'), (1, '2023-08-02'), (1, '2023-08-02'), (1, '2023-08-03')])
+        self.assertEqual(added, 2)
+        self.assertEqual(self.db.get_habit_stats(1), (3, 3, '2023-08-03', 3))
+        self.assertEqual(self.db.check_habit_stats(), [])
+
+    def test_compact_logs(self):
+        """Test that compacting reclaims the pages of deleted logs."""
+        with tempfile.TemporaryDirectory() as directory:
+            habit_db = Main_Db(os.path.join(directory, "main.db"))
+            habit_db.create_table()
+            habit_db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+            habit_db.add_habit_logs_bulk((1, (date(2000, 1, 1) + timedelta(days=day)).isoformat()) for day in range(5000))
+            habit_db.conn.execute("DELETE FROM habit_logs WHERE id % 2 = 0")
+            habit_db.conn.commit()
+            removed, reclaimed = habit_db.compact_logs()
+            self.assertEqual(removed, 0)
+            self.assertGreater(reclaimed, 0)
+            with habit_db.transaction(), self.assertRaises(sqlite3.OperationalError):
+                habit_db.compact_logs()
+            habit_db.close()
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a database file with one completed habit and a snapshot of it for each test."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "main.db")
+        self.db = Main_Db(self.path)
+        self.db.create_table()
+        self.db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+        self.db.add_habit_log(1, '2023-08-01')
+        self.snapshot = Main_Db.open_snapshot(self.path)
+
+    def tearDown(self):
+        self.snapshot.close()
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_reads_match_file(self):
+        """Test that the snapshot serves the read API from memory."""
+        self.assertEqual(self.snapshot.db_path, ":memory:")
+        self.assertEqual(self.snapshot.list_all_habits(), self.db.list_all_habits())
+        self.assertEqual(list(self.snapshot.iter_completion_days(1)), list(self.db.iter_completion_days(1)))
+        self.assertEqual(self.snapshot.get_habit_stats(1), (1, 1, '2023-08-01', 1))
+        self.assertTrue(self.snapshot.habit_exists('Exercise'))
+
+    def test_writes_are_refused(self):
+        """Test that the write methods of a snapshot raise and leave it usable."""
+        with self.assertRaises(sqlite3.OperationalError):
+            self.snapshot.add_habit_log(1, '2023-08-02')
+        with self.assertRaises(sqlite3.OperationalError):
+            self.snapshot.delete_habits(1)
+        self.snapshot.refresh_snapshot()
+        self.assertEqual(self.snapshot.count_completions_between(1), 1)
+
+    def test_refresh(self):
+        """Test that writes to the file show up after a refresh, which invalidates every habit."""
+        self.db.add_habit_log(1, '2023-08-02')
+        self.db.add_habits('Reading', 1, 'Mind', '2023-08-01')
+        self.assertEqual(self.snapshot.count_completions_between(1), 1)
+        version = self.snapshot.habit_version(1)
+        self.snapshot.refresh_snapshot()
+        self.assertEqual(self.snapshot.count_completions_between(1), 2)
+        self.assertTrue(self.snapshot.habit_exists('Reading'))
+        self.assertNotEqual(self.snapshot.habit_version(1), version)
+
+    def test_old_file_is_migrated_in_memory(self):
+        """Test that a snapshot of an unmigrated file is migrated, while the file is not touched."""
+        path = os.path.join(self.tmp.name, "old.db")
+        old = Main_Db(path)
+        old.create_table(migrate=False)
+        old.conn.execute("INSERT INTO habits (name, periodicity, category, created_at) VALUES ('Run', 1, 'Sport', '2023-08-01')")
+        old.conn.execute("INSERT INTO habit_logs (habit_id, completed_at, completed) VALUES (1, '2023-08-01', 1)")
+        old.conn.commit()
+        old.close()
+        snapshot = Main_Db.open_snapshot(path)
+        self.assertEqual(snapshot.get_habit_stats(1), (1, 1, '2023-08-01', 1))
+        snapshot.close()
+        old = sqlite3.connect(path)
+        self.assertEqual(old.execute("PRAGMA user_version").fetchone()[0], 0)
+        old.close()
+
+    def test_refresh_needs_snapshot(self):
+        """Test that only snapshots can be refreshed."""
+        with self.assertRaises(ValueError):
+            self.db.refresh_snapshot()
+
+
 if __name__ == '__main__':
     unittest.main()
 
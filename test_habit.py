@@ -2,6 +2,7 @@
 
 import unittest
 from unittest.mock import Mock
+from analytics import to_day
 from habit import Habit
 
 class TestHabit(unittest.TestCase):
@@ -16,9 +17,28 @@ class TestHabit(unittest.TestCase):
         self.created_at = '2023-01-01'
         self.habit = Habit(self.habit_id, self.name, self.category, self.periodicity, self.created_at, self.mock_db)
 
+    def set_logs(self, logs):
+        """Make the mock database stream the completed days of the logs, like Main_Db.iter_completion_days."""
+        days = sorted(to_day(log[3]) for log in logs if log[2] == 1)
+
+        def iter_completion_days(habit_id, since=None, until=None, reverse=False, batch_size=1000):
+            window = [day for day in days
+                      if (since is None or day >= to_day(since)) and (until is None or day <= to_day(until))]
+            return iter(sorted(window, reverse=reverse))
+        self.mock_db.iter_completion_days.side_effect = iter_completion_days
+
+    def test_from_row(self):
+        """Test creating a habit from a row of the habits table."""
+        habit = Habit.from_row((2, 'Read', 7, 'Education', '2023-01-02'), self.mock_db)
+        self.assertEqual(habit.habit_id, 2)
+        self.assertEqual(habit.name, 'Read')
+        self.assertEqual(habit.category, 'Education')
+        self.assertEqual(habit.periodicity, 7)
+        self.assertEqual(habit.created_at, '2023-01-02')
+
     def test_calculate_current_streak_no_logs(self):
         """Test current streak calculation when there are no logs."""
-        self.mock_db.get_habits_id.return_value = []
+        self.set_logs([])
         self.assertEqual(self.habit.calculate_current_streak(), 0)
 
     def test_calculate_current_streak_with_logs(self):
@@ -28,7 +48,7 @@ class TestHabit(unittest.TestCase):
             (2, 1, 1, '2023-08-02'),
             (3, 1, 1, '2023-08-01')
         ]
-        self.mock_db.get_habits_id.return_value = logs
+        self.set_logs(logs)
         self.assertEqual(self.habit.calculate_current_streak(), 3)
 
     def test_calculate_current_streak_with_break(self):
@@ -38,12 +58,27 @@ class TestHabit(unittest.TestCase):
             (2, 1, 1, '2023-07-31'),
             (3, 1, 1, '2023-07-30')
         ]
-        self.mock_db.get_habits_id.return_value = logs
+        self.set_logs(logs)
         self.assertEqual(self.habit.calculate_current_streak(), 1)
 
+    def test_calculate_current_streak_stops_at_gap(self):
+        """Test that the current streak does not read logs older than the first gap."""
+        def iter_completion_days(habit_id, since=None, until=None, reverse=False, batch_size=1000):
+            yield to_day('2023-08-03')
+            yield to_day('2023-08-02')
+            yield to_day('2023-07-30')
+            raise AssertionError("read past the first gap")
+        self.mock_db.iter_completion_days.side_effect = iter_completion_days
+        self.assertEqual(self.habit.calculate_current_streak(), 2)
+
+    def test_calculate_current_streak_no_completed_logs(self):
+        """Test current streak calculation when no log is completed."""
+        self.set_logs([(1, 1, 0, '2023-08-03')])
+        self.assertEqual(self.habit.calculate_current_streak(), 0)
+
     def test_calculate_longest_streak_no_logs(self):
         """Test longest streak calculation when there are no logs."""
-        self.mock_db.get_habits_id.return_value = []
+        self.set_logs([])
         self.assertEqual(self.habit.calculate_longest_streak(), 0)
 
     def test_calculate_longest_streak_with_logs(self):
@@ -55,7 +90,7 @@ class TestHabit(unittest.TestCase):
             (4, 1, 0, '2023-08-04'),
             (5, 1, 1, '2023-08-05')
         ]
-        self.mock_db.get_habits_id.return_value = logs
+        self.set_logs(logs)
         self.assertEqual(self.habit.calculate_longest_streak(), 3)
 
     def test_calculate_longest_streak_with_break(self):
@@ -67,12 +102,12 @@ class TestHabit(unittest.TestCase):
             (4, 1, 1, '2023-07-26'),
             (5, 1, 1, '2023-07-25')
         ]
-        self.mock_db.get_habits_id.return_value = logs
+        self.set_logs(logs)
         self.assertEqual(self.habit.calculate_longest_streak(), 2)
 
     def test_calculate_last_completed_no_logs(self):
         """Test last completed date when there are no logs."""
-        self.mock_db.get_habits_id.return_value = []
+        self.set_logs([])
         self.assertEqual(self.habit.calculate_last_completed(), "N/A")
 
     def test_calculate_last_completed_with_logs(self):
@@ -82,12 +117,12 @@ class TestHabit(unittest.TestCase):
             (2, 1, 1, '2023-08-02'),
             (3, 1, 1, '2023-08-03')
         ]
-        self.mock_db.get_habits_id.return_value = logs
+        self.set_logs(logs)
         self.assertEqual(self.habit.calculate_last_completed(), '2023-08-03')
 
     def test_calculate_total_completed_no_logs(self):
         """Test total completed calculation when there are no logs."""
-        self.mock_db.get_habits_id.return_value = []
+        self.set_logs([])
         self.assertEqual(self.habit.calculate_total_completed(), 0)
 
     def test_calculate_total_completed_with_logs(self):
@@ -97,8 +132,27 @@ class TestHabit(unittest.TestCase):
             (2, 1, 0, '2023-08-02'),
             (3, 1, 1, '2023-08-03')
         ]
-        self.mock_db.get_habits_id.return_value = logs
+        self.set_logs(logs)
         self.assertEqual(self.habit.calculate_total_completed(), 2)
 
+    def test_metrics_within_window(self):
+        """Test longest streak and total completed restricted to a date range."""
+        logs = [
+            (1, 1, 1, '2023-08-01'),
+            (2, 1, 1, '2023-08-02'),
+            (3, 1, 1, '2023-08-03'),
+            (4, 1, 1, '2023-08-05'),
+            (5, 1, 1, '2023-08-06')
+        ]
+        self.set_logs(logs)
+        self.assertEqual(self.habit.calculate_longest_streak(since='2023-08-02', until='2023-08-06'), 2)
+        self.assertEqual(self.habit.calculate_total_completed(since='2023-08-03'), 3)
+
+    def test_completions_in_window(self):
+        """Test that the window ends on the given day and spans the given number of days."""
+        self.mock_db.count_completions_between.return_value = 4
+        self.assertEqual(self.habit.completions_in_window(7, until='2023-08-07'), 4)
+        self.mock_db.count_completions_between.assert_called_once_with(1, '2023-08-01', '2023-08-07')
+
 if __name__ == '__main__':
     unittest.main()
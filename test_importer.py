@@ -0,0 +1,60 @@
+# test_importer.py
+
+import json
+import os
+import tempfile
+import unittest
+from db import Main_Db
+from importer import import_habits, import_logs, read_records
+
+
+class TestImporter(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database and a temporary directory for each test."""
+        self.db = Main_Db(":memory:")
+        self.db.create_table()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_import_habits_csv(self):
+        """Test importing habits from a CSV file."""
+        path = self.write('habits.csv', "name,periodicity,category,created_at\n"
+                                        "Exercise,1,Health,2023-08-01\n"
+                                        "Read,7,Education,\n")
+        self.assertEqual(import_habits(self.db, path), 2)
+        habits = self.db.list_all_habits()
+        self.assertEqual(habits[0], (1, 'Exercise', 1, 'Health', '2023-08-01'))
+        self.assertEqual(habits[1][:4], (2, 'Read', 7, 'Education'))
+
+    def test_import_logs_jsonl(self):
+        """Test importing logs by habit ID and by habit name from a JSONL file."""
+        self.db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+        records = [{"habit": "Exercise", "completed_at": "2023-08-01"},
+                   {"habit_id": 1, "completed_at": "2023-08-02"}]
+        path = self.write('logs.jsonl', "\n".join(json.dumps(record) for record in records) + "\n\n")
+        self.assertEqual(import_logs(self.db, path), 2)
+        self.assertEqual(self.db.get_habit_stats(1), (2, 2, '2023-08-02', 2))
+
+    def test_import_logs_unknown_habit(self):
+        """Test that logs of an unknown habit are rejected."""
+        path = self.write('logs.csv', "habit,completed_at\nNonexistent,2023-08-01\n")
+        with self.assertRaises(ValueError):
+            import_logs(self.db, path)
+
+    def test_unsupported_file_type(self):
+        """Test that unknown file extensions are rejected."""
+        with self.assertRaises(ValueError):
+            read_records('habits.xml')
+
+
+if __name__ == '__main__':
+    unittest.main()
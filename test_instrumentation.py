@@ -0,0 +1,91 @@
+# test_instrumentation.py
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from cli import main as cli_main
+from db import Main_Db
+from habit import Habit
+from instrumentation import Profiler, normalize_sql
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with two habits and an instrumented profiler for each test."""
+        self.db = Main_Db(":memory:")
+        self.db.create_table()
+        self.db.add_habits_bulk([('Running', 1, 'Sport', '2023-08-01'), ('Reading', 7, 'Mind', '2023-08-01')])
+        self.db.add_habit_logs_bulk([(1, '2023-08-01'), (1, '2023-08-02'), (2, '2023-08-03')])
+        self.profiler = Profiler(trace_sql=True)
+        self.profiler.instrument_db(self.db)
+        self.profiler.instrument_habits()
+        self.addCleanup(self.profiler.uninstrument)
+
+    def test_counts_calls_and_rows(self):
+        """Test that calls, returned rows and streamed rows are counted per method."""
+        self.db.list_all_habits()
+        self.db.list_all_habits()
+        self.assertEqual(list(self.db.iter_completion_days(1)), [738733, 738734])
+        calls = self.profiler.stats()["calls"]
+        self.assertEqual((calls["Main_Db.list_all_habits"]["count"], calls["Main_Db.list_all_habits"]["rows"]), (2, 4))
+        self.assertEqual((calls["Main_Db.iter_completion_days"]["count"], calls["Main_Db.iter_completion_days"]["rows"]),
+                         (1, 2))
+
+    def test_errors_are_counted(self):
+        """Test that a call that raises is recorded as an error and the exception passes through."""
+        with self.assertRaises(Exception):
+            self.db.get_logs_between(1, None, None, None)
+        self.assertEqual(self.profiler.stats()["calls"]["Main_Db.get_logs_between"]["errors"], 1)
+
+    def test_nested_calls_and_sql(self):
+        """Test that Habit metrics, the reads below them and their SQL form one call stack."""
+        habit = Habit.from_row(self.db.get_habit(1), self.db)
+        self.assertEqual(habit.calculate_current_streak(), 2)
+        stats = self.profiler.stats()
+        self.assertEqual(stats["calls"]["Habit.calculate_current_streak"]["count"], 1)
+        self.assertIn("SELECT * FROM habits WHERE id = ?", stats["statements"])
+        stacks = [line.rsplit(" ", 1)[0] for line in self.profiler.to_folded().splitlines()]
+        self.assertIn("Habit.calculate_current_streak;Main_Db.iter_completion_days", stacks)
+        self.assertTrue(any(stack.startswith("Habit.calculate_current_streak;Main_Db.iter_completion_days;SQL SELECT")
+                            for stack in stacks))
+
+    def test_uninstrument_restores_methods(self):
+        """Test that uninstrumenting leaves no wrapper on the instance or the class."""
+        self.profiler.uninstrument()
+        self.assertNotIn("list_all_habits", vars(self.db))
+        self.assertFalse(hasattr(Habit.calculate_current_streak, "profiler"))
+        self.db.list_all_habits()
+        self.assertEqual(self.profiler.stats()["calls"], {})
+
+    def test_prometheus_export(self):
+        """Test the histogram and counters of the Prometheus text format."""
+        self.db.list_all_habits()
+        text = self.profiler.to_prometheus()
+        self.assertIn('habit_tracker_call_duration_seconds_count{method="Main_Db.list_all_habits"} 1', text)
+        self.assertIn('habit_tracker_call_duration_seconds_bucket{method="Main_Db.list_all_habits",le="+Inf"} 1', text)
+        self.assertIn('habit_tracker_call_rows_total{method="Main_Db.list_all_habits"} 2', text)
+        self.assertIn('habit_tracker_sql_statements_total{statement="SELECT * FROM habits"} 1', text)
+
+    def test_normalize_sql(self):
+        """Test that literals and whitespace do not split the counts of a statement."""
+        self.assertEqual(normalize_sql("SELECT *\n  FROM t WHERE a = 'it''s' AND b = 12.5 AND idx_1 = 3"),
+                         "SELECT * FROM t WHERE a = ? AND b = ? AND idx_1 = ?")
+
+    def test_cli_profile(self):
+        """Test that the --profile option writes the counters of a command in the format of the suffix."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        db_path, profile_path = os.path.join(directory, "main.db"), os.path.join(directory, "profile.json")
+        self.assertEqual(cli_main(["--db", db_path, "--profile", profile_path, "--trace-sql",
+                                   "add", "Running", "1", "Sport"]), 0)
+        with open(profile_path) as file:
+            stats = json.load(file)
+        self.assertEqual(stats["calls"]["Main_Db.add_habits"]["count"], 1)
+        self.assertTrue(any(sql.startswith("INSERT INTO habits") for sql in stats["statements"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+# test_metrics_cache.py
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from analytics import analyze_habit_rows, analyze_habits
+from bitmap_db import BitmapMainDb
+from db import Main_Db
+from habit import Habit
+from metrics_cache import MetricsCache
+from pager import HabitPager
+
+
+class TestMetricsCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with three habits and a cache for each test."""
+        self.db = Main_Db(":memory:")
+        self.db.create_table()
+        self.db.add_habits_bulk((f'habit {i}', 1, 'Health', '2023-08-01') for i in range(3))
+        self.db.add_habit_logs_bulk([(1, '2023-08-01'), (1, '2023-08-02'), (2, '2023-08-05')])
+        self.cache = MetricsCache()
+
+    def habit(self, habit_id):
+        return Habit.from_row(self.db.get_habit(habit_id), self.db, self.cache)
+
+    def test_hits_after_first_calculation(self):
+        """Test that the four metrics of a habit are calculated once and then served from memory."""
+        habit = self.habit(1)
+        metrics = (habit.calculate_current_streak(), habit.calculate_longest_streak(),
+                   habit.calculate_last_completed(), habit.calculate_total_completed())
+        self.assertEqual(metrics, (2, 2, '2023-08-02', 2))
+        self.assertEqual(self.habit(1).calculate_current_streak(), 2)
+        self.assertEqual(self.cache.stats(), {"hits": 4, "misses": 1, "evictions": 0, "size": 1, "maxsize": 1024})
+
+    def test_metrics_match_uncached(self):
+        """Test that cached metrics equal the metrics calculated by the Habit methods themselves."""
+        for habit_id in (1, 2, 3):
+            cached, uncached = self.habit(habit_id), Habit.from_row(self.db.get_habit(habit_id), self.db)
+            for method in ('calculate_current_streak', 'calculate_longest_streak',
+                           'calculate_last_completed', 'calculate_total_completed'):
+                self.assertEqual(getattr(cached, method)(), getattr(uncached, method)())
+
+    def test_writes_invalidate_only_their_habit(self):
+        """Test that a completion recalculates the completed habit and keeps the others."""
+        self.habit(1).calculate_total_completed()
+        self.habit(2).calculate_total_completed()
+        self.db.add_habit_log(1, '2023-08-03')
+        self.assertEqual(self.habit(1).calculate_total_completed(), 3)
+        self.assertEqual(self.habit(2).calculate_total_completed(), 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 3))
+
+        # A repeated completion of the day changes nothing and keeps the entry
+        self.db.add_habit_log(1, '2023-08-03')
+        self.habit(1).calculate_total_completed()
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_complete_edit_and_delete_invalidate(self):
+        """Test that complete_habits, edit_habits and delete_habits invalidate the habit."""
+        self.db.conn.execute("INSERT INTO habit_logs (habit_id, completed_at, completed) VALUES (3, '2023-08-09', 0)")
+        self.assertEqual(self.habit(3).calculate_total_completed(), 0)
+        self.db.complete_habits(3, '2023-08-09')
+        self.assertEqual(self.habit(3).calculate_total_completed(), 1)
+
+        self.db.add_habit_log(2, '2023-08-07')
+        self.assertEqual(self.habit(2).calculate_current_streak(), 1)
+        self.db.edit_habits(2, 'habit 1', 2, 'Health')
+        self.assertEqual(self.habit(2).calculate_current_streak(), 2)
+
+        self.db.delete_habits(2)
+        self.assertEqual(self.cache.get(self.db, 2, 2, lambda: 'recalculated'), 'recalculated')
+        self.assertEqual(self.cache.misses, 5)
+
+    def test_rollback_invalidates(self):
+        """Test that metrics calculated inside a rolled back transaction are not served afterwards."""
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction():
+                self.db.add_habit_log(2, '2023-08-06')
+                self.assertEqual(self.habit(2).calculate_total_completed(), 2)
+                raise RuntimeError
+        self.assertEqual(self.habit(2).calculate_total_completed(), 1)
+
+    def test_eviction(self):
+        """Test that the least recently used habit is evicted first."""
+        cache = MetricsCache(maxsize=2)
+        rows = self.db.list_all_habits()
+        analyze_habit_rows(self.db, rows[:2], cache=cache)
+        analyze_habit_rows(self.db, rows[:1], cache=cache)
+        analyze_habit_rows(self.db, rows[2:], cache=cache)
+        self.assertEqual(analyze_habit_rows(self.db, rows, cache=cache), analyze_habits(self.db))
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 5, "evictions": 3, "size": 2, "maxsize": 2})
+        self.assertEqual(list(cache._entries), [2, 3])
+        with self.assertRaises(ValueError):
+            MetricsCache(maxsize=0)
+
+    def test_pager_reuses_metrics(self):
+        """Test that a second pager, like a reopened Analyze window, calculates no metrics."""
+        HabitPager(self.db, cache=self.cache).rows(0, 3)
+        with patch('analytics.calculate_metrics') as calculate:
+            rows = HabitPager(self.db, cache=self.cache).rows(0, 3)
+        calculate.assert_not_called()
+        self.assertEqual(rows, analyze_habits(self.db))
+
+    def test_bitmap_writes_invalidate(self):
+        """Test that the completions of the bitmap storage invalidate the habit too."""
+        bitmap_db = BitmapMainDb(":memory:")
+        bitmap_db.create_table()
+        bitmap_db.add_habits('habit', 1, 'Health', '2023-08-01')
+        habit = Habit.from_row(bitmap_db.get_habit(1), bitmap_db, self.cache)
+        self.assertEqual(habit.calculate_total_completed(), 0)
+        bitmap_db.add_habit_log(1, '2023-08-01')
+        bitmap_db.add_habit_logs_bulk([(1, '2023-08-02')])
+        self.assertEqual(habit.calculate_current_streak(), 2)
+
+    def test_concurrent_read_during_transaction(self):
+        """Test that metrics read by another thread before a commit are not served after it."""
+        with tempfile.TemporaryDirectory() as directory:
+            file_db = Main_Db(os.path.join(directory, "main.db"), readers=2)
+            file_db.create_table()
+            file_db.add_habits('habit', 1, 'Health', '2023-08-01')
+            file_db.add_habit_log(1, '2023-08-01')
+            habit = Habit.from_row(file_db.get_habit(1), file_db, self.cache)
+            with file_db.transaction():
+                file_db.add_habit_log(1, '2023-08-02')
+                # A reader connection still sees the committed logs only
+                reader = threading.Thread(target=habit.calculate_total_completed)
+                reader.start()
+                reader.join()
+                self.assertEqual(self.cache.stats()["size"], 1)
+            self.assertEqual(habit.calculate_total_completed(), 2)
+            self.assertEqual(habit.calculate_current_streak(), 2)
+            file_db.close()
+
+    def test_writes_of_another_connection_invalidate(self):
+        """Test that a completion committed by another connection to the file is not served stale."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "main.db")
+            file_db, other_db = Main_Db(path), Main_Db(path)
+            file_db.create_table()
+            file_db.add_habits('habit', 1, 'Health', '2023-08-01')
+            habit = Habit.from_row(file_db.get_habit(1), file_db, self.cache)
+            self.assertEqual(habit.calculate_total_completed(), 0)
+            self.assertEqual(habit.calculate_total_completed(), 0)
+            other_db.add_habit_log(1, '2023-08-01')
+            self.assertEqual(habit.calculate_total_completed(), 1)
+            self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+            other_db.close()
+            file_db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# test_pager.py
+
+import unittest
+from unittest.mock import patch
+from analytics import analyze_habits
+from db import Main_Db
+from pager import HabitPager
+from worker import JobCancelled
+
+
+class TestHabitPager(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with 25 habits and a pager with pages of 10 for each test."""
+        self.db = Main_Db(":memory:")
+        self.db.create_table()
+        self.db.add_habits_bulk((f'habit {i}', 1, 'Health', '2023-08-01') for i in range(25))
+        self.db.add_habit_logs_bulk([(3, '2023-08-01'), (3, '2023-08-02'), (17, '2023-08-05')])
+        self.pager = HabitPager(self.db, page_size=10, max_pages=2)
+
+    def test_len(self):
+        """Test that the pager counts all habits."""
+        self.assertEqual(len(self.pager), 25)
+
+    def test_rows_match_full_analysis(self):
+        """Test that rows across page boundaries match the full analysis."""
+        expected = analyze_habits(self.db)
+        self.assertEqual(self.pager.rows(0, 25), expected)
+        self.assertEqual(self.pager.rows(8, 13), expected[8:13])
+        self.assertEqual(self.pager.rows(20, 40), expected[20:])
+        self.assertEqual(self.pager.rows(5, 5), [])
+
+    def test_pages_are_analyzed_lazily(self):
+        """Test that only the pages of the requested rows are analyzed."""
+        with patch('pager.analyze_habit_rows', wraps=lambda db, habits, cache=None, check=None: habits) as analyze:
+            self.pager.rows(12, 15)
+            self.pager.rows(13, 18)
+        self.assertEqual(analyze.call_count, 1)
+        self.assertEqual([habit[0] for habit in analyze.call_args[0][1]], list(range(11, 21)))
+
+    def test_cache_is_bounded(self):
+        """Test that only max_pages pages are kept in memory."""
+        for number in range(3):
+            self.pager.page(number)
+        self.assertEqual(list(self.pager._pages), [1, 2])
+
+    def test_jump_uses_keyset_after_deletes(self):
+        """Test that a page jumped to starts at the right habit even with gaps in the IDs."""
+        self.db.delete_habits(2)
+        self.db.delete_habits(5)
+        self.pager.refresh()
+        self.assertEqual([row[0] for row in self.pager.page(2)], [23, 24, 25])
+        self.assertEqual([row[0] for row in self.pager.page(1)], list(range(13, 23)))
+
+    def test_cancelled_rows_stop_between_habits(self):
+        """Test that a cancellation check stops the analysis of a page and the page is not kept."""
+        calls = []
+
+        def check():
+            calls.append(None)
+            if len(calls) == 3:
+                raise JobCancelled()
+
+        with self.assertRaises(JobCancelled):
+            self.pager.rows(0, 10, check)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(list(self.pager._pages), [])
+        self.assertEqual(self.pager.rows(0, 10, lambda: None), analyze_habits(self.db)[:10])
+
+    def test_prefetch(self):
+        """Test that prefetching analyzes the page ahead and ignores positions past the end."""
+        self.pager.prefetch(15)
+        self.pager.prefetch(99)
+        self.assertEqual(list(self.pager._pages), [1])
+
+    def test_sorted_rows_match_sorted_analysis(self):
+        """Test that a sorted pager serves the full analysis in the requested order."""
+        order_by = [('total_completed', True), ('name', False)]
+        self.pager.sort(order_by)
+        expected = sorted(analyze_habits(self.db), key=lambda row: row[1])
+        expected.sort(key=lambda row: row[8], reverse=True)
+        self.assertEqual(self.pager.rows(0, 25), expected)
+        self.assertEqual(self.pager.rows(8, 13), expected[8:13])
+
+    def test_sort_forgets_pages(self):
+        """Test that changing the order drops the pages of the old order."""
+        self.pager.page(0)
+        self.pager.sort([('name', True)])
+        self.assertEqual(list(self.pager._pages), [])
+        self.assertEqual(self.pager.page(0)[0][1], 'habit 9')
+        self.pager.sort(None)
+        self.assertEqual(self.pager.page(0)[0][0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
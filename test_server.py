@@ -0,0 +1,167 @@
+# test_server.py
+
+import http.client
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from instrumentation import Profiler
+from server import make_server
+
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        """Start a server on a free port with a fresh database file for each test."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = make_server(os.path.join(self.tmp.name, "main.db"), port=0, readers=2)
+        self.db = self.server.api.db
+        self.db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        self.server.api.close()
+        self.db.close()
+        self.tmp.cleanup()
+
+    def request(self, method, path, body=None, conn=None):
+        """Send a request and return the status and the decoded JSON body."""
+        conn = conn or http.client.HTTPConnection(*self.server.server_address)
+        data = json.dumps(body) if body is not None else None
+        conn.request(method, path, body=data, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_habit_endpoints(self):
+        """Test adding, listing, editing and deleting habits."""
+        status, body = self.request("POST", "/habits", {"name": "Read", "periodicity": 7, "category": "Mind"})
+        self.assertEqual(status, 201)
+        habit_id = body["id"]
+        self.assertEqual([habit["name"] for habit in self.request("GET", "/habits")[1]], ["Exercise", "Read"])
+
+        status, _ = self.request("PUT", f"/habits/{habit_id}", {"name": "Study", "periodicity": 1, "category": "Mind"})
+        self.assertEqual(status, 200)
+        self.assertEqual(self.db.get_habit(habit_id)[1], "Study")
+
+        self.assertEqual(self.request("DELETE", f"/habits/{habit_id}")[0], 200)
+        self.assertIsNone(self.db.get_habit(habit_id))
+
+    def test_completions_and_metrics(self):
+        """Test that completions are logged and reflected in the habit's metrics."""
+        conn = http.client.HTTPConnection(*self.server.server_address)  # Reused for every request
+        for day in ('2023-08-01', '2023-08-02', '2023-08-03'):
+            status, _ = self.request("POST", "/habits/1/completions", {"completed_at": day}, conn)
+            self.assertEqual(status, 201)
+        status, habit = self.request("GET", "/habits/1", conn=conn)
+        self.assertEqual(status, 200)
+        self.assertEqual((habit["longest_streak"], habit["last_completed"], habit["total_completed"]),
+                         (3, '2023-08-03', 3))
+        self.assertEqual(len(self.request("GET", "/habits/1/logs", conn=conn)[1]), 3)
+        status, body = self.request("POST", "/habits/1/completions", {"completed_at": "2023-08-03"}, conn)
+        self.assertEqual((status, body["logged"]), (200, False))
+        self.assertEqual(len(self.request("GET", "/habits/1/logs?since=2023-08-02", conn=conn)[1]), 2)
+        analyzed = self.request("GET", "/analyze?engine=sql", conn=conn)[1]
+        self.assertEqual(analyzed[0]["total_completed"], 3)
+
+    def test_concurrent_completions_are_grouped(self):
+        """Test that concurrent completions all land, sharing fewer commits than requests."""
+        days = [f'2023-08-{day:02d}' for day in range(1, 29)]
+        statuses = []
+
+        def complete(day):
+            statuses.append(self.request("POST", "/habits/1/completions", {"completed_at": day})[0])
+
+        threads = [threading.Thread(target=complete, args=(day,)) for day in days]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(statuses, [201] * len(days))
+        self.assertEqual(self.db.get_habit_stats(1), (28, 28, '2023-08-28', 28))
+        self.assertEqual(self.db.check_habit_stats(), [])
+        batcher = self.server.api.batcher
+        self.assertEqual(batcher.completions, len(days))
+        self.assertLessEqual(batcher.commits, len(days))
+
+    def test_batch_is_atomic(self):
+        """Test that a batch runs all its requests, or none of them if one fails."""
+        status, body = self.request("POST", "/batch", [
+            {"method": "POST", "path": "/habits", "body": {"name": "Read", "periodicity": 1, "category": "Mind"}},
+            {"method": "POST", "path": "/habits/1/completions", "body": {"completed_at": "2023-08-01"}},
+        ])
+        self.assertEqual(status, 200)
+        self.assertEqual([response["status"] for response in body], [201, 201])
+
+        status, body = self.request("POST", "/batch", [
+            {"method": "POST", "path": "/habits/1/completions", "body": {"completed_at": "2023-08-02"}},
+            {"method": "POST", "path": "/habits/99/completions", "body": {"completed_at": "2023-08-02"}},
+        ])
+        self.assertEqual((status, body["index"]), (404, 1))
+        self.assertEqual(len(self.db.get_habits_id(1)), 1)
+
+    def test_errors(self):
+        """Test the status codes of unknown habits, invalid bodies and duplicate names."""
+        self.assertEqual(self.request("GET", "/habits/99")[0], 404)
+        self.assertEqual(self.request("GET", "/nothing")[0], 404)
+        self.assertEqual(self.request("POST", "/habits/1/completions", {"completed_at": "yesterday"})[0], 400)
+        self.assertEqual(self.request("POST", "/habits", {"name": "Read"})[0], 400)
+        status, _ = self.request("POST", "/habits", {"name": "Exercise", "periodicity": 1, "category": "Health"})
+        self.assertEqual(status, 409)
+
+    def test_malformed_bodies(self):
+        """Test that bodies of the wrong JSON type are answered with 400 on a connection that stays open."""
+        conn = http.client.HTTPConnection(*self.server.server_address)
+        self.assertEqual(self.request("POST", "/habits/1/completions", [], conn=conn),
+                         (400, {"error": "The completion must be an object"}))
+        for item in ([], {"method": 1, "path": "/habits"}, {"method": "GET", "path": None}):
+            with self.subTest(item=item):
+                status, body = self.request("POST", "/batch", [item], conn=conn)
+                self.assertEqual((status, body["index"]), (400, 0))
+        self.assertEqual(self.request("GET", "/habits/1", conn=conn)[0], 200)
+        self.assertEqual(self.db.get_habits_id(1), [])
+
+    def test_database_errors(self):
+        """Test that database errors are answered as JSON on a connection that stays open."""
+        conn = http.client.HTTPConnection(*self.server.server_address)
+        with patch.object(self.db, "list_all_habits", side_effect=sqlite3.OperationalError("database is locked")):
+            self.assertEqual(self.request("GET", "/habits", conn=conn),
+                             (503, {"error": "Database unavailable: database is locked"}))
+        with patch.object(self.db, "list_all_habits", side_effect=sqlite3.DatabaseError("disk image is malformed")):
+            self.assertEqual(self.request("GET", "/habits", conn=conn)[0], 500)
+        self.assertEqual(self.request("GET", "/habits", conn=conn)[0], 200)
+
+    def test_metrics_endpoint(self):
+        """Test that /metrics serves the profiled calls of a profiling server, and is unknown otherwise."""
+        self.assertEqual(self.request("GET", "/metrics")[0], 404)
+
+        profiler = Profiler(trace_sql=True)
+        server = make_server(os.path.join(self.tmp.name, "main.db"), port=0, readers=2, profiler=profiler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            conn = http.client.HTTPConnection(*server.server_address)
+            self.assertEqual(self.request("GET", "/habits/1", conn=conn)[0], 200)
+            conn.request("GET", "/metrics")
+            response = conn.getresponse()
+            text = response.read().decode("utf-8")
+        finally:
+            server.shutdown()
+            thread.join()
+            server.server_close()
+            server.api.close()
+            profiler.uninstrument()
+            server.api.db.close()
+        self.assertTrue(response.getheader("Content-Type").startswith("text/plain"))
+        self.assertIn('habit_tracker_call_duration_seconds_count{method="Habit.calculate_current_streak"} 1', text)
+        self.assertIn('habit_tracker_sql_statements_total{statement="SELECT * FROM habits WHERE id = ?"}', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+# test_synthetic.py
+
+import unittest
+from datetime import date, timedelta
+from benchmarks.common import populate
+from benchmarks.synthetic import END, dataset_digest, generate_habit, synthetic_db
+from db import Main_Db
+
+
+class TestSynthetic(unittest.TestCase):
+
+    def test_digest_is_stable_for_a_seed(self):
+        """Test that the same seed generates the same data, and another seed different data."""
+        first = dataset_digest(synthetic_db(":memory:", 20, 1))
+        self.assertEqual(dataset_digest(synthetic_db(":memory:", 20, 1)), first)
+        self.assertNotEqual(dataset_digest(synthetic_db(":memory:", 20, 1, seed=1)), first)
+
+    def test_smaller_catalogue_is_a_prefix(self):
+        """Test that a smaller catalogue equals the first habits of a larger one."""
+        small, large = synthetic_db(":memory:", 10, 1), synthetic_db(":memory:", 30, 1)
+        large.conn.execute("DELETE FROM habits WHERE id > 10")
+        large.conn.execute("DELETE FROM habit_logs WHERE habit_id > 10")
+        self.assertEqual(dataset_digest(small), dataset_digest(large))
+
+    def test_habits_complete_once_per_period(self):
+        """Test that completions lie within the history, one period or more apart."""
+        for number in range(1, 21):
+            (name, periodicity, category, created_at), days = generate_habit(0, number, 365)
+            self.assertTrue(name.endswith(f"#{number}"))
+            self.assertTrue(all(created_at <= day <= END.isoformat() for day in days))
+            gaps = [(date.fromisoformat(newer) - date.fromisoformat(older)).days for older, newer in zip(days, days[1:])]
+            self.assertTrue(all(gap % periodicity == 0 and gap > 0 for gap in gaps))
+
+    def test_populate_loads_the_same_catalogue(self):
+        """Test that the raw inserts of benchmarks.common give the data of synthetic_db after migrating."""
+        habit_db = Main_Db(":memory:")
+        habit_db.create_table(migrate=False)
+        populate(habit_db, 15, 365, start=END - timedelta(days=364))
+        habit_db.migrate()
+        self.assertEqual(dataset_digest(habit_db), dataset_digest(synthetic_db(":memory:", 15, 1)))
+        self.assertEqual(habit_db.check_habit_stats(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
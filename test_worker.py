@@ -0,0 +1,152 @@
+# test_worker.py
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from db import Main_Db
+from worker import DbWorker
+
+
+class FakeRoot:
+    """Stands in for the Tk root: collects the after callbacks so the test calls them."""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, ms, func):
+        self.callbacks.append(func)
+
+    def update(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for func in callbacks:
+            func()
+
+
+class TestDbWorker(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a migrated database file with one habit and a worker on it for each test."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "main.db")
+        habit_db = Main_Db(self.db_path)
+        habit_db.create_table()
+        habit_db.add_habits('Exercise', 1, 'Health', '2023-08-01')
+        habit_db.conn.close()
+
+        self.root = FakeRoot()
+        self.worker = DbWorker(self.root, self.db_path)
+
+    def tearDown(self):
+        self.worker.close()
+        self.tmp.cleanup()
+
+    def wait_for(self, condition, timeout=5):
+        """Polls the worker like the Tk main loop until the condition holds."""
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, "timed out")
+            self.root.update()
+            time.sleep(0.005)
+
+    def test_result_is_delivered_on_the_polling_thread(self):
+        """Test that jobs run on the worker thread and their results arrive through after."""
+        threads = []
+        results = []
+
+        def job(habit_db, job):
+            threads.append(threading.current_thread())
+            return habit_db.list_all_habits()
+
+        self.worker.submit(job, on_done=lambda result: results.append((threading.current_thread(), result)))
+        self.wait_for(lambda: results)
+        self.assertIsNot(threads[0], threading.main_thread())
+        self.assertIs(results[0][0], threading.main_thread())
+        self.assertEqual(results[0][1][0][1], 'Exercise')
+
+    def test_jobs_run_in_order(self):
+        """Test that a write is visible to the job queued after it."""
+        results = []
+        self.worker.submit(lambda habit_db, job: habit_db.add_habits('Read', 1, 'Mind', '2023-08-01'))
+        self.worker.submit(lambda habit_db, job: habit_db.count_habits(), on_done=results.append)
+        self.wait_for(lambda: results)
+        self.assertEqual(results, [2])
+
+    def test_error_is_delivered_and_rolled_back(self):
+        """Test that an exception reaches on_error and the job's writes are discarded."""
+        errors = []
+        results = []
+
+        def failing(habit_db, job):
+            with habit_db.transaction():
+                habit_db.add_habits('Read', 1, 'Mind', '2023-08-01')
+                raise ValueError("boom")
+
+        self.worker.submit(failing, on_error=errors.append)
+        self.worker.submit(lambda habit_db, job: habit_db.count_habits(), on_done=results.append)
+        self.wait_for(lambda: results)
+        self.assertEqual(str(errors[0]), "boom")
+        self.assertEqual(results, [1])
+
+    def test_progress(self):
+        """Test that reported progress reaches on_progress before on_done."""
+        events = []
+
+        def job(habit_db, job):
+            for step in range(3):
+                job.report(step)
+            return "done"
+
+        self.worker.submit(job, on_done=events.append, on_progress=events.append)
+        self.wait_for(lambda: "done" in events)
+        self.assertEqual(events, [0, 1, 2, "done"])
+
+    def test_cancel_running_job(self):
+        """Test that a running job stops at its next check and calls no callback."""
+        started = threading.Event()
+        release = threading.Event()
+        steps = []
+        results = []
+
+        def job(habit_db, job):
+            started.set()
+            release.wait(5)
+            for step in range(3):
+                job.check()
+                steps.append(step)
+            return "done"
+
+        running = self.worker.submit(job, on_done=results.append)
+        started.wait(5)
+        running.cancel()
+        release.set()
+        self.worker.submit(lambda habit_db, job: None, on_done=results.append)
+        self.wait_for(lambda: results)
+        self.assertEqual(steps, [])
+        self.assertEqual(results, [None])
+
+    def test_cancel_queued_job(self):
+        """Test that a cancelled job is skipped if it has not started yet."""
+        release = threading.Event()
+        calls = []
+        self.worker.submit(lambda habit_db, job: release.wait(5))
+        queued = self.worker.submit(lambda habit_db, job: calls.append("queued"))
+        queued.cancel()
+        release.set()
+        self.worker.submit(lambda habit_db, job: calls.append("next"), on_done=calls.append)
+        self.wait_for(lambda: None in calls)
+        self.assertEqual(calls, ["next", None])
+
+    def test_close_finishes_queued_jobs(self):
+        """Test that closing the worker runs the queued jobs and stops the thread."""
+        self.worker.submit(lambda habit_db, job: habit_db.add_habits('Read', 1, 'Mind', '2023-08-01'))
+        self.worker.close(timeout=5)
+        self.assertFalse(self.worker._thread.is_alive())
+        habit_db = Main_Db(self.db_path)
+        self.assertEqual(habit_db.count_habits(), 2)
+        habit_db.conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
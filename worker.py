@@ -0,0 +1,176 @@
+import queue
+import threading
+
+from db import Main_Db
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job by Job.check once the job was cancelled.
+    """
+
+
+class Job:
+    """
+    A unit of work queued on a DbWorker, with progress reporting and cancellation.
+    """
+
+    def __init__(self, worker, func, on_done=None, on_error=None, on_progress=None):
+        """
+        Initializes a new Job instance.
+
+        Parameters:
+        - worker (DbWorker): The worker that runs the job.
+        - func (callable): Called on the worker thread as func(db, job).
+        - on_done (callable): Called on the Tk main thread with the return value of func.
+        - on_error (callable): Called on the Tk main thread with the exception raised by func.
+        - on_progress (callable): Called on the Tk main thread with each value passed to report.
+        """
+        self.worker = worker
+        self.func = func
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """
+        Cancels the job. A queued job is skipped, a running job stops at its next check,
+        and no callback of a cancelled job is called.
+        """
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        """
+        Returns whether the job was cancelled.
+        """
+        return self._cancelled.is_set()
+
+    def check(self):
+        """
+        Stops the running job if it was cancelled; long jobs call this between steps.
+        """
+        if self.cancelled:
+            raise JobCancelled()
+
+    def report(self, progress):
+        """
+        Passes a progress value to on_progress on the Tk main thread.
+        """
+        if self.on_progress is not None:
+            self.worker._deliver(self, self.on_progress, progress)
+
+
+class DbWorker:
+    """
+    Runs database and analytics work on a dedicated thread, so the Tk main thread never waits
+    for SQLite.
+
+    The thread owns its own Main_Db connection and works through a queue of jobs in order.
+    Results are handed back through a second queue that the main thread drains with root.after,
+    because Tk widgets may only be touched from the thread running the main loop.
+    """
+
+    POLL_INTERVAL = 20  # Milliseconds between checks for finished jobs
+
+    def __init__(self, root, db_path="main.db", setup=None, **db_options):
+        """
+        Starts the worker thread.
+
+        Parameters:
+        - root: The Tk root window whose main loop receives the results.
+        - db_path (str): The path to the SQLite database file.
+        - setup (callable): Called on the worker thread with the new Main_Db before the first
+          job, e.g. to instrument it.
+        - db_options: Further keyword arguments for Main_Db.
+        """
+        self.root = root
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, args=(db_path, setup, db_options), name="DbWorker", daemon=True)
+        self._thread.start()
+        self.root.after(self.POLL_INTERVAL, self._poll)
+
+    def submit(self, func, on_done=None, on_error=None, on_progress=None):
+        """
+        Queues a job for the worker thread.
+
+        Parameters:
+        - func (callable): Called on the worker thread as func(db, job), where db is the
+          worker's Main_Db.
+        - on_done (callable): Called on the Tk main thread with the return value of func.
+        - on_error (callable): Called on the Tk main thread with the exception raised by func.
+          Without it, the exception is re-raised on the main thread.
+        - on_progress (callable): Called on the Tk main thread with the values func reports.
+
+        Returns:
+        - Job: The queued job, e.g. to cancel it.
+        """
+        job = Job(self, func, on_done, on_error, on_progress)
+        self._jobs.put(job)
+        return job
+
+    def close(self, timeout=None):
+        """
+        Finishes the queued jobs, closes the worker's connection and stops the thread.
+        """
+        self._closed = True
+        self._jobs.put(None)
+        self._thread.join(timeout)
+
+    def _run(self, db_path, setup, db_options):
+        """
+        The worker thread: opens the connection, then runs the jobs until close is called.
+        """
+        habit_db = Main_Db(db_path, **db_options)
+        try:
+            if setup is not None:
+                setup(habit_db)
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                if job.cancelled:
+                    continue
+                try:
+                    result = job.func(habit_db, job)
+                except JobCancelled:
+                    habit_db.rollback()
+                except Exception as error:
+                    habit_db.rollback()
+                    self._deliver(job, job.on_error or _reraise, error)
+                else:
+                    if job.on_done is not None:
+                        self._deliver(job, job.on_done, result)
+        finally:
+            habit_db.close()
+
+    def _deliver(self, job, callback, value):
+        """
+        Queues a callback for the main thread.
+        """
+        self._results.put((job, callback, value))
+
+    def _poll(self):
+        """
+        Calls the callbacks of finished jobs on the main thread, then checks again later.
+        """
+        while True:
+            try:
+                job, callback, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if not job.cancelled:
+                callback(value)
+        if not self._closed or self._thread.is_alive() or not self._results.empty():
+            self.root.after(self.POLL_INTERVAL, self._poll)
+
+
+def _reraise(error):
+    """
+    Re-raises the exception of a job without on_error, so Tk reports it.
+    """
+    raise error
+